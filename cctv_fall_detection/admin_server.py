@@ -1,63 +1,239 @@
-from flask import Flask, request, render_template, send_from_directory, jsonify
+from flask import Flask, Response, abort, request, render_template, send_from_directory, jsonify
+import json
 import os
+import time
 from datetime import datetime
-import cv2
-import numpy as np
+from alert_store import SQLiteAlertStore
+from frame_hub import BOUNDARY, FrameHub, mjpeg_stream, parse_variant
+from metrics import CONTENT_TYPE, REGISTRY
+from snapshot_store import SnapshotStore
 
 app = Flask(__name__)
-ALERTS = []
-live_frame = None  # latest frame for UI
+ALERT_DB = "alerts.db"
+ALERTS = SQLiteAlertStore(ALERT_DB)  # survives restarts; writes are batched off the request thread
+FRAMES = FrameHub()  # latest JPEG bytes per camera and encode setting, never decoded
 
 SNAPSHOT_DIR = "fall_snapshots"
 os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+SNAPSHOTS = SnapshotStore(SNAPSHOT_DIR)  # background writes, thumbnails, retention
+
+DEFAULT_VIEWER_FPS = 10
+MAX_VIEWER_FPS = 25
+LATEST_LEASE = 10       # seconds a camera keeps rendering after a /latest request
+LATEST_WAIT = 3         # seconds /latest waits for an unwatched camera's first frame
+MAX_SUBSCRIPTION_POLL = 30  # seconds an engine's /subscriptions request may block
+
+ALERT_PAGE_SIZE = 100
+MAX_LONG_POLL = 30      # seconds a /alerts?wait= request may block
+SSE_KEEPALIVE = 15      # seconds between keep-alive comments on idle streams
+
+FRAMES_RECEIVED = REGISTRY.counter("dashboard_frames_received_total", "Frames posted by the engines", ("camera",))
+ALERTS_RECEIVED = REGISTRY.counter("dashboard_alerts_received_total", "Fall alerts posted by the engines",
+                                   ("camera",))
+REGISTRY.gauge("dashboard_alert_write_queue_depth", "Alerts waiting for the SQLite writer").set_function(
+    lambda: ALERTS.pending)
+REGISTRY.gauge("dashboard_snapshot_queue_depth", "Snapshots waiting for the writer thread").set_function(
+    lambda: SNAPSHOTS.pending)
+REGISTRY.gauge("dashboard_snapshots_dropped_total", "Snapshots dropped because the writer was behind",
+               kind="counter").set_function(lambda: SNAPSHOTS.dropped)
+
+
+def _viewer_counts():
+    counts = {(camera_id,): FRAMES.viewer_count(camera_id) for camera_id in list(FRAMES.viewers)}
+    return {labels: count for labels, count in counts.items() if count > 0}
+
+
+def _frame_ages():
+    """Only for cameras someone is watching: the engines send no frames for the others."""
+    now = time.time()
+    watched = FRAMES.subscriptions()
+    last_frame = {}
+    for (camera_id, _), (_, _, received_at) in list(FRAMES.frames.items()):
+        if camera_id in watched:
+            last_frame[camera_id] = max(received_at, last_frame.get(camera_id, 0.0))
+    return {(camera_id,): round(now - received_at, 3) for camera_id, received_at in last_frame.items()}
+
+
+# Read at scrape time, so cameras nobody watches any more drop out of the output
+REGISTRY.gauge("dashboard_mjpeg_viewers", "Open MJPEG streams per camera", ("camera",)).set_collector(
+    _viewer_counts)
+REGISTRY.gauge("dashboard_frame_age_seconds", "Seconds since the last frame of a watched camera",
+               ("camera",)).set_collector(_frame_ages)
 
 
 @app.route('/')
 def dashboard():
-    return render_template('dashboard.html', alerts=ALERTS)
+    cameras = FRAMES.cameras()
+    camera_id = request.args.get("camera", cameras[0] if cameras else "0")
+    return render_template('dashboard.html', alerts=ALERTS.recent(50), last_alert_id=ALERTS.last_id,
+                           cameras=cameras, camera_id=camera_id)
 
 
-# Receive live frame (JPEG bytes)
+def request_variant():
+    return parse_variant(request.args.get("width", type=int), request.args.get("quality", type=int))
+
+
+# Receive live frame (JPEG bytes), encoded at the ?width= / ?quality= a viewer subscribed to
 @app.route('/frame', methods=['POST'])
 def receive_frame():
-    global live_frame
     if request.data:
-        np_arr = np.frombuffer(request.data, np.uint8)
-        live_frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-        if live_frame is not None:
-            cv2.imwrite(os.path.join(SNAPSHOT_DIR, "latest.jpg"), live_frame)
+        camera_id = request.args.get("camera_id", "0")
+        FRAMES.publish(camera_id, request.data, request_variant())
+        FRAMES_RECEIVED.inc(camera_id)
         return jsonify({"status": "ok"}), 200
     return jsonify({"status": "no data"}), 400
 
 
+# Live MJPEG stream of one camera; ?fps= caps the rate for this viewer,
+# ?width= / ?quality= pick the encode (shared with every viewer asking for the same)
+@app.route('/stream/<camera_id>')
+def stream(camera_id):
+    fps = min(max(request.args.get("fps", DEFAULT_VIEWER_FPS, type=float), 0.1), MAX_VIEWER_FPS)
+    return Response(mjpeg_stream(FRAMES, camera_id, fps, request_variant()),
+                    mimetype=f"multipart/x-mixed-replace; boundary={BOUNDARY}",
+                    headers={"Cache-Control": "no-cache"})
+
+
+@app.route('/latest/<camera_id>.jpg')
+def latest_frame(camera_id):
+    # Nobody may be watching, so ask the engine to render for a while and wait for a fresh frame
+    variant = request_variant()
+    FRAMES.lease(camera_id, variant, LATEST_LEASE)
+    latest = FRAMES.wait(camera_id, FRAMES.start_seq(camera_id, variant), timeout=LATEST_WAIT, variant=variant)
+    if latest is None:
+        abort(404)
+    return Response(latest[1], mimetype="image/jpeg", headers={"Cache-Control": "no-cache"})
+
+
+@app.route('/cameras')
+def cameras():
+    return jsonify(FRAMES.cameras())
+
+
+# Engines long-poll this with their camera IDs and the last version they saw,
+# and annotate / encode only the settings listed for their cameras
+@app.route('/subscriptions', methods=['POST'])
+def subscriptions():
+    body = request.get_json(silent=True) or {}
+    wait = min(float(body.get("wait") or 0), MAX_SUBSCRIPTION_POLL)
+    version, subs = FRAMES.wait_subscriptions(body.get("version"), body.get("cameras", []), timeout=wait)
+    return jsonify({"version": version, "subscriptions": subs})
+
+
 @app.route('/alert', methods=['POST'])
 def receive_alert():
     person_id = request.form.get("person_id")
+    camera_id = request.form.get("camera_id", "0")
     location = request.form.get("location")
     note = request.form.get("note", "")
     snapshot = request.files.get("snapshot_image")
+    ALERTS_RECEIVED.inc(camera_id)
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    now = datetime.now()
+    timestamp = now.strftime("%Y%m%d_%H%M%S")
 
     filename = None
     if snapshot:
-        filename = f"fall_{person_id}_{timestamp}.jpg"
-        snapshot.save(os.path.join(SNAPSHOT_DIR, filename))
+        filename = SNAPSHOTS.save_jpeg(snapshot.read())  # None if the writer is behind: no snapshot, not a dead link
 
-    ALERTS.append({
+    ALERTS.add({
+        "ts": now.timestamp(),
+        "camera_id": camera_id,
         "person_id": person_id,
         "timestamp": timestamp,
         "location": location,
+        "bbox": request.form.get("bbox"),
         "note": note,
         "snapshot": filename
     })
     return jsonify({"status": "alert received"}), 200
 
 
+def alert_filters():
+    return {
+        "camera_id": request.args.get("camera_id"),
+        "person_id": request.args.get("person_id"),
+        "since": request.args.get("since", type=float),
+        "until": request.args.get("until", type=float),
+    }
+
+
+# New alerts:  /alerts?after=<id>[&wait=<seconds>]   (oldest first, wait = long-poll)
+# History:     /alerts[?before=<id>]                 (newest first, one page)
+# Both accept camera_id, person_id, since, until (unix time), e.g.
+#   /alerts?camera_id=12&since=<now - 3600>
+@app.route('/alerts')
+def list_alerts():
+    filters = alert_filters()
+    limit = min(request.args.get("limit", ALERT_PAGE_SIZE, type=int), ALERT_PAGE_SIZE)
+    last_id = ALERTS.last_id
+
+    if "after" in request.args:
+        after = request.args.get("after", 0, type=int)
+        wait = min(request.args.get("wait", 0, type=float), MAX_LONG_POLL)
+        if wait > 0 and ALERTS.wait(after, timeout=wait):
+            last_id = ALERTS.last_id
+        alerts = ALERTS.query(after_id=after, limit=limit, newest_first=False, **filters)
+        if len(alerts) == limit:
+            cursor = alerts[-1]["id"]  # more to page through
+        else:
+            cursor = max([after, last_id] + [a["id"] for a in alerts[-1:]])
+        return jsonify({"alerts": alerts, "cursor": cursor})
+
+    before = request.args.get("before", type=int)
+    alerts = ALERTS.query(before_id=before, limit=limit, **filters)
+    return jsonify({
+        "alerts": alerts,
+        "cursor": last_id if before is None else None,
+        "next_before": alerts[-1]["id"] if len(alerts) == limit else None,
+    })
+
+
+# Server-Sent Events: pushes only alerts newer than ?after= / Last-Event-ID
+@app.route('/alerts/stream')
+def stream_alerts():
+    after = request.headers.get("Last-Event-ID", type=int)
+    if after is None:
+        after = request.args.get("after", 0, type=int)
+    filters = alert_filters()
+
+    def events(cursor):
+        while True:
+            if not ALERTS.wait(cursor, timeout=SSE_KEEPALIVE):
+                yield ": keepalive\n\n"
+                continue
+            last_id = ALERTS.last_id
+            alerts = ALERTS.query(after_id=cursor, limit=ALERT_PAGE_SIZE, newest_first=False, **filters)
+            for alert in alerts:
+                yield f"id: {alert['id']}\ndata: {json.dumps(alert)}\n\n"
+            if len(alerts) == ALERT_PAGE_SIZE:
+                cursor = alerts[-1]["id"]
+            else:
+                cursor = max([cursor, last_id] + [a["id"] for a in alerts[-1:]])
+
+    return Response(events(after), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+# Prometheus scrape target; the engine workers serve their own (run_engine.py --metrics-port)
+@app.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), mimetype=None, content_type=CONTENT_TYPE)
+
+
 @app.route('/snapshots/<filename>')
 def serve_snapshot(filename):
     return send_from_directory(SNAPSHOT_DIR, filename)
 
 
+@app.route('/thumbnails/<filename>')
+def serve_thumbnail(filename):
+    # The thumbnail is written shortly after the alert; fall back to the full image until then
+    if os.path.exists(SNAPSHOTS.thumbnail_path(filename)):
+        return send_from_directory(SNAPSHOTS.thumb_root, filename)
+    return send_from_directory(SNAPSHOT_DIR, filename)
+
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    # threaded: every MJPEG viewer holds a request thread open
+    app.run(host="0.0.0.0", port=5000, debug=True, threaded=True)
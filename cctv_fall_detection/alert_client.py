@@ -1,32 +1,278 @@
+import atexit
+import threading
+import time
+from collections import deque
+
 import requests
+from requests.adapters import HTTPAdapter
 import cv2
 
+from event_log import get_event_log
+from metrics import REGISTRY
+
 # Flask dashboard base URL
 DASHBOARD_URL = "http://127.0.0.1:5000"
 
+MAX_PENDING_ALERTS = 1000  # bounded outbound alert queue; alerts are retried as long as they fit in it
+RETRY_BACKOFF = 0.5        # seconds, doubled after every consecutive failure
+MAX_BACKOFF = 10.0
+REQUEST_TIMEOUT = 2.0
+JPEG_QUALITY = 90          # frames / snapshots passed in as arrays (same as the dashboard's SnapshotStore)
+SUBSCRIPTION_POLL = 20.0   # seconds the dashboard may hold a viewer subscription long-poll open
 
-def post_frame_to_dashboard(frame):
-    """
-    Sends a single frame (JPEG raw bytes) to the Flask dashboard.
-    """
-    try:
-        _, jpeg = cv2.imencode('.jpg', frame)
+ALERT_LATENCY = REGISTRY.histogram(
+    "fall_alert_latency_seconds", "Frame capture to dashboard acknowledgement of a fall alert", ("camera",))
+
+
+def _encode_jpeg(frame):
+    if isinstance(frame, bytes):
+        return frame  # already JPEG-encoded by the caller
+    ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return jpeg.tobytes()
+
+
+class DashboardSender:
+    def __init__(self, base_url=DASHBOARD_URL, max_alerts=MAX_PENDING_ALERTS, pool_size=4):
+        """
+        Background sender for the dashboard.
+        - one keep-alive requests.Session shared by every post
+        - alerts are queued (bounded) and always go out before frames
+        - frames are coalesced: only the latest frame per camera and encode setting is kept
+        - a second thread long-polls which cameras have viewers (see watch / viewer_settings)
+        - failed posts back off exponentially (up to MAX_BACKOFF), alerts and frames
+          separately, so a failing frame endpoint never holds alerts back; alerts are
+          retried until they are sent, rejected by the dashboard (4xx) or pushed out of
+          the full queue, frames are not retried and a rejected frame causes no backoff
+        - every dropped alert is counted and written to the event log
+        Callers never block on the network.
+        """
+        self.base_url = base_url
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.alerts = deque()
+        self.max_alerts = max_alerts
+        self.frames = {}  # (camera_id, variant) -> latest frame, insertion order = send order
+        self.cameras = {}  # camera_id -> run_camera loops in this process reporting it
+        self.subscriptions = {}  # camera_id -> [(width, quality), ...] viewers want
+        self._poll_thread = None
+        self._cond = threading.Condition()
+        self._running = True
+        self._failures = {"alert": 0, "frame": 0}  # consecutive failures per kind
+        self._retry_at = {"alert": 0.0, "frame": 0.0}
+        self._frames_rejected = False  # last frame got a 4xx; warned once per streak
+
+        # Stats
+        self.sent_frames = 0
+        self.coalesced_frames = 0
+        self.rejected_frames = 0
+        self.sent_alerts = 0
+        self.dropped_alerts = 0
+
+        # Read at scrape time; the process-wide sender (the last one started) is reported
+        depth = REGISTRY.gauge("dashboard_sender_queue_depth", "Posts waiting in the dashboard sender", ("kind",))
+        depth.set_function(lambda: len(self.alerts), "alert")
+        depth.set_function(lambda: len(self.frames), "frame")
+        sent = REGISTRY.gauge("dashboard_sender_posts_total", "Posts by outcome", ("kind", "outcome"), kind="counter")
+        sent.set_function(lambda: self.sent_alerts, "alert", "sent")
+        sent.set_function(lambda: self.dropped_alerts, "alert", "dropped")
+        sent.set_function(lambda: self.sent_frames, "frame", "sent")
+        sent.set_function(lambda: self.coalesced_frames, "frame", "coalesced")
+        sent.set_function(lambda: self.rejected_frames, "frame", "rejected")
+        REGISTRY.gauge("dashboard_sender_viewer_streams", "Encode settings the dashboard's viewers want").set_function(
+            lambda: sum(len(v) for v in self.subscriptions.values()))
+
+        self._thread = threading.Thread(target=self._run, name="dashboard-sender", daemon=True)
+        self._thread.start()
+
+    def send_frame(self, frame, camera_id=None, variant=None):
+        """variant: the (width, quality) it was encoded at, as listed in viewer_settings"""
+        key = (camera_id, None if variant is None else tuple(variant))
+        with self._cond:
+            if self.frames.pop(key, None) is not None:
+                self.coalesced_frames += 1
+            self.frames[key] = frame
+            self._cond.notify()
+
+    def watch(self, camera_id, delta=1):
+        """Reports a camera to the dashboard (delta=-1 when it stops) and starts polling its viewers."""
+        camera_id = str(camera_id)
+        with self._cond:
+            count = self.cameras.get(camera_id, 0) + delta
+            if count > 0:
+                self.cameras[camera_id] = count
+            else:
+                self.cameras.pop(camera_id, None)
+            if self._poll_thread is None and self._running:
+                self._poll_thread = threading.Thread(target=self._poll_viewers, name="dashboard-viewers",
+                                                     daemon=True)
+                self._poll_thread.start()
+
+    def viewer_settings(self, camera_id):
+        """(width, quality) settings someone is watching the camera at; empty when nobody is."""
+        return self.subscriptions.get(str(camera_id), ())
+
+    def send_alert(self, person_id, bbox, note, snapshot_image=None, camera_id=None, captured_at=None):
+        """captured_at: time.monotonic() of the frame, for the alert latency metric."""
+        dropped = None
+        with self._cond:
+            if len(self.alerts) >= self.max_alerts:
+                dropped = self.alerts.popleft()
+                self.dropped_alerts += 1
+            self.alerts.append([0, (person_id, bbox, note, snapshot_image, camera_id), captured_at])
+            self._cond.notify()
+        if dropped is not None:
+            self._log_dropped(dropped, "queue full")
+
+    def queue_depth(self):
+        return len(self.alerts) + len(self.frames)
+
+    def stop(self, timeout=2.0):
+        """Stop the sender, giving queued alerts up to `timeout` seconds to go out."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.alerts and time.monotonic() < deadline:
+                self._cond.wait(0.05)
+            self._running = False
+            self._cond.notify_all()
+        self._thread.join(timeout=max(0.0, deadline - time.monotonic()))
+        self.session.close()
+        with self._cond:
+            unsent, self.alerts = list(self.alerts), deque()
+            self.dropped_alerts += len(unsent)
+        for job in unsent:
+            self._log_dropped(job, "sender stopped")
+
+    def _next_job(self):
+        with self._cond:
+            while self._running:
+                now = time.monotonic()
+                waits = []
+                if self.alerts:
+                    wait = self._retry_at["alert"] - now
+                    if wait <= 0:
+                        return "alert", self.alerts[0]
+                    waits.append(wait)
+                if self.frames:
+                    wait = self._retry_at["frame"] - now
+                    if wait <= 0:
+                        key = next(iter(self.frames))
+                        return "frame", (key, self.frames.pop(key))
+                    waits.append(wait)
+                self._cond.wait(min(waits) if waits else None)
+            return None, None
+
+    def _run(self):
+        while True:
+            kind, job = self._next_job()
+            if kind is None:
+                return
+            try:
+                if kind == "alert":
+                    self._post_alert(*job[1])
+                else:
+                    self._post_frame(job[1], *job[0])
+            except Exception as e:
+                self._failed(kind, job, e)
+                continue
+
+            with self._cond:
+                self._failures[kind] = 0
+                if kind == "alert":
+                    if self.alerts and self.alerts[0] is job:
+                        self.alerts.popleft()
+                    self.sent_alerts += 1
+                    self._cond.notify_all()
+                    if job[2] is not None:
+                        ALERT_LATENCY.observe(time.monotonic() - job[2], str(job[1][4]))
+                else:
+                    self.sent_frames += 1
+                    self._frames_rejected = False
+
+    def _failed(self, kind, job, error):
+        status = getattr(getattr(error, "response", None), "status_code", None)
+        # A 4xx (or an alert that can't even be encoded) fails the same way every time
+        rejected = (status is not None and 400 <= status < 500) or not isinstance(
+            error, requests.exceptions.RequestException)
+        warn = False
+        with self._cond:
+            if rejected and kind == "alert":
+                if self.alerts and self.alerts[0] is job:
+                    self.alerts.popleft()
+                self.dropped_alerts += 1
+                self._cond.notify_all()
+            elif rejected:
+                self.rejected_frames += 1
+                warn, self._frames_rejected = not self._frames_rejected, True
+            else:
+                self._failures[kind] += 1
+                delay = min(RETRY_BACKOFF * (2 ** (self._failures[kind] - 1)), MAX_BACKOFF)
+                self._retry_at[kind] = time.monotonic() + delay
+                warn = self._failures[kind] == 1
+                if kind == "alert":
+                    job[0] += 1
+        if rejected and kind == "alert":
+            self._log_dropped(job, f"rejected: {error}")
+        elif warn and rejected:
+            print(f"[WARN] Dashboard rejected frame, not retried: {error}")
+        elif warn:
+            print(f"[WARN] Failed to post {kind}, retrying: {error}")
+
+    def _log_dropped(self, job, reason):
+        attempts, (person_id, bbox, note, _, camera_id), _ = job
+        print(f"[ERROR] Fall alert for Person {person_id} (camera {camera_id}) dropped: {reason}")
+        get_event_log().log({"type": "alert_dropped", "ts": round(time.time(), 3), "camera_id": camera_id,
+                             "track_id": person_id, "bbox": bbox, "note": note, "attempts": attempts,
+                             "reason": reason})
+
+    def _poll_viewers(self):
+        version = None
+        failures = 0
+        while self._running:
+            with self._cond:
+                cameras = list(self.cameras)
+            try:
+                resp = self.session.post(
+                    f"{self.base_url}/subscriptions",
+                    json={"cameras": cameras, "version": version, "wait": SUBSCRIPTION_POLL},
+                    timeout=SUBSCRIPTION_POLL + REQUEST_TIMEOUT
+                )
+                resp.raise_for_status()
+                data = resp.json()
+            except (requests.exceptions.RequestException, ValueError) as e:
+                # Nobody can watch through a dashboard the engine can't reach
+                self.subscriptions = {}
+                version = None
+                failures += 1
+                if failures == 1:
+                    print(f"[WARN] Failed to poll dashboard viewers: {e}")
+                with self._cond:
+                    self._cond.wait_for(lambda: not self._running,
+                                        min(RETRY_BACKOFF * (2 ** (failures - 1)), MAX_BACKOFF))
+                continue
+            failures = 0
+            version = data["version"]
+            self.subscriptions = {camera_id: [tuple(v) for v in variants]
+                                  for camera_id, variants in data["subscriptions"].items()}
 
-        requests.post(
-            f"{DASHBOARD_URL}/frame",
-            data=jpeg.tobytes(),
+    def _post_frame(self, frame, camera_id, variant=None):
+        params = {} if camera_id is None else {"camera_id": str(camera_id)}
+        if variant is not None:
+            params["width"], params["quality"] = variant
+        resp = self.session.post(
+            f"{self.base_url}/frame",
+            data=_encode_jpeg(frame),
+            params=params,
             headers={"Content-Type": "application/octet-stream"},
-            timeout=0.5
+            timeout=REQUEST_TIMEOUT
         )
-    except Exception as e:
-        print(f"[WARN] Failed to post frame: {e}")
+        resp.raise_for_status()
 
-
-def post_alert_to_dashboard(person_id, bbox, note, snapshot_image=None):
-    """
-    Sends a fall alert with optional snapshot and location to the dashboard.
-    """
-    try:
+    def _post_alert(self, person_id, bbox, note, snapshot_image, camera_id):
         # bbox = (x, y, w, h) → center = (x + w/2, y + h/2)
         center_x = bbox[0] + bbox[2] // 2
         center_y = bbox[1] + bbox[3] // 2
@@ -38,18 +284,73 @@ def post_alert_to_dashboard(person_id, bbox, note, snapshot_image=None):
             "note": note,
             "location": location,
         }
+        if camera_id is not None:
+            data["camera_id"] = str(camera_id)
 
         files = {}
         if snapshot_image is not None:
-            _, jpeg = cv2.imencode('.jpg', snapshot_image)
-            files["snapshot_image"] = ("snapshot.jpg", jpeg.tobytes(), "image/jpeg")
+            files["snapshot_image"] = ("snapshot.jpg", _encode_jpeg(snapshot_image), "image/jpeg")
 
-        requests.post(
-            f"{DASHBOARD_URL}/alert",
+        resp = self.session.post(
+            f"{self.base_url}/alert",
             data=data,
             files=files,
-            timeout=0.5
+            timeout=REQUEST_TIMEOUT
         )
+        resp.raise_for_status()
         print(f"[INFO] Alert posted for Person {person_id} at {location}")
-    except Exception as e:
-        print(f"[ERROR] Failed to post alert: {e}")
+
+
+_sender = None
+_sender_lock = threading.Lock()
+
+
+def get_sender():
+    """Process-wide DashboardSender, started on first use."""
+    global _sender
+    with _sender_lock:
+        if _sender is None:
+            _sender = DashboardSender()
+            atexit.register(_sender.stop)
+        return _sender
+
+
+def post_frame_to_dashboard(frame, camera_id=None, variant=None):
+    """
+    Queues a frame (BGR array or JPEG bytes) for the Flask dashboard (sent as JPEG raw bytes).
+    variant: the viewer (width, quality) setting the JPEG was encoded for
+    Returns immediately; only the latest frame per camera and setting is sent.
+    """
+    get_sender().send_frame(frame, camera_id, variant)
+
+
+def watch_camera(camera_id, delta=1):
+    """Lists the camera on the dashboard and tracks its viewers; delta=-1 when the camera stops."""
+    get_sender().watch(camera_id, delta)
+
+
+def viewer_settings(camera_id):
+    """(width, quality) settings the camera is being watched at; empty when nobody watches."""
+    return get_sender().viewer_settings(camera_id)
+
+
+def post_alert_to_dashboard(person_id, bbox, note, snapshot_image=None, camera_id=None):
+    """
+    Queues a fall alert with optional snapshot and location for the dashboard.
+    Returns immediately; alerts are sent before frames and retried on failure.
+    """
+    get_sender().send_alert(person_id, bbox, note, snapshot_image, camera_id)
+
+
+def post_detection_alerts(detections, note, snapshot_image=None, camera_id=None, captured_at=None):
+    """
+    Queues one alert per row of a Detections (e.g. the falls of one frame),
+    using each row's track ID and (x, y, w, h) box.
+    The shared snapshot is encoded once instead of once per alert.
+    captured_at: time.monotonic() of the frame the falls were seen in
+    """
+    if len(detections) > 1 and snapshot_image is not None:
+        snapshot_image = _encode_jpeg(snapshot_image)
+    sender = get_sender()
+    for track_id, bbox in zip(detections.track_ids.tolist(), detections.boxes.astype(int).tolist()):
+        sender.send_alert(str(track_id), tuple(bbox), note, snapshot_image, camera_id, captured_at)
@@ -0,0 +1,142 @@
+# alert_store.py
+import queue
+import sqlite3
+import threading
+import time
+
+COLUMNS = ("ts", "timestamp", "camera_id", "person_id", "location", "bbox", "note", "snapshot")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,          -- unix time, used for range queries
+    timestamp TEXT,            -- display timestamp (YYYYmmdd_HHMMSS)
+    camera_id TEXT,
+    person_id TEXT,
+    location TEXT,
+    bbox TEXT,
+    note TEXT,
+    snapshot TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_ts ON alerts (ts);
+CREATE INDEX IF NOT EXISTS idx_alerts_camera_ts ON alerts (camera_id, ts);
+CREATE INDEX IF NOT EXISTS idx_alerts_person_ts ON alerts (person_id, ts);
+"""
+
+
+class SQLiteAlertStore:
+    def __init__(self, path="alerts.db", batch_size=200, flush_interval=0.1):
+        """
+        Persistent alert history in SQLite (WAL mode), indexed by time,
+        camera and person/track ID.
+        Writes are queued and committed in batches by a background thread;
+        IDs are SQLite row IDs, so clients can page with "alerts after id X".
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._pending = queue.Queue()
+        self._cond = threading.Condition()
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        conn.commit()
+        self.last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM alerts").fetchone()[0]
+
+        self._writer = threading.Thread(target=self._write_loop, name="alert-writer", daemon=True)
+        self._writer.start()
+
+    def _conn(self):
+        """One connection per thread; WAL lets readers run alongside the writer."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, alert):
+        """Queues an alert dict for the writer thread; `ts` defaults to now."""
+        alert = dict(alert)
+        alert.setdefault("ts", time.time())
+        self._pending.put(tuple(alert.get(col) for col in COLUMNS))
+
+    @property
+    def pending(self):
+        """Alerts queued but not yet committed."""
+        return self._pending.qsize()
+
+    def flush(self, timeout=None):
+        """Blocks until every alert queued so far is committed."""
+        done = threading.Event()
+        self._pending.put(done)
+        return done.wait(timeout)
+
+    def _write_loop(self):
+        conn = self._conn()
+        insert = f"INSERT INTO alerts ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+        while True:
+            batch, waiters = [], []
+            item = self._pending.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._pending.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+
+            if batch:
+                try:
+                    with conn:
+                        conn.executemany(insert, batch)
+                    last_id = conn.execute("SELECT MAX(id) FROM alerts").fetchone()[0]
+                    with self._cond:
+                        self.last_id = last_id
+                        self._cond.notify_all()
+                except sqlite3.Error as e:
+                    print(f"[ERROR] Failed to store {len(batch)} alerts: {e}")
+            for waiter in waiters:
+                waiter.set()
+
+    def query(self, camera_id=None, person_id=None, since=None, until=None,
+              after_id=None, before_id=None, limit=100, newest_first=True):
+        """
+        Filtered, paginated alert query.
+        since / until: unix time range
+        after_id / before_id: keyset pagination cursors
+        """
+        where, args = [], []
+        for clause, value in (("camera_id = ?", camera_id), ("person_id = ?", person_id),
+                              ("ts >= ?", since), ("ts < ?", until),
+                              ("id > ?", after_id), ("id < ?", before_id)):
+            if value is not None:
+                where.append(clause)
+                args.append(value)
+        sql = "SELECT * FROM alerts"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY id {'DESC' if newest_first else 'ASC'} LIMIT ?"
+        args.append(limit)
+        return [dict(row) for row in self._conn().execute(sql, args)]
+
+    def since(self, after_id=0, limit=100):
+        """Alerts with id > after_id, oldest first."""
+        return self.query(after_id=after_id, limit=limit, newest_first=False)
+
+    def recent(self, limit=50):
+        """Newest alerts first."""
+        return self.query(limit=limit)
+
+    def wait(self, after_id, timeout=None):
+        """Blocks until an alert newer than after_id is committed; returns True if one is."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.last_id > after_id, timeout)
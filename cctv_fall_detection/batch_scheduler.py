@@ -0,0 +1,112 @@
+# batch_scheduler.py
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import tracing
+
+
+class BatchScheduler:
+    def __init__(self, model, max_batch_size=8, max_latency=0.030):
+        """
+        Gathers frames from many callers into one batched model call.
+        model: callable taking a list of frames, e.g. YOLO("yolov8n-pose.pt")
+        max_batch_size: max frames per model call
+        max_latency: max seconds the oldest pending frame waits for the batch to fill
+        """
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+
+        self._pending = OrderedDict()  # key -> (frame, future, submitted_at)
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+        # Stats
+        self.batches = 0
+        self.frames = 0
+        self.superseded = 0
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="batch-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            for _, future, _ in self._pending.values():
+                future.set_result(None)
+            self._pending.clear()
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def submit(self, key, frame):
+        """
+        Queue a frame for the next batch and return a Future with its result.
+        Latest-frame semantics: a new frame for a key that is still pending
+        replaces the old one, whose future resolves to None.
+        Use distinct keys (e.g. frame numbers) to batch several frames of one stream.
+        """
+        future = Future()
+        with self._cond:
+            if not self._running:
+                future.set_result(None)
+                return future
+            old = self._pending.pop(key, None)
+            if old is not None:
+                old[1].set_result(None)
+                self.superseded += 1
+            self._pending[key] = (frame, future, time.monotonic())
+            self._cond.notify_all()
+        return future
+
+    def infer(self, key, frame):
+        """Blocking submit: returns this frame's result, or None if it was dropped."""
+        return self.submit(key, frame).result()
+
+    def _next_batch(self):
+        with self._cond:
+            while self._running and not self._pending:
+                self._cond.wait()
+            if not self._running:
+                return []
+
+            # Wait until the batch is full or the oldest frame hits its deadline
+            oldest = next(iter(self._pending.values()))[2]
+            deadline = oldest + self.max_latency
+            while self._running and len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = []
+            while self._pending and len(batch) < self.max_batch_size:
+                _, item = self._pending.popitem(last=False)
+                batch.append(item)
+            return batch
+
+    def _run(self):
+        while self._running:
+            batch = self._next_batch()
+            if not batch:
+                continue
+
+            frames = [frame for frame, _, _ in batch]
+            try:
+                with tracing.span("batch_infer", size=len(frames)):
+                    results = self.model(frames, verbose=False)
+            except Exception as e:
+                print(f"[ERROR] Batched inference failed: {e}")
+                for _, future, _ in batch:
+                    future.set_result(None)
+                continue
+
+            self.batches += 1
+            self.frames += len(frames)
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
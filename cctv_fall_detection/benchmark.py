@@ -0,0 +1,308 @@
+# benchmark.py
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+import requests
+
+import alert_client
+import event_log
+import run_engine
+from clip_buffer import ClipExporter
+from inference_backend import BACKENDS, PoseResult, load_model
+
+# ------------------- CONFIG -------------------
+# post: handing the frame / alerts to the sender; send: the sender thread's request building and (stub) post
+STAGES = ("decode", "infer", "track", "heuristic", "annotate", "encode", "post", "send")
+MAX_REGRESSION = 0.15   # allowed relative slowdown vs the baseline (fps, per-stage p95, peak RSS)
+MIN_STAGE_MS = 0.5      # absolute slack, so sub-millisecond stages don't fail on noise
+SYNTHETIC_SIZE = (1280, 720)
+
+
+# ------------------- SYNTHETIC CLIP -------------------
+def synthetic_people(frame_index, people, width, height):
+    """
+    Deterministic COCO keypoints for `people` walkers; every 8th person falls
+    for a while every 150 frames, so the fall logic and alerts get exercised.
+    Returns (N, 17, 3).
+    """
+    kpts = np.zeros((people, 17, 3), np.float32)
+    for p in range(people):
+        x = (40 + p * 97 + frame_index * (1 + p % 3)) % (width - 120)
+        y = 60 + (p * 53) % (height - 240)
+        fallen = p % 8 == 0 and (frame_index + p * 7) % 150 > 110
+        if fallen:
+            torso = [(x, y + 100), (x, y + 140), (x + 90, y + 100), (x + 90, y + 140)]
+        else:
+            torso = [(x, y), (x + 40, y), (x, y + 80), (x + 40, y + 80)]
+        kpts[p, [5, 6, 11, 12], :2] = torso
+        kpts[p, 0, :2] = (x + 20, y - 30)
+        kpts[p, [13, 14, 15, 16], :2] = [(x, y + 120), (x + 40, y + 120), (x, y + 160), (x + 40, y + 160)]
+        kpts[p, [0, 5, 6, 11, 12, 13, 14, 15, 16], 2] = 0.9
+    return kpts
+
+
+def synthetic_clip(frames, people, width, height, quality=85):
+    """JPEG-encoded synthetic frames with the people drawn in, plus their keypoints."""
+    rng = np.random.default_rng(0)
+    background = cv2.GaussianBlur(rng.integers(0, 255, (height, width, 3), dtype=np.uint8), (21, 21), 0)
+    clip = []
+    for i in range(frames):
+        kpts = synthetic_people(i, people, width, height)
+        frame = background.copy()
+        for person in kpts:
+            x0, y0 = person[:, :2][person[:, 2] > 0].min(axis=0).astype(int)
+            x1, y1 = person[:, :2][person[:, 2] > 0].max(axis=0).astype(int)
+            cv2.rectangle(frame, (x0, y0), (x1, y1), (60, 60, 180), -1)
+        ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        clip.append((jpeg.tobytes(), kpts))
+    return clip
+
+
+class ReplayPoseModel:
+    """Stands in for YOLOv8-pose on synthetic clips: returns the keypoints the clip was drawn from."""
+    def __init__(self, clip):
+        self.keypoints = [kpts for _, kpts in clip]
+        self.index = 0
+
+    def __call__(self, frame, verbose=False):
+        kpts = self.keypoints[self.index % len(self.keypoints)]
+        self.index += 1
+        visible = kpts[:, :, 2] > 0
+        lo = np.where(visible[..., None], kpts[:, :, :2], np.inf).min(axis=1)
+        hi = np.where(visible[..., None], kpts[:, :, :2], -np.inf).max(axis=1)
+        boxes = np.concatenate([lo, hi], axis=1).astype(np.float32)
+        return [PoseResult(frame, boxes, np.full(len(kpts), 0.9, np.float32), kpts.copy())]
+
+
+# ------------------- STUBBED SINKS -------------------
+class StubResponse:
+    status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+
+class StubSession:
+    """
+    Replaces the dashboard HTTP session: requests are built (multipart encoding
+    included) and timed like the real ones, but nothing leaves the process.
+    """
+    def __init__(self):
+        self.posts = 0
+        self.bytes = 0
+        self.durations = []  # seconds per post, on the sender thread
+
+    def post(self, url, data=None, files=None, **kwargs):
+        t0 = time.perf_counter()
+        prepared = requests.Request("POST", url, data=data, files=files, params=kwargs.get("params"),
+                                    headers=kwargs.get("headers"), json=kwargs.get("json")).prepare()
+        self.posts += 1
+        self.bytes += len(prepared.body or b"")
+        self.durations.append(time.perf_counter() - t0)
+        return StubResponse()
+
+    def close(self):
+        pass
+
+
+def stub_sinks(out_dir):
+    """Real sender / event log / clip code paths, with the network replaced and files in out_dir."""
+    sender = alert_client.DashboardSender()
+    sender.session = StubSession()
+    alert_client._sender = sender
+    event_log.LOG_DIR = os.path.join(out_dir, "event_logs")
+    event_log._event_log = None
+    run_engine._clip_exporter = ClipExporter(out_dir=os.path.join(out_dir, "clips"))
+    return sender
+
+
+# ------------------- MEASUREMENT -------------------
+def peak_rss_mb():
+    """Peak resident set size of this process, or None where it can't be read."""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 1024 ** 2
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KB on Linux
+
+
+def summarize(samples):
+    ms = np.asarray(samples) * 1000
+    return {
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+def video_frames(path, limit):
+    """Encoded frames from a recording, so decode is measured like it is for the other stages."""
+    cap = cv2.VideoCapture(path)
+    clip = []
+    while len(clip) < limit:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        clip.append((cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes(), None))
+    cap.release()
+    return clip
+
+
+def run_benchmark(clip, model, tracker="iou", warmup=10, sender=None):
+    """
+    Push every frame through decode -> pose -> tracking -> fall heuristic ->
+    annotation -> JPEG encode -> dashboard post, timing each stage.
+    sender: the stub_sinks sender; it is stopped (queued alerts sent) before its
+    per-post times are read into the "send" stage.
+    """
+    state = run_engine.CameraState("bench", tracker=tracker, motion_gate=False)
+    samples = {stage: [] for stage in STAGES}
+    alerts = 0
+    warmup = min(warmup, len(clip) // 5)
+    started = time.perf_counter()
+    for i, (jpeg, _) in enumerate(clip):
+        if i == warmup:
+            started = time.perf_counter()
+            samples = {stage: [] for stage in STAGES}
+            if sender is not None:
+                sender.session.durations.clear()
+        timings = {}
+        t0 = time.perf_counter()
+        frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+        t1 = time.perf_counter()
+        result = model(frame, verbose=False)[0]
+        t2 = time.perf_counter()
+        annotated, falls = run_engine.process_result(state, frame, result, timings)
+        t3 = time.perf_counter()
+        ok, encoded = cv2.imencode(".jpg", annotated, [cv2.IMWRITE_JPEG_QUALITY, run_engine.FRAME_JPEG_QUALITY])
+        encoded = encoded.tobytes()
+        t4 = time.perf_counter()
+        state.clip_buffer.add_jpeg(time.monotonic(), encoded)
+        run_engine.safe_post_frame(encoded, state.camera_id)
+        if len(falls):
+            alerts += len(falls)
+            run_engine.raise_alerts(state, falls, frame, time.monotonic())
+        t5 = time.perf_counter()
+
+        samples["decode"].append(t1 - t0)
+        samples["infer"].append(t2 - t1)
+        for stage in ("track", "heuristic", "annotate"):
+            samples[stage].append(timings[stage])
+        samples["encode"].append(t4 - t3)
+        samples["post"].append(t5 - t4)
+    elapsed = time.perf_counter() - started
+    if sender is not None:
+        sender.stop()
+        samples["send"] = list(sender.session.durations)
+    samples = {stage: values for stage, values in samples.items() if values}
+    measured = len(samples["decode"])
+    return {
+        "frames": measured,
+        "fps": round(measured / elapsed, 2),
+        "alerts": alerts,
+        "stages": {stage: summarize(values) for stage, values in samples.items()},
+    }
+
+
+def regressions(results, baseline, max_regression=MAX_REGRESSION):
+    """Human-readable list of everything that got slower or bigger than allowed."""
+    failed = []
+    if results["fps"] < baseline["fps"] * (1 - max_regression):
+        failed.append(f"fps {results['fps']} < baseline {baseline['fps']}")
+    for stage, stats in results["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if base and stats["p95_ms"] > base["p95_ms"] * (1 + max_regression) + MIN_STAGE_MS:
+            failed.append(f"{stage} p95 {stats['p95_ms']} ms > baseline {base['p95_ms']} ms")
+    if results.get("peak_rss_mb") and baseline.get("peak_rss_mb"):
+        if results["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + max_regression):
+            failed.append(f"peak RSS {results['peak_rss_mb']} MB > baseline {baseline['peak_rss_mb']} MB")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline replay benchmark for the fall-detection pipeline")
+    parser.add_argument("--video", help="recorded clip to replay (default: deterministic synthetic clip)")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--people", type=int, default=20, help="synthetic clip: people per frame")
+    parser.add_argument("--backend", choices=BACKENDS + ("replay",), default=None,
+                        help="pose model backend; 'replay' feeds the synthetic clip's own keypoints "
+                             "(default: replay for synthetic clips, ultralytics for videos)")
+    parser.add_argument("--int8", action="store_true")
+    parser.add_argument("--tracker", choices=["iou", "deepsort"], default="iou")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--max-regression", type=float, default=MAX_REGRESSION)
+    args = parser.parse_args()
+
+    if args.video:
+        clip = video_frames(args.video, args.frames)
+        backend = args.backend or "ultralytics"
+    else:
+        clip = synthetic_clip(args.frames, args.people, *SYNTHETIC_SIZE)
+        backend = args.backend or "replay"
+    if not clip:
+        print("[ERROR] No frames to replay")
+        return 2
+    if backend == "replay":
+        if args.video:
+            print("[ERROR] --backend replay only works with the synthetic clip")
+            return 2
+        model = ReplayPoseModel(clip)
+    else:
+        model = load_model(run_engine.POSE_WEIGHTS, backend, int8=args.int8)
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        sender = stub_sinks(out_dir)
+        results = run_benchmark(clip, model, tracker=args.tracker, sender=sender)
+        # Finish the clips and log records still queued before out_dir is removed
+        run_engine._clip_exporter.stop()
+        if event_log._event_log is not None:
+            event_log._event_log.close()
+
+    results.update({
+        "source": args.video or f"synthetic {args.people} people {SYNTHETIC_SIZE[0]}x{SYNTHETIC_SIZE[1]}",
+        "backend": backend + (" int8" if args.int8 else ""),
+        "tracker": args.tracker,
+        "peak_rss_mb": None if peak_rss_mb() is None else round(peak_rss_mb(), 1),
+        "posts": sender.session.posts,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    })
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"[INFO] {results['frames']} frames, {results['fps']} fps, {results['alerts']} alerts, "
+          f"peak RSS {results['peak_rss_mb']} MB")
+    for stage, stats in results["stages"].items():
+        print(f"  {stage:<10} p50 {stats['p50_ms']:8.2f} ms   p95 {stats['p95_ms']:8.2f} ms"
+              f"   p99 {stats['p99_ms']:8.2f} ms")
+    print(f"[INFO] Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            failed = regressions(results, json.load(f), args.max_regression)
+        if failed:
+            for line in failed:
+                print(f"[ERROR] Regression: {line}")
+            return 1
+        print("[INFO] No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,63 +1,578 @@
-import pandas as pd
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix
-import matplotlib.pyplot as plt
-import seaborn as sns
+import argparse
+import csv
+import glob
+import heapq
+import json
 import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from event_log import read_records, segments
 
 # ---------------- CONFIG ----------------
-GT_FILE = r"C:\cctv\ground_truth.csv"       # Ground truth CSV
-PRED_FILE = r"C:\cctv\predictions.csv"      # Predictions CSV
+GT_FILE = "ground_truth.csv"       # Ground truth CSV (timestamp, ground_truth[, camera_id])
+PRED_FILE = "predictions.csv"      # Predictions CSV (timestamp, prediction[, camera_id]), or an event log
+TOLERANCE = 1.0          # seconds between a ground-truth row and the prediction it is matched to
+CHUNK_ROWS = 500_000     # rows read per chunk; memory stays bounded by this, not by the log length
+EVENT_GAP = 5.0          # seconds; positive frames closer than this belong to the same fall event
+COVERAGE_GAP = 60.0      # seconds; longer holes in the timeline don't count as observed camera time
+DEFAULT_CAMERA = "0"     # camera_id for files without a camera column (same default as the dashboard)
+# Values are fallen-person counts per frame: 0 = no fall, anything above counts as a fall frame
+
 
 # ---------------- LOAD DATA ----------------
-def load_csv(path, ts_col, value_col):
+class UnorderedLogError(ValueError):
+    """A chunk starts before the previous one ended, so the file can't be streamed as is."""
+
+
+def is_event_log(path):
+    """An event_log.py segment, or a directory of them."""
+    if os.path.isdir(path):
+        return bool(segments(path))
+    return path.endswith((".jsonl", ".jsonl.gz"))
+
+
+def _raw_chunks(path, value_col, chunksize):
     if not os.path.exists(path):
         raise FileNotFoundError(f"File not found: {path}")
-    df = pd.read_csv(path)
-    if ts_col not in df.columns or value_col not in df.columns:
-        raise ValueError(f"CSV must contain columns: '{ts_col}' and '{value_col}'")
-    df[ts_col] = pd.to_datetime(df[ts_col], errors='coerce', infer_datetime_format=True)
-    df = df.dropna(subset=[ts_col, value_col])
-    return df
-
-gt_df = load_csv(GT_FILE, ts_col='timestamp', value_col='ground_truth')
-pred_df = load_csv(PRED_FILE, ts_col='timestamp', value_col='prediction')
-
-# ---------------- MERGE DATA ----------------
-merged_df = pd.merge_asof(
-    gt_df.sort_values('timestamp'),
-    pred_df.sort_values('timestamp'),
-    on='timestamp',
-    direction='nearest',
-    tolerance=pd.Timedelta(seconds=1)
-)
-merged_df = merged_df.dropna(subset=['ground_truth', 'prediction'])
-
-y_true = merged_df['ground_truth'].astype(int)
-y_pred = merged_df['prediction'].astype(int)
+    if is_event_log(path):
+        yield from _event_log_chunks(path, value_col, chunksize)
+        return
+    for df in pd.read_csv(path, chunksize=chunksize):
+        if "timestamp" not in df.columns or value_col not in df.columns:
+            raise ValueError(f"{path}: CSV must contain columns: 'timestamp' and '{value_col}'")
+        yield _normalize(df, value_col)
+
+
+def _event_log_chunks(path, value_col, chunksize):
+    """Per-frame engine records; the number of people currently counted as fallen is the value."""
+    local_tz = datetime.now().astimezone().tzinfo  # ground truth is labelled in local time
+    rows = []
+    records = read_records(path, record_type="frame")
+    while True:
+        for record in records:
+            rows.append((str(record["camera_id"]), record["ts"], record["falls"]))
+            if len(rows) >= chunksize:
+                break
+        if not rows:
+            return
+        df = pd.DataFrame(rows, columns=["camera_id", "ts", value_col])
+        df["timestamp"] = pd.to_datetime(df["ts"], unit="s", utc=True).dt.tz_convert(local_tz).dt.tz_localize(None)
+        yield _normalize(df, value_col)
+        rows = []
+
+
+def read_chunks(path, value_col, chunksize=CHUNK_ROWS):
+    """
+    Yields time-sorted DataFrames (camera_id, timestamp, <value_col>) from one CSV
+    or event log (a segment or a directory of them).
+    The file has to be time-ordered across chunks, as the engine writes it;
+    UnorderedLogError otherwise (see sort_file).
+    """
+    last = None
+    for df in _raw_chunks(path, value_col, chunksize):
+        if df.empty:
+            continue
+        if last is not None and df["timestamp"].iloc[0] < last:
+            raise UnorderedLogError(f"{path} is not time-ordered")
+        last = df["timestamp"].iloc[-1]
+        yield df
+
+
+def load_table(path, value_col):
+    """Whole file as one time-sorted DataFrame, for files that fit in memory like hand-labelled ground truth."""
+    chunks = list(_raw_chunks(path, value_col, CHUNK_ROWS))
+    if not chunks:
+        return pd.DataFrame({"camera_id": [], "timestamp": pd.to_datetime([]).astype("datetime64[ns]"),
+                             value_col: np.zeros(0, np.int64)})
+    return pd.concat(chunks).sort_values("timestamp", kind="stable").reset_index(drop=True)
+
+
+def sort_file(path, value_col, tmp_dir, chunksize=CHUNK_ROWS):
+    """
+    External merge sort by timestamp for hand-made / concatenated files:
+    sorted runs of `chunksize` rows on disk, merged row by row. Returns the sorted CSV's path.
+    """
+    runs = []
+    for i, df in enumerate(_raw_chunks(path, value_col, chunksize)):
+        run = os.path.join(tmp_dir, f"{value_col}_run{i}.csv")
+        # Fixed-width ISO timestamps sort as strings, so the merge needs no parsing
+        df.to_csv(run, index=False, date_format="%Y-%m-%d %H:%M:%S.%f")
+        runs.append(run)
+    out = os.path.join(tmp_dir, f"{value_col}_sorted.csv")
+    files = [open(run, newline="") for run in runs]
+    try:
+        readers = [csv.reader(f) for f in files]
+        header = [next(reader) for reader in readers][:1]
+        ts = header[0].index("timestamp") if header else 0
+        with open(out, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerows(header)
+            writer.writerows(heapq.merge(*readers, key=lambda row: row[ts]))
+    finally:
+        for f in files:
+            f.close()
+    return out
+
+
+def _normalize(df, value_col):
+    df = df.assign(
+        camera_id=df["camera_id"].astype(str) if "camera_id" in df.columns else DEFAULT_CAMERA,
+        timestamp=pd.to_datetime(df["timestamp"], errors="coerce").astype("datetime64[ns]"),
+    )
+    df = df.dropna(subset=["timestamp", value_col])
+    df[value_col] = df[value_col].astype(np.int64)
+    return df[["camera_id", "timestamp", value_col]].sort_values("timestamp", kind="stable")
+
+
+def aligned_chunks(gt_chunks, pred_chunks, tolerance=TOLERANCE):
+    """
+    Streaming merge_asof: every ground-truth row gets the nearest prediction of the
+    same camera within `tolerance`.
+    Two cursors: predictions are read one chunk at a time, only as far as the next
+    unmatched ground-truth row needs, and rows more than `tolerance` behind that row
+    are dropped, so memory stays at about one chunk of each however sparse either side is.
+    """
+    tol = pd.Timedelta(seconds=tolerance)
+    pred_chunks = iter(pred_chunks)
+    pending = None
+    exhausted = False
+    for gt in gt_chunks:
+        if gt.empty:
+            continue
+        if pending is None:
+            pending = gt.iloc[:0][["camera_id", "timestamp"]].assign(prediction=np.int64(0))
+        gt_ts = gt["timestamp"].to_numpy()
+        start = 0
+        while start < len(gt):
+            cursor = gt_ts[start]
+            while not exhausted and (pending.empty or pending["timestamp"].iloc[-1] <= cursor + tol):
+                try:
+                    chunk = next(pred_chunks)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending = pd.concat([pending, chunk])
+                pending = pending[pending["timestamp"] >= cursor - tol]
+            # Ground-truth rows whose whole tolerance window has been read
+            if exhausted:
+                end = len(gt)
+            else:
+                last = pending["timestamp"].iloc[-1].to_datetime64()
+                end = max(int(np.searchsorted(gt_ts, last - tol.to_timedelta64(), side="left")), start + 1)
+            yield pd.merge_asof(gt.iloc[start:end], pending, on="timestamp", by="camera_id",
+                                direction="nearest", tolerance=tol)
+            start = end
+            if start < len(gt):
+                pending = pending[pending["timestamp"] >= gt_ts[start] - tol]
+
+
+# ---------------- EVENTS ----------------
+class EventBuilder:
+    def __init__(self, gap=EVENT_GAP):
+        """
+        Groups fall frames into (start, end) events: a fall frame less than `gap`
+        seconds after the previous one continues its event, so single missed
+        frames don't split a fall in two. Works across chunk boundaries.
+        """
+        self.gap = gap
+        self.events = []
+        self.open = None
+
+    def add(self, seconds, positive):
+        ts = seconds[positive]
+        if not len(ts):
+            return
+        breaks = np.flatnonzero(np.diff(ts) > self.gap)
+        starts = ts[np.concatenate(([0], breaks + 1))]
+        ends = ts[np.concatenate((breaks, [len(ts) - 1]))]
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            if self.open is not None and start - self.open[1] <= self.gap:
+                self.open = (self.open[0], end)
+            else:
+                self.close()
+                self.open = (start, end)
+
+    def close(self):
+        if self.open is not None:
+            self.events.append(self.open)
+            self.open = None
+        return self.events
+
+
+def match_events(gt_events, pred_events, tolerance=TOLERANCE):
+    """
+    A ground-truth event is detected by the first predicted event overlapping it
+    (give or take `tolerance`); predicted events that overlap none are false alarms.
+    Returns (delays of detected events in seconds, missed count, false alarm count).
+    """
+    delays, missed, used = [], 0, set()
+    j = 0
+    for g_start, g_end in gt_events:
+        while j < len(pred_events) and pred_events[j][1] < g_start - tolerance:
+            j += 1
+        hits = [k for k in range(j, len(pred_events)) if pred_events[k][0] <= g_end + tolerance]
+        hits = [k for k in hits if pred_events[k][1] >= g_start - tolerance]
+        if hits:
+            delays.append(max(0.0, pred_events[hits[0]][0] - g_start))
+            used.update(hits)
+        else:
+            missed += 1
+    return delays, missed, len(pred_events) - len(used)
+
 
 # ---------------- METRICS ----------------
-# ---------------- METRICS ----------------
-acc = accuracy_score(y_true, y_pred)
-prec = precision_score(y_true, y_pred, average='weighted', zero_division=0)
-rec = recall_score(y_true, y_pred, average='weighted', zero_division=0)
-f1 = f1_score(y_true, y_pred, average='weighted', zero_division=0)
-cm = confusion_matrix(y_true, y_pred)
+class CameraStats:
+    __slots__ = ("frames", "covered_seconds", "last_seen", "gt", "pred",
+                 "gt_events", "delays", "missed", "false_alarms")
+
+    def __init__(self):
+        self.frames = 0
+        self.covered_seconds = 0.0
+        self.last_seen = None
+        self.gt = EventBuilder()
+        self.pred = EventBuilder()
+        self.gt_events = 0
+        self.delays = []
+        self.missed = 0
+        self.false_alarms = 0
+
+    def finish(self, tolerance):
+        gt_events, pred_events = self.gt.close(), self.pred.close()
+        self.delays, self.missed, self.false_alarms = match_events(gt_events, pred_events, tolerance)
+        self.gt_events = len(gt_events)
+        self.gt = self.pred = None  # only the counts travel back from worker processes
 
-print("===== Accuracy Metrics =====")
-print(f"Accuracy : {acc*100:.2f}%")
-print(f"Precision: {prec*100:.2f}%")
-print(f"Recall   : {rec*100:.2f}%")
-print(f"F1-Score : {f1*100:.2f}%")
-print("Confusion Matrix:")
-print(cm)
+    def merge(self, other):
+        self.frames += other.frames
+        self.covered_seconds += other.covered_seconds
+        self.gt_events += other.gt_events
+        self.delays += other.delays
+        self.missed += other.missed
+        self.false_alarms += other.false_alarms
+
+
+class Evaluation:
+    def __init__(self):
+        """Running totals of one or more evaluated file pairs; small enough to send between processes."""
+        self.confusion = {}  # (true, predicted) -> frames
+        self.cameras = {}    # camera_id -> CameraStats
+        self.unmatched = 0   # ground-truth rows without a prediction within the tolerance
+        self.files = 0
+
+    def add_chunk(self, merged):
+        self.unmatched += int(merged["prediction"].isna().sum())
+        merged = merged.dropna(subset=["prediction"])
+        if merged.empty:
+            return
+        y_true = merged["ground_truth"].to_numpy(np.int64)
+        y_pred = merged["prediction"].to_numpy(np.int64)
+        pairs, counts = np.unique(np.stack([y_true, y_pred], axis=1), axis=0, return_counts=True)
+        for (t, p), n in zip(pairs.tolist(), counts.tolist()):
+            self.confusion[(t, p)] = self.confusion.get((t, p), 0) + n
+
+        seconds = merged["timestamp"].to_numpy("datetime64[ns]").astype(np.int64) / 1e9
+        for camera_id, rows in merged.groupby("camera_id", sort=False).indices.items():
+            stats = self.cameras.get(camera_id)
+            if stats is None:
+                stats = self.cameras[camera_id] = CameraStats()
+            ts = seconds[rows]
+            gaps = np.diff(ts if stats.last_seen is None else np.concatenate(([stats.last_seen], ts)))
+            stats.covered_seconds += float(gaps[gaps <= COVERAGE_GAP].sum())
+            stats.last_seen = float(ts[-1])
+            stats.frames += len(rows)
+            stats.gt.add(ts, y_true[rows] > 0)
+            stats.pred.add(ts, y_pred[rows] > 0)
+
+    def finish(self, tolerance=TOLERANCE):
+        for stats in self.cameras.values():
+            stats.finish(tolerance)
+        return self
+
+    def merge(self, other):
+        for key, n in other.confusion.items():
+            self.confusion[key] = self.confusion.get(key, 0) + n
+        for camera_id, stats in other.cameras.items():
+            if camera_id in self.cameras:
+                self.cameras[camera_id].merge(stats)
+            else:
+                self.cameras[camera_id] = stats
+        self.unmatched += other.unmatched
+        self.files += other.files
+        return self
+
+    def confusion_matrix(self):
+        """(labels, matrix) with actual labels as rows and predicted labels as columns."""
+        labels = sorted({label for pair in self.confusion for label in pair})
+        index = {label: i for i, label in enumerate(labels)}
+        cm = np.zeros((len(labels), len(labels)), np.int64)
+        for (t, p), n in self.confusion.items():
+            cm[index[t], index[p]] = n
+        return labels, cm
+
+    def summary(self):
+        labels, cm = self.confusion_matrix()
+        total = int(cm.sum())
+        tp = np.diag(cm).astype(np.float64)
+        support = cm.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            precision = np.nan_to_num(tp / cm.sum(axis=0))
+            recall = np.nan_to_num(tp / support)
+            f1 = np.nan_to_num(2 * precision * recall / (precision + recall))
+        weights = support / total if total else support
+        # Fall vs no fall, whatever the count
+        fall_tp = sum(n for (t, p), n in self.confusion.items() if t > 0 and p > 0)
+        fall_true = sum(n for (t, _), n in self.confusion.items() if t > 0)
+        fall_pred = sum(n for (_, p), n in self.confusion.items() if p > 0)
+
+        delays = [d for s in self.cameras.values() for d in s.delays]
+        gt_events = sum(s.gt_events for s in self.cameras.values())
+        false_alarms = sum(s.false_alarms for s in self.cameras.values())
+        camera_hours = sum(s.covered_seconds for s in self.cameras.values()) / 3600.0
+        return {
+            "files": self.files,
+            "frame": {
+                "frames": total,
+                "unmatched": self.unmatched,
+                "accuracy": float(tp.sum() / total) if total else 0.0,
+                "precision": float((precision * weights).sum()),
+                "recall": float((recall * weights).sum()),
+                "f1": float((f1 * weights).sum()),
+                "fall_precision": fall_tp / fall_pred if fall_pred else 0.0,
+                "fall_recall": fall_tp / fall_true if fall_true else 0.0,
+                "labels": labels,
+                "confusion_matrix": cm.tolist(),
+            },
+            "event": {
+                "fall_events": gt_events,
+                "detected": len(delays),
+                "missed": gt_events - len(delays),
+                "event_recall": len(delays) / gt_events if gt_events else 0.0,
+                "false_alarms": false_alarms,
+                "camera_hours": round(camera_hours, 3),
+                "false_alarms_per_camera_hour": false_alarms / camera_hours if camera_hours else 0.0,
+                "mean_delay_s": float(np.mean(delays)) if delays else None,
+                "p95_delay_s": float(np.percentile(delays, 95)) if delays else None,
+            },
+            "cameras": {
+                camera_id: {
+                    "frames": s.frames,
+                    "camera_hours": round(s.covered_seconds / 3600.0, 3),
+                    "fall_events": s.gt_events,
+                    "detected": len(s.delays),
+                    "false_alarms": s.false_alarms,
+                    "false_alarms_per_camera_hour": (s.false_alarms * 3600.0 / s.covered_seconds
+                                                     if s.covered_seconds else 0.0),
+                    "mean_delay_s": float(np.mean(s.delays)) if s.delays else None,
+                }
+                for camera_id, s in sorted(self.cameras.items())
+            },
+        }
+
+
+# ---------------- EVALUATION ----------------
+def evaluate_pair(gt_path, pred_path, tolerance=TOLERANCE, chunksize=CHUNK_ROWS):
+    """Streams one ground-truth / prediction file pair through the metrics."""
+    try:
+        return _evaluate_sorted(gt_path, pred_path, tolerance, chunksize)
+    except UnorderedLogError as e:
+        print(f"[WARN] {e}, sorting on disk first")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        return _evaluate_sorted(sort_file(gt_path, "ground_truth", tmp_dir, chunksize),
+                                sort_file(pred_path, "prediction", tmp_dir, chunksize),
+                                tolerance, chunksize)
+
+
+def _evaluate_sorted(gt_path, pred_path, tolerance, chunksize):
+    evaluation = Evaluation()
+    evaluation.files = 1
+    gt_chunks = read_chunks(gt_path, "ground_truth", chunksize)
+    pred_chunks = read_chunks(pred_path, "prediction", chunksize)
+    for merged in aligned_chunks(gt_chunks, pred_chunks, tolerance):
+        evaluation.add_chunk(merged)
+    return evaluation.finish(tolerance)
+
+
+def pair_files(gt, pred):
+    """
+    gt / pred: two files, or two directories (or globs) whose files are paired by name,
+    e.g. gt/cam12_0901.csv with pred/cam12_0901.csv.
+    An event log directory as pred is one stream that every ground-truth file is matched against.
+    """
+    def expand(spec):
+        if os.path.isdir(spec):
+            spec = os.path.join(spec, "*")
+        return sorted(p for p in glob.glob(spec) if os.path.isfile(p))
+
+    if os.path.isdir(pred) and is_event_log(pred):
+        return [(path, pred) for path in expand(gt)]
+    gt_files, pred_files = expand(gt), expand(pred)
+    if len(gt_files) == 1 and len(pred_files) == 1:
+        return [(gt_files[0], pred_files[0])]
+    preds = {os.path.splitext(os.path.basename(p))[0]: p for p in pred_files}
+    pairs = []
+    for path in gt_files:
+        name = os.path.splitext(os.path.basename(path))[0]
+        if name in preds:
+            pairs.append((path, preds[name]))
+        else:
+            print(f"[WARN] No predictions for {path}")
+    return pairs
+
+
+def split_by_camera(path, value_col, out_dir, chunksize=CHUNK_ROWS):
+    """
+    Streams a file or event log once into one CSV per camera in out_dir,
+    keeping each camera's rows in file order. Returns {camera_id: csv_path}.
+    """
+    paths, files = {}, {}
+    try:
+        for df in _raw_chunks(path, value_col, chunksize):
+            for camera_id, rows in df.groupby("camera_id", sort=False):
+                f = files.get(camera_id)
+                if f is None:
+                    paths[camera_id] = os.path.join(out_dir, f"{value_col}_{len(paths)}.csv")
+                    f = files[camera_id] = open(paths[camera_id], "w", newline="")
+                rows.to_csv(f, header=f.tell() == 0, index=False, date_format="%Y-%m-%d %H:%M:%S.%f")
+    finally:
+        for f in files.values():
+            f.close()
+    return paths
+
+
+def camera_tasks(pairs, tmp_dir, chunksize=CHUNK_ROWS):
+    """
+    (gt_path, pred_path) pairs with event logs split into one pair per camera, so a
+    single log holding every camera is still evaluated in parallel. The log is split once
+    however many ground-truth files it is paired with.
+    """
+    tasks = []
+    split_logs = {}
+    empty = os.path.join(tmp_dir, "prediction_empty.csv")
+    with open(empty, "w") as f:
+        f.write("camera_id,timestamp,prediction\n")
+    for i, (gt_path, pred_path) in enumerate(pairs):
+        if not is_event_log(pred_path):
+            tasks.append((gt_path, pred_path))
+            continue
+        if pred_path not in split_logs:
+            log_dir = os.path.join(tmp_dir, f"log{len(split_logs)}")
+            os.makedirs(log_dir)
+            split_logs[pred_path] = split_by_camera(pred_path, "prediction", log_dir, chunksize)
+        gt_dir = os.path.join(tmp_dir, f"gt{i}")
+        os.makedirs(gt_dir)
+        preds = split_logs[pred_path]
+        # Cameras without predictions still count: their ground truth is all unmatched
+        tasks.extend((gt_camera, preds.get(camera_id, empty))
+                     for camera_id, gt_camera in split_by_camera(gt_path, "ground_truth", gt_dir, chunksize).items())
+    return tasks
+
+
+def evaluate(pairs, tolerance=TOLERANCE, chunksize=CHUNK_ROWS, workers=None):
+    """
+    Evaluates (gt_path, pred_path) pairs, one process per pair, or per camera for
+    event logs; returns the combined Evaluation.
+    """
+    total = Evaluation()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tasks = camera_tasks(pairs, tmp_dir, chunksize)
+        if len(tasks) <= 1 or workers == 1:
+            for gt_path, pred_path in tasks:
+                total.merge(evaluate_pair(gt_path, pred_path, tolerance, chunksize))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(evaluate_pair, gt_path, pred_path, tolerance, chunksize)
+                           for gt_path, pred_path in tasks]
+                for future in futures:
+                    total.merge(future.result())
+    total.files = len(pairs)
+    return total
 
 
 # ---------------- PLOT HEATMAP ----------------
-plt.figure(figsize=(8,6))
-sns.heatmap(cm, annot=True, fmt='d', cmap='Blues',
-            xticklabels=[f'P{i}' for i in range(cm.shape[0])],
-            yticklabels=[f'P{i}' for i in range(cm.shape[0])])
-plt.xlabel('Predicted')
-plt.ylabel('Actual')
-plt.title('Confusion Matrix')
-plt.show()
+def plot_confusion(labels, cm, path):
+    """Writes the confusion matrix heatmap to `path`; needs matplotlib (seaborn optional), no display."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(8, 6))
+    ticks = [f'P{label}' for label in labels]
+    try:
+        import seaborn as sns
+        sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', xticklabels=ticks, yticklabels=ticks)
+    except ImportError:
+        plt.imshow(cm, cmap='Blues')
+        plt.xticks(range(len(ticks)), ticks)
+        plt.yticks(range(len(ticks)), ticks)
+        for (i, j), n in np.ndenumerate(cm):
+            plt.text(j, i, str(n), ha='center', va='center')
+    plt.xlabel('Predicted')
+    plt.ylabel('Actual')
+    plt.title('Confusion Matrix')
+    plt.savefig(path, bbox_inches='tight')
+    plt.close()
+
+
+def print_summary(summary):
+    frame, event = summary["frame"], summary["event"]
+    print("===== Accuracy Metrics =====")
+    print(f"Files    : {summary['files']}  Frames: {frame['frames']}  (unmatched: {frame['unmatched']})")
+    print(f"Accuracy : {frame['accuracy']*100:.2f}%")
+    print(f"Precision: {frame['precision']*100:.2f}%")
+    print(f"Recall   : {frame['recall']*100:.2f}%")
+    print(f"F1-Score : {frame['f1']*100:.2f}%")
+    print(f"Fall frames: precision {frame['fall_precision']*100:.2f}%, recall {frame['fall_recall']*100:.2f}%")
+    print("Confusion Matrix:")
+    print(np.array(frame["confusion_matrix"]))
+    print("===== Fall Events =====")
+    print(f"Detected : {event['detected']}/{event['fall_events']} ({event['event_recall']*100:.2f}%)")
+    if event["mean_delay_s"] is not None:
+        print(f"Delay    : mean {event['mean_delay_s']:.2f}s, p95 {event['p95_delay_s']:.2f}s")
+    print(f"False alarms: {event['false_alarms']} "
+          f"({event['false_alarms_per_camera_hour']:.3f} per camera-hour over {event['camera_hours']:.2f} h)")
+    if len(summary["cameras"]) > 1:
+        print("Per camera:")
+        for camera_id, c in summary["cameras"].items():
+            print(f"  {camera_id:<12} frames {c['frames']:>9}  events {c['detected']}/{c['fall_events']}"
+                  f"  false alarms {c['false_alarms']} ({c['false_alarms_per_camera_hour']:.3f}/h)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Frame- and event-level accuracy of fall predictions")
+    parser.add_argument("--gt", default=GT_FILE, help="ground-truth CSV, or a directory / glob of them")
+    parser.add_argument("--pred", default=PRED_FILE, help="predictions CSV, or a directory / glob paired by name")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="seconds")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: one per core)")
+    parser.add_argument("--report", help="write the metrics as JSON")
+    parser.add_argument("--plot", help="save the confusion matrix heatmap to this image")
+    args = parser.parse_args()
+
+    pairs = pair_files(args.gt, args.pred)
+    if not pairs:
+        print("[ERROR] Nothing to evaluate")
+        return 2
+    summary = evaluate(pairs, args.tolerance, args.chunk_rows, args.workers).summary()
+    print_summary(summary)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"[INFO] Report written to {args.report}")
+    if args.plot:
+        try:
+            plot_confusion(summary["frame"]["labels"], np.array(summary["frame"]["confusion_matrix"]), args.plot)
+        except ImportError:
+            print("[ERROR] --plot needs matplotlib")
+            return 1
+        print(f"[INFO] Heatmap written to {args.plot}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
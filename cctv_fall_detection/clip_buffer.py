@@ -0,0 +1,147 @@
+# clip_buffer.py
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from metrics import REGISTRY
+
+CLIP_DIR = "fall_clips"
+MAX_PENDING = 16  # clips waiting for the exporter; each holds its own frames (references) until written
+
+
+class ClipBuffer:
+    def __init__(self, seconds=10.0, max_bytes=32 * 1024 * 1024):
+        """
+        Last `seconds` of one camera as JPEG bytes, capped at max_bytes.
+        Timestamps are time.monotonic() values.
+        """
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self.frames = deque()  # (ts, jpeg_bytes)
+        self.total_bytes = 0
+        self._recordings = []  # (end, frames) still collecting, see record()
+        self._lock = threading.Lock()
+
+    def add_jpeg(self, ts, jpeg_bytes):
+        with self._lock:
+            self.frames.append((ts, jpeg_bytes))
+            if self._recordings:
+                for end, frames in self._recordings:
+                    if ts <= end:
+                        frames.append((ts, jpeg_bytes))
+                self._recordings = [(end, frames) for end, frames in self._recordings if ts < end]
+            self.total_bytes += len(jpeg_bytes)
+            cutoff = ts - self.seconds
+            while self.frames and (self.frames[0][0] < cutoff or self.total_bytes > self.max_bytes):
+                _, old = self.frames.popleft()
+                self.total_bytes -= len(old)
+
+    def window(self, start, end):
+        """Frames with start <= ts <= end, oldest first."""
+        with self._lock:
+            return [(ts, jpeg) for ts, jpeg in self.frames if start <= ts <= end]
+
+    def record(self, start, end):
+        """
+        Frames with start <= ts <= end in a list of their own: those buffered now,
+        then each new one up to `end` as it is added. The list doesn't depend on
+        the rolling buffer any more, so it is complete however late it is read.
+        """
+        with self._lock:
+            frames = [(ts, jpeg) for ts, jpeg in self.frames if start <= ts <= end]
+            self._recordings.append((end, frames))
+            return frames
+
+
+class ClipExporter:
+    def __init__(self, out_dir=CLIP_DIR, pre_seconds=4.0, post_seconds=4.0, max_pending=MAX_PENDING):
+        """
+        Writes pre/post-event clips from ClipBuffers on a background thread.
+        export() takes the pre-event frames at once and the post-event ones as
+        they arrive; the writer waits until post_seconds of footage exist, then
+        decodes the JPEGs into an MP4.
+        If the exporter falls behind, new clips are dropped instead of blocking
+        the caller; those and clips that fail to write are counted in .dropped.
+        """
+        self.out_dir = out_dir
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        os.makedirs(out_dir, exist_ok=True)
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        REGISTRY.gauge("clips_dropped_total", "Fall clips not written: exporter behind or write failed",
+                       kind="counter").set_function(lambda: self.dropped)
+        self._thread = threading.Thread(target=self._run, name="clip-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, buffer, event_ts, name):
+        """Queues a clip around event_ts (monotonic); returns the path it will be written to, or None if dropped."""
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]  # ms: one camera can alert twice a second
+        path = os.path.join(self.out_dir, f"{name}_{stamp}.mp4")
+        try:
+            self._queue.put_nowait((buffer.record(event_ts - self.pre_seconds, event_ts + self.post_seconds),
+                                    event_ts, path))
+        except queue.Full:
+            self.dropped += 1
+            print(f"[WARN] Clip exporter is behind, dropping clip {path}")
+            return None
+        return path
+
+    def stop(self, timeout=None):
+        """Writes the clips already queued (each waits for its post-event footage), then ends the thread."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            frames, event_ts, path = item
+            # Requests are queued in event order, so waiting on the head is enough
+            remaining = event_ts + self.post_seconds - time.monotonic()
+            if remaining > 0:
+                time.sleep(remaining)
+            try:
+                written = self._write(path, list(frames))
+            except Exception as e:
+                print(f"[ERROR] Failed to export clip {path}: {e}")
+                written = False
+            if not written:
+                self.dropped += 1
+
+    def _write(self, path, frames):
+        """Returns True once the clip is on disk."""
+        if len(frames) < 2:
+            print(f"[WARN] Not enough buffered frames for clip {path}, not written")
+            return False
+        fps = (len(frames) - 1) / max(frames[-1][0] - frames[0][0], 1e-3)
+        writer = None
+        written = 0
+        try:
+            for _, jpeg in frames:
+                img = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+                if img is None:
+                    continue
+                if writer is None:
+                    h, w = img.shape[:2]
+                    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
+                    if not writer.isOpened():
+                        print(f"[ERROR] Could not open video writer for clip {path}")
+                        return False
+                writer.write(img)
+                written += 1
+        finally:
+            if writer is not None:
+                writer.release()
+        if not written:
+            print(f"[WARN] No decodable frames for clip {path}, not written")
+            return False
+        print(f"[INFO] Saved fall clip {path} ({written} frames)")
+        return True
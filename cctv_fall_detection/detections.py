@@ -0,0 +1,60 @@
+# detections.py
+import numpy as np
+
+from inference_backend import result_arrays
+
+NO_TRACK = -1  # track_ids value for detections without a (confirmed) track
+
+
+class Detections:
+    __slots__ = ("boxes", "scores", "keypoints", "track_ids")
+
+    def __init__(self, boxes, scores=None, keypoints=None, track_ids=None):
+        """
+        One frame's people as columns instead of one object per person.
+        boxes: (N, 4) x, y, w, h
+        scores: (N,) confidences
+        keypoints: (N, 17, 3) x, y, confidence (zeros when the model has no pose head)
+        track_ids: (N,) int64, NO_TRACK until a tracker fills them in
+        """
+        n = len(boxes)
+        self.boxes = boxes
+        self.scores = np.ones(n, np.float32) if scores is None else scores
+        self.keypoints = np.zeros((n, 17, 3), np.float32) if keypoints is None else keypoints
+        self.track_ids = np.full(n, NO_TRACK, np.int64) if track_ids is None else track_ids
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros((0, 4), np.float32))
+
+    @classmethod
+    def from_result(cls, result, class_id=None):
+        """From an ultralytics result or PoseResult; class_id keeps only that class (0 = person)."""
+        boxes, scores, classes, keypoints = result_arrays(result)
+        boxes = boxes.copy()
+        boxes[:, 2:] -= boxes[:, :2]  # xyxy -> xywh
+        dets = cls(boxes, scores, keypoints)
+        if class_id is not None:
+            dets = dets[classes == class_id]
+        return dets
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __getitem__(self, index):
+        """Row subset for a boolean mask or an index array; columns stay arrays."""
+        return Detections(self.boxes[index], self.scores[index], self.keypoints[index], self.track_ids[index])
+
+    def xyxy(self):
+        boxes = np.array(self.boxes, dtype=np.float32)
+        boxes[:, 2:] += boxes[:, :2]
+        return boxes
+
+    def tracked(self):
+        """Rows with a track ID."""
+        return self[self.track_ids != NO_TRACK]
+
+    def to_dicts(self):
+        """[{'id': ..., 'bbox': (x, y, w, h)}, ...], the format older callers expect."""
+        return [{'id': None if tid == NO_TRACK else tid, 'bbox': tuple(box)}
+                for tid, box in zip(self.track_ids.tolist(), self.boxes.astype(int).tolist())]
@@ -1,5 +1,9 @@
 import cv2
 
+# COCO-17 keypoint pairs drawn as limbs
+SKELETON = [(5, 6), (5, 7), (7, 9), (6, 8), (8, 10), (5, 11), (6, 12), (11, 12),
+            (11, 13), (13, 15), (12, 14), (14, 16), (0, 1), (0, 2), (1, 3), (2, 4)]
+
 def draw_bbox(frame, bbox, person_id, fall_detected=False):
     x, y, w, h = bbox
     color = (0, 255, 0) if not fall_detected else (0, 0, 255)
@@ -11,3 +15,29 @@ def draw_bbox(frame, bbox, person_id, fall_detected=False):
     cv2.putText(frame, label, (x, y-10),
                 cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
     return frame
+
+def draw_pose(frame, boxes, keypoints, min_conf=0.5):
+    """
+    Draw (x1, y1, x2, y2) boxes and (N, 17, 3) keypoints in place.
+    Keypoints below min_conf are skipped.
+    """
+    for box, kpts in zip(boxes.astype(int).tolist(), keypoints):
+        cv2.rectangle(frame, (box[0], box[1]), (box[2], box[3]), (255, 128, 0), 2)
+        visible = kpts[:, 2] >= min_conf
+        points = kpts[:, :2].astype(int).tolist()
+        for a, b in SKELETON:
+            if visible[a] and visible[b]:
+                cv2.line(frame, tuple(points[a]), tuple(points[b]), (255, 0, 255), 2)
+        for (x, y), v in zip(points, visible):
+            if v:
+                cv2.circle(frame, (x, y), 3, (0, 255, 255), -1)
+    return frame
+
+def draw_detections(frame, detections, fall_mask=None):
+    """draw_bbox for every tracked row of a Detections; fall_mask marks the rows in alert."""
+    boxes = detections.boxes.astype(int).tolist()
+    falls = [False] * len(boxes) if fall_mask is None else fall_mask.tolist()
+    for bbox, tid, fall in zip(boxes, detections.track_ids.tolist(), falls):
+        if tid >= 0:
+            draw_bbox(frame, bbox, tid, fall)
+    return frame
@@ -0,0 +1,223 @@
+# event_log.py
+import atexit
+import glob
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from metrics import REGISTRY
+
+LOG_DIR = "event_logs"
+SEGMENT_BYTES = 64 * 1024 ** 2   # uncompressed bytes per segment before rotating
+SEGMENT_SECONDS = 3600           # ... or after this long, whichever comes first
+MAX_PENDING = 50_000             # records waiting for the writer; more are dropped, never waited for
+FLUSH_INTERVAL = 1.0             # seconds; uncompressed segments can be tailed this soon
+MAX_BYTES = 10 * 1024 ** 3       # disk budget for closed segments in the directory
+MAX_AGE = 50 * 24 * 3600         # seconds; same window as the fall snapshots
+CLEANUP_INTERVAL = 60            # seconds between retention passes
+OPEN_SUFFIX = ".open"            # segments being written; readers only pick up closed ones
+
+
+def _json_default(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot log {type(value).__name__}")
+
+
+class EventLog:
+    def __init__(self, directory=LOG_DIR, prefix="events", compress=True,
+                 segment_bytes=SEGMENT_BYTES, segment_seconds=SEGMENT_SECONDS, max_pending=MAX_PENDING,
+                 max_bytes=MAX_BYTES, max_age=MAX_AGE):
+        """
+        Structured detection log: one JSON object per line, written by a background thread.
+        - log() only queues the record; serialization and disk I/O happen on the writer
+        - a full queue drops records (counted in .dropped) instead of stalling inference
+        - segments rotate by size and age; closed ones are named
+          <prefix>_<start time>_<pid>.jsonl[.gz], so several processes can share a directory
+        - retention deletes closed segments older than max_age, then the oldest ones
+          until the directory fits in max_bytes; it re-reads the directory each pass,
+          so segments of other processes count (and are deleted) too
+        - an open segment untouched for 2 x segment_seconds can't have a live writer
+          (they rotate sooner): it is left by a crash, and is closed as it is so that
+          retention and readers see it
+        Records may hold NumPy arrays; callers must not modify them after logging.
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.compress = compress
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        os.makedirs(directory, exist_ok=True)
+
+        self.written = 0
+        self.dropped = 0
+        self.segments = 0
+        self.deleted = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._file = None
+        self._path = None
+        records = REGISTRY.gauge("event_log_records_total", "Event log records by outcome", ("outcome",),
+                                 kind="counter")
+        records.set_function(lambda: self.written, "written")
+        records.set_function(lambda: self.dropped, "dropped")
+        REGISTRY.gauge("event_log_segments_deleted_total", "Event log segments deleted by retention",
+                       kind="counter").set_function(lambda: self.deleted)
+        self._thread = threading.Thread(target=self._run, name="event-log", daemon=True)
+        self._thread.start()
+
+    def log(self, record):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout=5.0):
+        """Writes what is queued and closes the current segment."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        self._enforce_retention()
+        next_flush = time.monotonic() + FLUSH_INTERVAL
+        next_cleanup = time.monotonic() + CLEANUP_INTERVAL
+        while True:
+            try:
+                record = self._queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                record = False
+            if record is None:
+                break
+            if record is not False:
+                try:
+                    self._write(json.dumps(record, separators=(",", ":"), default=_json_default) + "\n")
+                except (TypeError, ValueError, OSError) as e:
+                    print(f"[ERROR] Event log write failed: {e}")
+            if self._file is not None and time.monotonic() >= next_flush:
+                if time.monotonic() - self._opened_at > self.segment_seconds:
+                    self._rotate()
+                elif not self.compress:
+                    self._file.flush()  # a gzip flush would cost compression for nothing
+                next_flush = time.monotonic() + FLUSH_INTERVAL
+            if time.monotonic() >= next_cleanup:
+                self._enforce_retention()
+                next_cleanup = time.monotonic() + CLEANUP_INTERVAL
+        self._rotate()
+
+    def _write(self, line):
+        if self._file is None:
+            self._open()
+        data = line.encode()
+        self._file.write(data)
+        self._bytes += len(data)
+        self.written += 1
+        if self._bytes >= self.segment_bytes:
+            self._rotate()
+
+    def _open(self):
+        name = f"{self.prefix}_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.jsonl"
+        if self.compress:
+            name += ".gz"
+        self._path = os.path.join(self.directory, name)
+        if os.path.exists(self._path) or os.path.exists(self._path + OPEN_SUFFIX):
+            # Rotated twice within one second
+            self._path = self._path.replace(".jsonl", f"_{self.segments}.jsonl")
+        raw = open(self._path + OPEN_SUFFIX, "wb")
+        self._file = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=5) if self.compress else raw
+        self._raw = raw
+        self._bytes = 0
+        self._opened_at = time.monotonic()
+
+    def _rotate(self):
+        if self._file is None:
+            return
+        self._file.close()
+        if self._file is not self._raw:
+            self._raw.close()
+        os.replace(self._path + OPEN_SUFFIX, self._path)
+        self._file = None
+        self.segments += 1
+
+    def _recover_orphans(self):
+        cutoff = time.time() - 2 * self.segment_seconds
+        for path in glob.glob(os.path.join(self.directory, f"{self.prefix}_*{OPEN_SUFFIX}")):
+            closed_path = path[:-len(OPEN_SUFFIX)]
+            try:
+                if os.path.getmtime(path) >= cutoff or os.path.exists(closed_path):
+                    continue
+                os.replace(path, closed_path)
+            except OSError:
+                continue  # recovered (or deleted) by another process first
+            print(f"[WARN] Recovered event log segment left open by a crashed writer: {closed_path}")
+
+    def _enforce_retention(self):
+        self._recover_orphans()
+        closed = []
+        for path in segments(self.directory, self.prefix):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue  # deleted by another process
+            closed.append((stat.st_mtime, stat.st_size, path))
+        closed.sort()
+        total = sum(size for _, size, _ in closed)
+        cutoff = time.time() - self.max_age
+        for mtime, size, path in closed:
+            if mtime >= cutoff and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"[WARN] Could not delete old event log {path}: {e}")
+                continue
+            total -= size
+            self.deleted += 1
+
+
+def segments(directory=LOG_DIR, prefix="events"):
+    """Closed segments in a log directory, oldest first per process."""
+    return sorted(glob.glob(os.path.join(directory, f"{prefix}_*.jsonl")) +
+                  glob.glob(os.path.join(directory, f"{prefix}_*.jsonl.gz")))
+
+
+def read_records(paths, record_type=None):
+    """Yields the records of one or more segments (plain or gzipped), optionally of one type."""
+    if isinstance(paths, str):
+        paths = segments(paths) if os.path.isdir(paths) else [paths]
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # truncated last line of a segment cut off by a crash
+                    if record_type is None or record.get("type") == record_type:
+                        yield record
+            except (EOFError, gzip.BadGzipFile):
+                pass  # gzip stream of a segment cut off by a crash, recovered as far as it goes
+
+
+_event_log = None
+_event_log_lock = threading.Lock()
+
+
+def get_event_log():
+    """Process-wide EventLog, started on first use."""
+    global _event_log
+    with _event_log_lock:
+        if _event_log is None:
+            _event_log = EventLog(LOG_DIR)  # read now, so tools can redirect it before first use
+            atexit.register(_event_log.close)
+        return _event_log
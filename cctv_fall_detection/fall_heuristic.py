@@ -1,15 +1,30 @@
 #fall_heuristic
 import numpy as np
-from collections import defaultdict, deque
+from collections import deque
+from track_slots import TrackSlots, grow_rows
+from track_store import TrackStateStore
 
 class FallHeuristic:
-    def __init__(self, history_len=10, min_frames_for_fall=2):
+    def __init__(self, history_len=10, min_frames_for_fall=2, max_tracks=5000, ttl=10.0,
+                 angle_threshold=40, aspect_ratio_threshold=1.5, drop_ratio=0.5):
         """
         history_len: number of previous positions to track per person
         min_frames_for_fall: minimum frames the conditions must persist to trigger fall
+        max_tracks / ttl: LRU cap and seconds-since-last-seen before a person's history is dropped
+        angle_threshold: torso angle (degrees) below which a person counts as horizontal
+        aspect_ratio_threshold: bbox width / height above which a person counts as lying
+        drop_ratio: downward move per frame, in previous bbox heights, that counts as a sudden drop
         """
-        self.person_features = defaultdict(lambda: deque(maxlen=history_len))
-        self.prev_fall_flags = defaultdict(lambda: deque(maxlen=min_frames_for_fall))
+        self.history_len = history_len
+        self.min_frames_for_fall = min_frames_for_fall
+        self.angle_threshold = angle_threshold
+        self.aspect_ratio_threshold = aspect_ratio_threshold
+        self.drop_ratio = drop_ratio
+        # person_id -> (feature history, fall flag history)
+        self.people = TrackStateStore(max_entries=max_tracks, ttl=ttl)
+
+    def _history(self):
+        return deque(maxlen=self.history_len), deque(maxlen=self.min_frames_for_fall)
 
     def get_angle(self, a, b):
         """Compute angle between two points (mid-shoulder to mid-hip)."""
@@ -39,31 +54,113 @@ class FallHeuristic:
                 (keypoints["left_hip"][1] + keypoints["right_hip"][1]) / 2
             )
             angle = self.get_angle(mid_shoulder, mid_hip)
-            if angle < 40:  # horizontal
+            if angle < self.angle_threshold:  # horizontal
                 fall_pose = True
 
         # Bounding box aspect ratio
-        fall_aspect = aspect_ratio > 1.5
+        fall_aspect = aspect_ratio > self.aspect_ratio_threshold
+
+        person_features, prev_fall_flags = self.people.setdefault(person_id, self._history)
 
         # Vertical velocity
-        prev_positions = self.person_features[person_id]
-        if prev_positions:
-            _, prev_y, _, prev_h, _ = prev_positions[-1]
+        if person_features:
+            _, prev_y, _, prev_h = person_features[-1][:4]
             dy = y - prev_y
-            fall_motion = dy > prev_h * 0.5  # sudden drop
+            fall_motion = dy > prev_h * self.drop_ratio  # sudden drop
         else:
             fall_motion = False
 
         # Store current frame feature
-        self.person_features[person_id].append((x, y, w, h, fall_pose, fall_aspect, fall_motion))
+        person_features.append((x, y, w, h, fall_pose, fall_aspect, fall_motion))
 
         # Compute confidence over history
-        history_flags = [fp or fa or fm for _, _, _, _, fp, fa, fm in self.person_features[person_id]]
+        history_flags = [fp or fa or fm for _, _, _, _, fp, fa, fm in person_features]
         fall_confidence = sum(history_flags)
 
         # Persist fall detection
         fall_flag = sum([fall_pose, fall_aspect, fall_motion]) >= 2
-        self.prev_fall_flags[person_id].append(fall_flag)
-        if sum(self.prev_fall_flags[person_id]) >= 2:
+        prev_fall_flags.append(fall_flag)
+        if sum(prev_fall_flags) >= self.min_frames_for_fall:
             return True
         return False
+
+
+class BatchFallHeuristic:
+    def __init__(self, history_len=10, min_frames_for_fall=2, capacity=256, max_tracks=5000, ttl=10.0,
+                 angle_threshold=40, aspect_ratio_threshold=1.5, drop_ratio=0.5):
+        """
+        Same rules as FallHeuristic.is_fall, evaluated for every person in a
+        frame at once, with history in NumPy ring buffers indexed by track slot.
+        """
+        self.history_len = history_len
+        self.min_frames_for_fall = min_frames_for_fall
+        self.angle_threshold = angle_threshold
+        self.aspect_ratio_threshold = aspect_ratio_threshold
+        self.drop_ratio = drop_ratio
+        self.slots = TrackSlots(capacity, max_tracks=max_tracks, ttl=ttl)
+        self.features = np.zeros((capacity, history_len, 4), dtype=np.float64)  # x, y, w, h
+        self.feat_head = np.zeros(capacity, dtype=np.intp)
+        self.feat_count = np.zeros(capacity, dtype=np.intp)
+        self.fall_flags = np.zeros((capacity, min_frames_for_fall), dtype=bool)
+        self.flag_head = np.zeros(capacity, dtype=np.intp)
+
+    def _ensure_capacity(self):
+        capacity = self.slots.capacity
+        if len(self.feat_head) < capacity:
+            for name in ("features", "feat_head", "feat_count", "fall_flags", "flag_head"):
+                setattr(self, name, grow_rows(getattr(self, name), capacity))
+
+    def _reset(self, slots):
+        self.feat_head[slots] = 0
+        self.feat_count[slots] = 0
+        self.fall_flags[slots] = False
+        self.flag_head[slots] = 0
+
+    def release(self, person_ids):
+        self._reset(self.slots.release(person_ids))
+
+    def is_fall_batch(self, person_ids, bboxes, keypoints):
+        """
+        person_ids: N unique IDs
+        bboxes: (N, 4) array of (x, y, w, h)
+        keypoints: (N, 17, 2) COCO keypoints
+        Returns a boolean fall mask.
+        """
+        if len(person_ids) == 0:
+            return np.zeros(0, dtype=bool)
+
+        slots, is_new = self.slots.lookup(person_ids)
+        self._ensure_capacity()
+        self._reset(slots[is_new])
+
+        bboxes = np.asarray(bboxes, dtype=np.float64)
+        keypoints = np.asarray(keypoints, dtype=np.float64)
+        x, y, w, h = bboxes.T
+        aspect_ratio = w / (h + 1e-5)
+
+        # Pose orientation
+        mid_shoulder = (keypoints[:, 5] + keypoints[:, 6]) / 2
+        mid_hip = (keypoints[:, 11] + keypoints[:, 12]) / 2
+        angle = np.abs(np.degrees(np.arctan2(mid_hip[:, 1] - mid_shoulder[:, 1],
+                                             mid_hip[:, 0] - mid_shoulder[:, 0])))
+        fall_pose = angle < self.angle_threshold  # horizontal
+
+        # Bounding box aspect ratio
+        fall_aspect = aspect_ratio > self.aspect_ratio_threshold
+
+        # Vertical velocity
+        head = self.feat_head[slots]
+        prev = self.features[slots, (head - 1) % self.history_len]
+        fall_motion = (self.feat_count[slots] > 0) & (y - prev[:, 1] > prev[:, 3] * self.drop_ratio)
+
+        # Store current frame feature
+        self.features[slots, head] = bboxes
+        self.feat_head[slots] = (head + 1) % self.history_len
+        self.feat_count[slots] = np.minimum(self.feat_count[slots] + 1, self.history_len)
+
+        # Persist fall detection
+        fall_flag = (fall_pose.astype(np.int8) + fall_aspect + fall_motion) >= 2
+        flag_head = self.flag_head[slots]
+        self.fall_flags[slots, flag_head] = fall_flag
+        self.flag_head[slots] = (flag_head + 1) % self.min_frames_for_fall
+        return self.fall_flags[slots].sum(axis=1) >= self.min_frames_for_fall
@@ -0,0 +1,172 @@
+# frame_hub.py
+import threading
+import time
+
+BOUNDARY = "frame"
+
+# Viewer encode settings: (width, JPEG quality), width 0 = the camera's own resolution.
+# Requests are rounded to these steps so viewers asking for nearly the same size share one encode.
+DEFAULT_VARIANT = (0, 80)
+WIDTH_STEP = 160
+MAX_WIDTH = 3840
+QUALITY_STEP = 10
+MIN_QUALITY, MAX_QUALITY = 30, 90
+STALE_AFTER = 2.0    # seconds; a newly subscribed viewer doesn't get a frame older than this
+CAMERA_TTL = 60.0    # seconds a camera stays listed after its engine last checked in
+KEEPALIVE = 10.0     # seconds; an idle stream re-sends its last frame this often
+
+
+def parse_variant(width=None, quality=None):
+    """Normalized (width, quality) for a viewer's ?width= / ?quality= request."""
+    if width:
+        width = min(max(int(round(width / WIDTH_STEP)) * WIDTH_STEP, WIDTH_STEP), MAX_WIDTH)
+    else:
+        width = DEFAULT_VARIANT[0]
+    if quality is None:
+        quality = DEFAULT_VARIANT[1]
+    else:
+        quality = min(max(int(round(quality / QUALITY_STEP)) * QUALITY_STEP, MIN_QUALITY), MAX_QUALITY)
+    return width, quality
+
+
+class FrameHub:
+    def __init__(self):
+        """
+        Latest JPEG per camera and encode setting, kept as the encoded bytes the engine posted.
+        Viewers block on wait() until a newer frame arrives.
+        The engines only annotate and encode what subscriptions() lists, so a camera
+        nobody is watching sends no frames at all.
+        """
+        self.frames = {}  # (camera_id, variant) -> (seq, jpeg_bytes, received_at)
+        self.viewers = {}  # camera_id -> {variant: open MJPEG streams}
+        self.leases = {}  # (camera_id, variant) -> monotonic expiry, for one-off /latest requests
+        self.announced = {}  # camera_id -> time of the engine's last subscription poll
+        self.version = 0  # bumped whenever the set of subscriptions changes
+        self._cond = threading.Condition()
+
+    def publish(self, camera_id, jpeg_bytes, variant=DEFAULT_VARIANT):
+        key = (camera_id, variant)
+        with self._cond:
+            seq = self.frames.get(key, (0,))[0] + 1
+            self.frames[key] = (seq, jpeg_bytes, time.time())
+            self._cond.notify_all()
+
+    def latest(self, camera_id, variant=DEFAULT_VARIANT):
+        """Returns (seq, jpeg_bytes) or None if the camera has not sent anything at this setting."""
+        entry = self.frames.get((camera_id, variant))
+        return None if entry is None else entry[:2]
+
+    def start_seq(self, camera_id, variant=DEFAULT_VARIANT):
+        """wait() cursor for a new viewer: the current frame is skipped if it is stale."""
+        entry = self.frames.get((camera_id, variant))
+        if entry is None or time.time() - entry[2] <= STALE_AFTER:
+            return 0
+        return entry[0]
+
+    def wait(self, camera_id, after_seq, timeout=None, variant=DEFAULT_VARIANT):
+        """Blocks until the camera has a frame newer than after_seq; returns (seq, jpeg_bytes) or None."""
+        key = (camera_id, variant)
+        with self._cond:
+            ready = self._cond.wait_for(lambda: self.frames.get(key, (0,))[0] > after_seq, timeout)
+            if not ready:
+                return None
+            return self.frames[key][:2]
+
+    def cameras(self):
+        cutoff = time.time() - CAMERA_TTL
+        announced = [camera_id for camera_id, seen in list(self.announced.items()) if seen >= cutoff]
+        return sorted({camera_id for camera_id, _ in list(self.frames)} | set(announced))
+
+    def add_viewer(self, camera_id, delta=1, variant=DEFAULT_VARIANT):
+        with self._cond:
+            variants = self.viewers.setdefault(camera_id, {})
+            before = self._subscribed(camera_id, variant)
+            variants[variant] = variants.get(variant, 0) + delta
+            if variants[variant] <= 0:
+                del variants[variant]
+            if self._subscribed(camera_id, variant) != before:
+                self._changed()
+
+    def lease(self, camera_id, variant=DEFAULT_VARIANT, seconds=10.0):
+        """Keeps a setting subscribed for `seconds` without an open stream."""
+        with self._cond:
+            before = self._subscribed(camera_id, variant)
+            self.leases[(camera_id, variant)] = time.monotonic() + seconds
+            if not before:
+                self._changed()
+
+    def viewer_count(self, camera_id):
+        return sum(self.viewers.get(camera_id, {}).values())
+
+    def subscriptions(self):
+        """{camera_id: [[width, quality], ...]} the engines should render and post."""
+        with self._cond:
+            return self._subscriptions()
+
+    def wait_subscriptions(self, version, cameras=(), timeout=None):
+        """
+        Long-poll for the engines: records `cameras` as alive, then blocks until the
+        subscriptions differ from `version` (None: return at once).
+        Returns (version, subscriptions).
+        """
+        now = time.time()
+        with self._cond:
+            for camera_id in cameras:
+                self.announced[str(camera_id)] = now
+            if version is not None:
+                # Wake up when the next lease runs out, too, so the engine stops encoding for it
+                if self.leases:
+                    expiry = min(self.leases.values()) - time.monotonic()
+                    timeout = max(expiry, 0.0) if timeout is None else max(min(timeout, expiry), 0.0)
+                self._cond.wait_for(lambda: self.version != version, timeout)
+            return self.version, self._subscriptions()
+
+    def _subscribed(self, camera_id, variant):
+        if self.viewers.get(camera_id, {}).get(variant, 0) > 0:
+            return True
+        return self.leases.get((camera_id, variant), 0.0) > time.monotonic()
+
+    def _subscriptions(self):
+        now = time.monotonic()
+        for key in [key for key, expiry in self.leases.items() if expiry <= now]:
+            del self.leases[key]
+        subs = {}
+        for camera_id, variants in self.viewers.items():
+            subs[camera_id] = {variant for variant, count in variants.items() if count > 0}
+        for camera_id, variant in self.leases:
+            subs.setdefault(camera_id, set()).add(variant)
+        return {camera_id: [list(v) for v in sorted(variants)] for camera_id, variants in subs.items() if variants}
+
+    def _changed(self):
+        self.version += 1
+        self._cond.notify_all()
+
+
+def mjpeg_stream(hub, camera_id, max_fps, variant=DEFAULT_VARIANT):
+    """
+    multipart/x-mixed-replace generator for one viewer.
+    Frames that arrive faster than max_fps are skipped, never queued.
+    While the camera sends nothing, the last frame (or before any, a blank line) is
+    re-sent every KEEPALIVE seconds: only a write notices a closed connection, and
+    that is what ends the generator and removes the viewer.
+    """
+    min_interval = 1.0 / max_fps
+    seq = hub.start_seq(camera_id, variant)
+    jpeg = None
+    hub.add_viewer(camera_id, variant=variant)
+    try:
+        while True:
+            started = time.monotonic()
+            item = hub.wait(camera_id, seq, timeout=KEEPALIVE, variant=variant)
+            if item is not None:
+                seq, jpeg = item
+            elif jpeg is None:
+                yield b"\r\n"  # multipart preamble, ignored by the browser
+                continue
+            yield (f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                   f"Content-Length: {len(jpeg)}\r\n\r\n").encode() + jpeg + b"\r\n"
+            remaining = min_interval - (time.monotonic() - started)
+            if remaining > 0:
+                time.sleep(remaining)
+    finally:
+        hub.add_viewer(camera_id, -1, variant=variant)  # generator closed when the viewer disconnects
@@ -0,0 +1,369 @@
+# inference_backend.py
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+
+from draw import draw_pose
+
+# ------------------- CONFIG -------------------
+BACKENDS = ("ultralytics", "onnxruntime", "openvino")
+IMGSZ = 640
+CONF_THRESHOLD = 0.25
+IOU_THRESHOLD = 0.7
+CALIBRATION_FRAMES = 200     # frames sampled from our footage for INT8 calibration
+
+
+class PoseResult:
+    """Detections for one frame as NumPy arrays; supports the parts of a YOLOv8 result the engine uses."""
+    def __init__(self, orig_img, boxes, scores, keypoints=None, classes=None):
+        self.orig_img = orig_img
+        self.boxes = boxes            # (N, 4) xyxy, frame coordinates
+        self.scores = scores          # (N,)
+        self.keypoints = keypoints    # (N, 17, 3) x, y, confidence; None for detection models
+        self.classes = np.zeros(len(boxes), np.int64) if classes is None else classes
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def plot(self):
+        keypoints = self.keypoints if self.keypoints is not None else np.zeros((len(self.boxes), 17, 3))
+        return draw_pose(self.orig_img.copy(), self.boxes, keypoints)
+
+
+def result_arrays(result):
+    """
+    (boxes xyxy (N, 4), scores (N,), classes (N,), keypoints (N, 17, 3)) from either
+    an ultralytics result or a PoseResult. Keypoints are zeros for detection models.
+    """
+    if isinstance(result, PoseResult):
+        keypoints = result.keypoints
+        if keypoints is None:
+            keypoints = np.zeros((len(result), 17, 3), np.float32)
+        return result.boxes, result.scores, result.classes, keypoints
+    if result is None or result.boxes is None or len(result.boxes) == 0:
+        return (np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int64),
+                np.zeros((0, 17, 3), np.float32))
+    boxes = result.boxes.xyxy.cpu().numpy().astype(np.float32)
+    scores = result.boxes.conf.cpu().numpy().astype(np.float32)
+    classes = result.boxes.cls.cpu().numpy().astype(np.int64)
+    if result.keypoints is None:
+        keypoints = np.zeros((len(boxes), 17, 3), np.float32)
+    else:
+        keypoints = result.keypoints.data.cpu().numpy().astype(np.float32)
+    return boxes, scores, classes, keypoints
+
+
+def letterbox(frame, imgsz=IMGSZ, out=None):
+    """
+    Resize keeping the aspect ratio and pad to imgsz x imgsz, as YOLOv8 does.
+    Returns (CHW float32 RGB in [0, 1], gain, (pad_x, pad_y)).
+    out: optional (3, imgsz, imgsz) float32 array to write into, e.g. one row of a batch.
+    """
+    h, w = frame.shape[:2]
+    gain = min(imgsz / h, imgsz / w)
+    nw, nh = int(round(w * gain)), int(round(h * gain))
+    pad_x, pad_y = (imgsz - nw) // 2, (imgsz - nh) // 2
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    canvas[pad_y:pad_y + nh, pad_x:pad_x + nw] = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    blob = out if out is not None else np.empty((3, imgsz, imgsz), np.float32)
+    np.multiply(cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB).transpose(2, 0, 1), np.float32(1 / 255), out=blob)
+    return blob, gain, (pad_x, pad_y)
+
+
+class OnnxModel:
+    def __init__(self, path, backend="onnxruntime", imgsz=IMGSZ, conf=CONF_THRESHOLD, iou=IOU_THRESHOLD,
+                 threads=None):
+        """
+        YOLOv8 (pose or detect) ONNX model on CPU through ONNX Runtime or OpenVINO.
+        Called like an ultralytics model: model(frame_or_frames) -> [PoseResult, ...].
+        threads: intra-op threads; defaults to OMP_NUM_THREADS (set to 1 by the supervisor)
+        """
+        self.path = path
+        self.backend = backend
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou = iou
+        if threads is None:
+            threads = int(os.environ.get("OMP_NUM_THREADS", 0))
+
+        if backend == "onnxruntime":
+            import onnxruntime as ort
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = threads
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+            input_name = session.get_inputs()[0].name
+            self.dynamic_batch = not isinstance(session.get_inputs()[0].shape[0], int)
+            self._run = lambda batch: session.run(None, {input_name: batch})[0]
+        elif backend == "openvino":
+            import openvino as ov
+            core = ov.Core()
+            model = core.read_model(path)
+            config = {"PERFORMANCE_HINT": "LATENCY"}
+            if threads:
+                config["INFERENCE_NUM_THREADS"] = threads
+            compiled = core.compile_model(model, "CPU", config)
+            self.dynamic_batch = model.input(0).get_partial_shape()[0].is_dynamic
+            output = compiled.output(0)
+            self._run = lambda batch: compiled([batch])[output]
+        else:
+            raise ValueError(f"Unknown ONNX backend: {backend}")
+
+    def __call__(self, source, verbose=False, imgsz=None):
+        frames = source if isinstance(source, (list, tuple)) else [source]
+        if not frames:
+            return []
+        imgsz = imgsz or self.imgsz
+        # Letterbox straight into one batch tensor
+        blobs = np.empty((len(frames), 3, imgsz, imgsz), np.float32)
+        prepared = [letterbox(frame, imgsz, out=blob) for frame, blob in zip(frames, blobs)]
+        if self.dynamic_batch:
+            preds = self._run(blobs)
+        else:
+            preds = np.concatenate([self._run(blob[None]) for blob in blobs])
+        return [self._postprocess(frame, pred, gain, pad)
+                for frame, pred, (_, gain, pad) in zip(frames, preds, prepared)]
+
+    def _postprocess(self, frame, pred, gain, pad):
+        """pred: (4 + classes [+ 51 keypoint values], anchors) raw head output for one image."""
+        pred = pred.T
+        pose = pred.shape[1] == 4 + 1 + 17 * 3
+        if pose:
+            scores = pred[:, 4]
+            classes = np.zeros(len(pred), np.int64)
+        else:
+            classes = pred[:, 4:].argmax(axis=1)
+            scores = pred[np.arange(len(pred)), 4 + classes]
+        keep = scores > self.conf
+        pred, scores, classes = pred[keep], scores[keep], classes[keep]
+        if not len(pred):
+            return PoseResult(frame, np.zeros((0, 4), np.float32), np.zeros(0, np.float32),
+                              np.zeros((0, 17, 3), np.float32) if pose else None, classes)
+
+        # (cx, cy, w, h) -> (x, y, w, h) for OpenCV's NMS, class-aware like ultralytics
+        tlwh = pred[:, :4].copy()
+        tlwh[:, :2] -= tlwh[:, 2:] / 2
+        idx = cv2.dnn.NMSBoxesBatched(tlwh.tolist(), scores.tolist(), classes.tolist(), self.conf, self.iou)
+        idx = np.asarray(idx, dtype=np.int64).reshape(-1)
+
+        h, w = frame.shape[:2]
+        boxes = tlwh[idx]
+        boxes[:, 2:] += boxes[:, :2]
+        boxes[:, [0, 2]] = np.clip((boxes[:, [0, 2]] - pad[0]) / gain, 0, w)
+        boxes[:, [1, 3]] = np.clip((boxes[:, [1, 3]] - pad[1]) / gain, 0, h)
+
+        keypoints = None
+        if pose:
+            keypoints = pred[idx, 5:].reshape(-1, 17, 3).copy()
+            keypoints[..., 0] = (keypoints[..., 0] - pad[0]) / gain
+            keypoints[..., 1] = (keypoints[..., 1] - pad[1]) / gain
+            keypoints[keypoints[..., 2] < 0.5, :2] = 0  # invisible keypoints at (0, 0), as ultralytics does
+        return PoseResult(frame, boxes.astype(np.float32), scores[idx].astype(np.float32),
+                          None if keypoints is None else keypoints.astype(np.float32), classes[idx])
+
+
+# ------------------- EXPORT / QUANTIZE -------------------
+def onnx_path(weights, int8=False):
+    stem = os.path.splitext(weights)[0]
+    return stem + (".int8.onnx" if int8 else ".onnx")
+
+
+def export_onnx(weights, imgsz=IMGSZ):
+    """One-off export of ultralytics .pt weights to ONNX with a dynamic batch axis."""
+    from ultralytics import YOLO
+    print(f"[INFO] Exporting {weights} to ONNX...")
+    return YOLO(weights).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+
+
+def calibration_frames(sources, count=CALIBRATION_FRAMES):
+    """Frames sampled evenly from our own videos, so INT8 ranges match real footage."""
+    per_source = max(1, count // len(sources))
+    for source in sources:
+        cap = cv2.VideoCapture(source)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or per_source
+        step = max(1, total // per_source)
+        for i in range(per_source):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, i * step)
+            ok, frame = cap.read()
+            if not ok:
+                break
+            yield frame
+        cap.release()
+
+
+def quantize_int8(model_path, sources, out_path=None, count=CALIBRATION_FRAMES, imgsz=IMGSZ):
+    """
+    Static INT8 post-training quantization with ONNX Runtime, calibrated on video files.
+    The decode part of the YOLOv8 head (DFL, sigmoid, box/keypoint arithmetic) stays
+    in float: quantizing it costs keypoint accuracy for almost no speed.
+    """
+    import onnx
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    out_path = out_path or model_path.replace(".onnx", ".int8.onnx")
+    prepared = model_path.replace(".onnx", ".prep.onnx")
+    quant_pre_process(model_path, prepared)
+
+    graph = onnx.load(prepared).graph
+    input_name = graph.input[0].name
+    modules = [n.name.split("/")[1] for n in graph.node if n.name.startswith("/model.")]
+    head = f"/{max(modules, key=lambda m: int(m.split('.')[1]))}/"
+    exclude = [n.name for n in graph.node
+               if n.name.startswith(head) and (n.op_type != "Conv" or "/dfl/" in n.name)]
+
+    class VideoCalibrationReader(CalibrationDataReader):
+        def __init__(self):
+            self.frames = calibration_frames(sources, count)
+
+        def get_next(self):
+            frame = next(self.frames, None)
+            if frame is None:
+                return None
+            return {input_name: letterbox(frame, imgsz)[0][None]}
+
+    print(f"[INFO] Calibrating {model_path} on {count} frames from {len(sources)} source(s)...")
+    quantize_static(prepared, out_path, VideoCalibrationReader(), quant_format=QuantFormat.QDQ,
+                    per_channel=True, activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                    nodes_to_exclude=exclude)
+    os.remove(prepared)
+    print(f"[INFO] Saved {out_path}")
+    return out_path
+
+
+def load_model(weights="yolov8n-pose.pt", backend="ultralytics", int8=False, **options):
+    """
+    The inference model for a backend; all of them are called as model(frames) -> results.
+    ONNX weights are exported next to the .pt file on first use.
+    """
+    if backend == "ultralytics":
+        from ultralytics import YOLO
+        return YOLO(weights)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}")
+    path = onnx_path(weights, int8)
+    if not os.path.exists(path):
+        if int8:
+            raise FileNotFoundError(f"{path} not found; create it with: "
+                                    f"python inference_backend.py quantize {onnx_path(weights)} VIDEO...")
+        path = export_onnx(weights)
+    return OnnxModel(path, backend, **options)
+
+
+# ------------------- BENCHMARK -------------------
+def keypoint_agreement(reference, result):
+    """
+    Compare one frame's detections with the reference (PyTorch) result.
+    Returns (matched, reference_count, result_count, [normalized keypoint errors]):
+    boxes are paired by IoU >= 0.5 and keypoint errors are divided by the box diagonal.
+    """
+    from tracker import iou_matrix, linear_assignment
+
+    ref_boxes, _, _, ref_kpts = result_arrays(reference)
+    boxes, _, _, kpts = result_arrays(result)
+    if len(ref_boxes) == 0 or len(boxes) == 0:
+        return 0, len(ref_boxes), len(boxes), []
+
+    def xywh(b):
+        return np.concatenate([b[:, :2], b[:, 2:] - b[:, :2]], axis=1)
+
+    iou = iou_matrix(xywh(ref_boxes), xywh(boxes))
+    rows, cols = linear_assignment(-iou)
+    errors, matched = [], 0
+    for r, c in zip(rows, cols):
+        if iou[r, c] < 0.5:
+            continue
+        matched += 1
+        visible = (ref_kpts[r, :, 2] >= 0.5) & (kpts[c, :, 2] >= 0.5)
+        diag = np.hypot(*(ref_boxes[r, 2:] - ref_boxes[r, :2])) or 1.0
+        errors.extend((np.linalg.norm(ref_kpts[r, visible, :2] - kpts[c, visible, :2], axis=1) / diag).tolist())
+    return matched, len(ref_boxes), len(boxes), errors
+
+
+def benchmark(weights, source, count, int8):
+    cap = cv2.VideoCapture(source)
+    frames = []
+    while len(frames) < count:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        print(f"[ERROR] No frames read from {source}")
+        return
+
+    candidates = [("ultralytics", False), ("onnxruntime", False), ("openvino", False)]
+    if int8:
+        candidates += [("onnxruntime", True), ("openvino", True)]
+
+    reference = None
+    for backend, quantized in candidates:
+        name = backend + (" int8" if quantized else "")
+        try:
+            model = load_model(weights, backend, int8=quantized)
+        except (ImportError, FileNotFoundError) as e:
+            print(f"{name:<18} skipped: {e}")
+            continue
+        model(frames[0], verbose=False)  # warm-up
+
+        results, latencies = [], []
+        started = time.perf_counter()
+        for frame in frames:
+            t0 = time.perf_counter()
+            results.append(model(frame, verbose=False)[0])
+            latencies.append(time.perf_counter() - t0)
+        fps = len(frames) / (time.perf_counter() - started)
+        lat = np.array(latencies) * 1000
+        line = (f"{name:<18} {fps:7.2f} fps   latency p50 {np.percentile(lat, 50):7.1f} ms"
+                f"   p95 {np.percentile(lat, 95):7.1f} ms")
+
+        if reference is None:
+            reference = results
+        else:
+            matched = ref_total = 0
+            all_errors = []
+            for ref, res in zip(reference, results):
+                m, r, _, errors = keypoint_agreement(ref, res)
+                matched += m
+                ref_total += r
+                all_errors.extend(errors)
+            errs = np.array(all_errors) if all_errors else np.zeros(1)
+            line += (f"   recall vs ultralytics {matched / max(ref_total, 1):.3f}"
+                     f"   keypoint error {errs.mean():.4f}   PCK@0.05 {(errs < 0.05).mean():.3f}")
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX Runtime / OpenVINO CPU backends for the YOLOv8 models")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="export .pt weights to ONNX")
+    export.add_argument("weights", nargs="*", default=["yolov8n-pose.pt", "yolov8n.pt"])
+
+    quantize = commands.add_parser("quantize", help="INT8 post-training quantization")
+    quantize.add_argument("model", help="FP32 .onnx model")
+    quantize.add_argument("videos", nargs="+", help="calibration footage")
+    quantize.add_argument("--frames", type=int, default=CALIBRATION_FRAMES)
+
+    bench = commands.add_parser("benchmark", help="compare backends against the PyTorch path")
+    bench.add_argument("source", help="video file")
+    bench.add_argument("--weights", default="yolov8n-pose.pt")
+    bench.add_argument("--frames", type=int, default=200)
+    bench.add_argument("--int8", action="store_true", help="also benchmark the INT8 model")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        for weights in args.weights:
+            print(f"[INFO] Saved {export_onnx(weights)}")
+    elif args.command == "quantize":
+        quantize_int8(args.model, args.videos, count=args.frames)
+    else:
+        benchmark(args.weights, args.source, args.frames, args.int8)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# keypoint_cache.py
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+# ------------------- CONFIG -------------------
+CACHE_DIR = "keypoint_cache"
+# Per-frame and per-person columns, each stored as one raw file that is memory-mapped on read
+FRAME_FIELDS = {"ts": (np.float64, ())}                 # unix seconds of every frame
+ROW_FIELDS = {
+    "frame_index": (np.int64, ()),
+    "track_ids": (np.int64, ()),                        # NO_TRACK (-1) for unconfirmed tracks
+    "boxes": (np.float32, (4,)),                        # torso box x, y, w, h, as the fall checks see it
+    "keypoints": (np.float32, (17, 3)),                 # COCO x, y, confidence
+}
+
+
+class KeypointCacheWriter:
+    def __init__(self, path, camera_id="0", source=None):
+        """
+        Appends one camera's tracked people frame by frame to raw column files in `path`;
+        close() writes meta.json with the row counts KeypointCache needs to map them.
+        """
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.meta = {"camera_id": str(camera_id), "source": str(source), "frames": 0, "rows": 0,
+                     "created": time.strftime("%Y-%m-%d %H:%M:%S")}
+        self.files = {name: open(os.path.join(path, f"{name}.bin"), "wb")
+                      for name in list(FRAME_FIELDS) + list(ROW_FIELDS)}
+
+    def add(self, ts, detections):
+        n = len(detections)
+        columns = {
+            "frame_index": np.full(n, self.meta["frames"]),
+            "track_ids": detections.track_ids,
+            "boxes": detections.boxes,
+            "keypoints": detections.keypoints,
+        }
+        self.files["ts"].write(np.float64(ts).tobytes())
+        for name, (dtype, _) in ROW_FIELDS.items():
+            self.files[name].write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+        self.meta["frames"] += 1
+        self.meta["rows"] += n
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(self.meta, f, indent=2)
+
+
+class KeypointCache:
+    def __init__(self, path):
+        """Read-only, memory-mapped view of a cache written by KeypointCacheWriter."""
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.path = path
+        self.camera_id = self.meta["camera_id"]
+        for fields, count in ((FRAME_FIELDS, self.meta["frames"]), (ROW_FIELDS, self.meta["rows"])):
+            for name, (dtype, shape) in fields.items():
+                if count:
+                    column = np.memmap(os.path.join(path, f"{name}.bin"), dtype=dtype, mode="r",
+                                       shape=(count,) + shape)
+                else:
+                    column = np.zeros((0,) + shape, dtype)
+                setattr(self, name, column)
+        # Row range of every frame (rows are written in frame order)
+        self.offsets = np.searchsorted(self.frame_index, np.arange(self.meta["frames"] + 1))
+
+    def __len__(self):
+        return self.meta["frames"]
+
+    def frame(self, i):
+        """(track_ids, boxes, keypoints) of frame i, as views into the cache."""
+        rows = slice(self.offsets[i], self.offsets[i + 1])
+        return self.track_ids[rows], self.boxes[rows], self.keypoints[rows]
+
+
+def recording_start(path, cap):
+    """Best guess at when a recording started: its modification time minus its duration."""
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    duration = cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps
+    return os.path.getmtime(path) - duration
+
+
+def build_cache(source, out_dir, camera_id="0", model=None, tracker="iou", start=None, stride=1,
+                max_frames=None, backend=None, int8=False):
+    """
+    Runs pose estimation and tracking once over a recording and stores every frame's
+    tracked people, so fall thresholds can be swept without the model (sweep.py).
+    start: unix time of the first frame (default: guessed from the file, see recording_start)
+    Returns the number of frames cached.
+    """
+    import run_engine
+    from video_source import open_capture
+
+    if model is None:
+        model = run_engine.load_model(backend or run_engine.INFERENCE_BACKEND, int8)
+    cap = open_capture(source)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Cannot open {source}")
+    if start is None:
+        start = recording_start(source, cap)
+    state = run_engine.CameraState(camera_id, tracker=tracker, motion_gate=False)
+    writer = KeypointCacheWriter(out_dir, camera_id, source)
+    index = 0
+    try:
+        while max_frames is None or writer.meta["frames"] < max_frames:
+            if not cap.grab():
+                break
+            index += 1
+            if (index - 1) % stride:
+                continue
+            ok, frame = cap.retrieve()
+            if not ok:
+                break
+            ts = start + cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            result = model(frame, verbose=False)[0]
+            writer.add(ts, run_engine.track_result(state, frame, result))
+            if writer.meta["frames"] % 1000 == 0:
+                print(f"[INFO] {writer.meta['frames']} frames cached")
+    finally:
+        cap.release()
+        writer.close()
+    return writer.meta["frames"]
+
+
+def main():
+    from inference_backend import BACKENDS
+
+    parser = argparse.ArgumentParser(description="Cache tracked pose keypoints of a recording for sweep.py")
+    parser.add_argument("source", help="video file")
+    parser.add_argument("--camera-id", default="0", help="must match camera_id in the ground truth, if it has one")
+    parser.add_argument("--out", help=f"cache directory (default: {CACHE_DIR}/<camera id>)")
+    parser.add_argument("--start", help="wall-clock time of the first frame, e.g. '2025-09-09 22:12:40' "
+                                        "(default: file modification time minus duration)")
+    parser.add_argument("--stride", type=int, default=1, help="cache every n-th frame")
+    parser.add_argument("--max-frames", type=int)
+    parser.add_argument("--tracker", choices=["deepsort", "iou"], default="iou")
+    parser.add_argument("--backend", choices=BACKENDS, default=None)
+    parser.add_argument("--int8", action="store_true")
+    args = parser.parse_args()
+
+    start = datetime.fromisoformat(args.start).timestamp() if args.start else None
+    out_dir = args.out or os.path.join(CACHE_DIR, args.camera_id)
+    frames = build_cache(args.source, out_dir, camera_id=args.camera_id, tracker=args.tracker, start=start,
+                         stride=args.stride, max_frames=args.max_frames, backend=args.backend, int8=args.int8)
+    print(f"[INFO] Cached {frames} frames to {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
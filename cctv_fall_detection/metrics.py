@@ -0,0 +1,204 @@
+# metrics.py
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers sub-millisecond heuristics up to multi-second alert delivery
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    pairs = ",".join('%s="%s"' % (n, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " "))
+                     for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        return self.header() + [f"{self.name}{_label_text(self.labelnames, k)} {v}"
+                                for k, v in list(self.values.items())]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labelnames=(), kind=None):
+        """
+        Values are set directly or read at scrape time from callbacks,
+        so nothing is paid on the hot path for things like queue depths.
+        kind: report as "counter" instead for callbacks that read a running total
+        """
+        super().__init__(name, help_text, labelnames)
+        if kind:
+            self.kind = kind
+        self.values = {}
+        self.callbacks = {}
+        self.collectors = []
+
+    def set(self, value, *labels):
+        self.values[labels] = value
+
+    def set_function(self, fn, *labels):
+        self.callbacks[labels] = fn
+
+    def set_collector(self, fn):
+        """fn() returns {label tuple: value} at scrape time, for label sets that come and go."""
+        self.collectors.append(fn)
+
+    def remove(self, *labels):
+        self.values.pop(labels, None)
+        self.callbacks.pop(labels, None)
+
+    def render(self):
+        values = dict(self.values)
+        for labels, fn in list(self.callbacks.items()):
+            try:
+                value = fn()
+            except Exception:
+                continue
+            if value is not None:
+                values[labels] = value
+        for fn in list(self.collectors):
+            try:
+                values.update(fn())
+            except Exception:
+                continue
+        return self.header() + [f"{self.name}{_label_text(self.labelnames, k)} {v}"
+                                for k, v in values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {}  # labels -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value, *labels):
+        """A bisect and a few increments under a lock: cheap enough to leave on per frame."""
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * (len(self.buckets) + 2)
+            series[i] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self.series.items()}
+        for labels, series in snapshot.items():
+            names = self.labelnames + ("le",)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_label_text(names, labels + (bound,))} {cumulative}")
+            label_text = _label_text(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {series[-1]}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._get(Counter, name, help_text, labelnames)
+
+    def gauge(self, name, help_text, labelnames=(), kind=None):
+        return self._get(Gauge, name, help_text, labelnames, kind)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help_text, labelnames, buckets)
+
+    def render(self):
+        """Prometheus text exposition format."""
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+    routes = {}
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/metrics":
+            self._reply(200, CONTENT_TYPE, self.registry.render().encode())
+        elif path in self.routes:
+            self.send_error(405)  # routes change state, so a crawler or prefetch must not trigger them
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        if path in self.routes:
+            self._reply(*self.routes[path]())
+        else:
+            self.send_error(404)
+
+    def _reply(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would flood the console
+
+
+def start_http_server(port, host="0.0.0.0", registry=REGISTRY, routes=None):
+    """
+    Serves GET /metrics from a daemon thread; used by engine workers, which have no Flask app.
+    routes: extra {path: callable() -> (status, content_type, body bytes)}, served on POST only
+    """
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry, "routes": routes or {}})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"[INFO] Metrics on http://{host}:{port}/metrics")
+    return server
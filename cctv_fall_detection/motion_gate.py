@@ -0,0 +1,68 @@
+# motion_gate.py
+import cv2
+
+
+class MotionGate:
+    def __init__(self, width=160, pixel_threshold=12, min_changed=0.002):
+        """
+        Cheap change detector on a downscaled grayscale copy of the frame.
+        width: width of the downscaled frame
+        pixel_threshold: grey-level difference that counts as a changed pixel
+        min_changed: fraction of changed pixels that counts as motion
+        """
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.prev = None
+
+    def update(self, frame):
+        """Returns the fraction of pixels that changed since the previous frame."""
+        h, w = frame.shape[:2]
+        small = cv2.resize(frame, (self.width, max(1, h * self.width // w)), interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        prev, self.prev = self.prev, gray
+        if prev is None or prev.shape != gray.shape:
+            return 1.0
+        _, changed = cv2.threshold(cv2.absdiff(gray, prev), self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        return cv2.countNonZero(changed) / changed.size
+
+    def moving(self, frame):
+        return self.update(frame) >= self.min_changed
+
+
+class AdaptiveRate:
+    def __init__(self, active_interval=0.0, idle_interval=1.0, idle_after=5.0, ramp=1.5):
+        """
+        Per-camera inference rate.
+        active_interval: seconds between inferences while people or motion are present (0 = every frame)
+        idle_interval: safety floor; an idle camera is still inferred at least this often
+        idle_after: seconds without people or motion before the rate starts dropping
+        ramp: factor the interval grows by per inference while idle
+        """
+        self.active_interval = active_interval
+        self.idle_interval = idle_interval
+        self.idle_after = idle_after
+        self.ramp = ramp
+        self.interval = active_interval
+        self.last_activity = float("-inf")
+        self.last_infer = float("-inf")
+        self.skipped = 0
+
+    def should_infer(self, now, motion):
+        if motion:
+            self.last_activity = now
+        if now - self.last_activity < self.idle_after:
+            self.interval = self.active_interval
+        if now - self.last_infer >= self.interval:
+            self.last_infer = now
+            if now - self.last_activity >= self.idle_after:
+                self.interval = min(max(self.interval, 0.05) * self.ramp, self.idle_interval)
+            return True
+        self.skipped += 1
+        return False
+
+    def observe(self, now, people):
+        """Report how many people the last inference found."""
+        if people:
+            self.last_activity = now
+            self.interval = self.active_interval
@@ -1,23 +1,17 @@
 # app/person_detector.py
 
-from ultralytics import YOLO
-import cv2
+from detections import Detections
+from inference_backend import load_model
 
 class PersonDetector:
-    def __init__(self, model_path="yolov8n.pt"):
-        self.model = YOLO(model_path)
+    def __init__(self, model_path="yolov8n.pt", backend="ultralytics", int8=False):
+        """backend: "ultralytics", "onnxruntime" or "openvino" (see inference_backend.py)"""
+        self.model = load_model(model_path, backend, int8=int8)
 
     def detect(self, frame):
         """
         Detect people in the frame.
-        Returns a list of dicts: [{'id': None, 'bbox': (x,y,w,h)}, ...]
+        Returns a Detections with (x, y, w, h) boxes and scores;
+        use .to_dicts() for the old [{'id': None, 'bbox': (x,y,w,h)}, ...] list.
         """
-        results = self.model.predict(frame, verbose=False)[0]
-        persons = []
-        for box, cls in zip(results.boxes.xyxy, results.boxes.cls):
-            if int(cls) == 0:  # class 0 is person
-                x1, y1, x2, y2 = map(int, box)
-                w = x2 - x1
-                h = y2 - y1
-                persons.append({'id': None, 'bbox': (x1, y1, w, h)})
-        return persons
+        return Detections.from_result(self.model(frame, verbose=False)[0], class_id=0)  # class 0 is person
@@ -0,0 +1,201 @@
+# pipeline.py
+import queue
+import threading
+import time
+from collections import deque
+
+
+class LatestQueue:
+    def __init__(self, maxsize=1):
+        """
+        Bounded queue with latest-frame semantics: putting into a full queue
+        drops the oldest item instead of blocking the producer.
+        """
+        self.maxsize = maxsize
+        self.items = deque()
+        self.dropped = 0
+        self.closed = False
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        with self._cond:
+            if len(self.items) >= self.maxsize:
+                self.items.popleft()
+                self.dropped += 1
+            self.items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Returns the oldest queued item, or None on timeout / once closed and empty."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.items or self.closed, timeout):
+                return None
+            if self.items:
+                item = self.items.popleft()
+                self._cond.notify_all()
+                return item
+            return None
+
+    def wait_for_space(self, timeout=None):
+        """Blocks while the queue is full; False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: len(self.items) < self.maxsize or self.closed, timeout)
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        return len(self.items)
+
+
+class FramePacket:
+    """One captured frame as it moves through the pipeline stages."""
+    __slots__ = ("frame_id", "frame", "captured_at", "result", "detections", "fall_mask", "annotated", "falls")
+
+    def __init__(self, frame_id, frame, captured_at):
+        self.frame_id = frame_id
+        self.frame = frame
+        self.captured_at = captured_at
+        self.result = None
+        self.detections = None
+        self.fall_mask = None
+        self.annotated = None  # only rendered while someone watches
+        self.falls = []
+
+
+class CameraPipeline:
+    def __init__(self, camera_id, read_frame, infer, output, alert, max_frame_age=0.5,
+                 queue_size=1, display=False, pull=False, keep=None):
+        """
+        Capture -> inference -> output, one thread each, joined by bounded queues.
+        read_frame(): returns (ok, frame) like cv2.VideoCapture.read
+        infer(packet): fills packet.result / packet.falls; returns False to drop the packet
+        output(packet): renders, posts and stores the frame
+        alert(packet): raises alerts for packet.falls (runs before pending frame output)
+        keep(packet): optional, called on the inference thread for every frame it takes,
+                      stale or not (e.g. the fall clip buffer, which must not have gaps)
+        max_frame_age: frames older than this (seconds since capture) are dropped
+                       before inference and before output; alerts are never dropped
+        display: also hand output frames to self.display_queue for cv2.imshow
+        pull: only read a frame once the inference stage has room for it, so sources
+              that decode on demand (VideoSource) skip frames that would be dropped
+        """
+        self.camera_id = camera_id
+        self.read_frame = read_frame
+        self.infer = infer
+        self.output = output
+        self.alert = alert
+        self.keep = keep
+        self.max_frame_age = max_frame_age
+        self.pull = pull
+
+        self.capture_queue = LatestQueue(queue_size)
+        self.output_queue = LatestQueue(queue_size)
+        self.alert_queue = queue.Queue()
+        self.display_queue = LatestQueue(1) if display else None
+
+        self.stale_dropped = {"inference": 0, "output": 0}
+        self.last_latency = 0.0  # capture -> output, seconds
+        self.running = False
+        self.threads = []
+
+    def start(self):
+        self.running = True
+        for target, name in ((self._capture_loop, "capture"),
+                             (self._inference_loop, "inference"),
+                             (self._output_loop, "output")):
+            t = threading.Thread(target=target, name=f"{name}-{self.camera_id}", daemon=True)
+            t.start()
+            self.threads.append(t)
+
+    def stop(self):
+        self.running = False
+        self.capture_queue.close()
+
+    def join(self):
+        for t in self.threads:
+            t.join()
+
+    def is_alive(self):
+        return any(t.is_alive() for t in self.threads)
+
+    def dropped_frames(self):
+        """Frames dropped per stage: overwritten in a full queue or too old to be useful."""
+        return {
+            "capture": self.capture_queue.dropped,
+            "inference": self.stale_dropped["inference"],
+            "output": self.output_queue.dropped + self.stale_dropped["output"],
+        }
+
+    def _capture_loop(self):
+        frame_id = 0
+        while self.running:
+            if self.pull and not self.capture_queue.wait_for_space(timeout=0.5):
+                continue
+            ret, frame = self.read_frame()
+            if not ret:
+                break
+            self.capture_queue.put(FramePacket(frame_id, frame, time.monotonic()))
+            frame_id += 1
+        self.capture_queue.close()
+
+    def _inference_loop(self):
+        while True:
+            packet = self.capture_queue.get()
+            if packet is None:
+                break
+            if self.keep is not None:
+                try:
+                    self.keep(packet)
+                except Exception as e:
+                    print(f"[ERROR] [{self.camera_id}] Keep stage failed: {e}")
+            if time.monotonic() - packet.captured_at > self.max_frame_age:
+                self.stale_dropped["inference"] += 1
+                continue
+            try:
+                if self.infer(packet) is False:
+                    continue
+            except Exception as e:
+                print(f"[ERROR] [{self.camera_id}] Inference stage failed: {e}")
+                continue
+
+            # Alerts take their own unbounded path so a slow output stage can't lose them
+            if packet.falls:
+                self.alert_queue.put(packet)
+            self.output_queue.put(packet)
+        self.output_queue.close()
+
+    def _output_loop(self):
+        while True:
+            packet = self.output_queue.get(timeout=0.05)
+            self._drain_alerts()
+            if packet is None:
+                if self.output_queue.closed and not len(self.output_queue):
+                    break
+                continue
+            if time.monotonic() - packet.captured_at > self.max_frame_age:
+                self.stale_dropped["output"] += 1
+                continue
+            try:
+                self.output(packet)
+            except Exception as e:
+                print(f"[ERROR] [{self.camera_id}] Output stage failed: {e}")
+            self.last_latency = time.monotonic() - packet.captured_at
+            if self.display_queue is not None:
+                self.display_queue.put(packet)
+        self._drain_alerts()
+        if self.display_queue is not None:
+            self.display_queue.close()
+
+    def _drain_alerts(self):
+        while True:
+            try:
+                packet = self.alert_queue.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                self.alert(packet)
+            except Exception as e:
+                print(f"[ERROR] [{self.camera_id}] Alert output failed: {e}")
@@ -2,13 +2,33 @@
 import cv2
 import numpy as np
 
+from tracker import iou_matrix
+
+# COCO-17 order used by YOLOv8-pose
+KEYPOINT_NAMES = [
+    "nose", "left_eye", "right_eye", "left_ear", "right_ear",
+    "left_shoulder", "right_shoulder", "left_elbow", "right_elbow", "left_wrist", "right_wrist",
+    "left_hip", "right_hip", "left_knee", "right_knee", "left_ankle", "right_ankle",
+]
+CROP_SIZE = 256  # batched path: each person crop is letterboxed to this size
+
 class PoseEstimator:
-    def __init__(self, model_path="pose_model.tflite"):
+    def __init__(self, model_path="pose_model.tflite", backend="mediapipe", crop_size=CROP_SIZE):
         """
         Initialize the pose estimator.
-        You can replace this with your TFLite/MediaPipe/Ultralytics pose model.
+        backend: "mediapipe" runs MediaPipe per person; "ultralytics", "onnxruntime" or
+                 "openvino" run a YOLOv8-pose model (model_path, e.g. yolov8n-pose.pt) on
+                 all person crops of a frame in one batched call.
         """
         self.model_path = model_path
+        self.backend = backend
+        self.crop_size = crop_size
+        self.batch_model = None
+        self.pose_model = None
+        if backend != "mediapipe":
+            from inference_backend import load_model
+            self.batch_model = load_model(model_path, backend)
+            return
         # Example: if using MediaPipe
         try:
             import mediapipe as mp
@@ -28,12 +48,16 @@ class PoseEstimator:
             poses: dictionary { person_id: keypoints_dict }
                    keypoints_dict = { 'left_shoulder': (x,y), 'right_shoulder': (x,y), ... }
         """
+        if self.batch_model is not None:
+            boxes = np.array([person['bbox'] for person in tracked], dtype=np.int64).reshape(-1, 4)
+            return self.to_dicts([person['id'] for person in tracked], self.estimate_batch(frame, boxes))
+
         poses = {}
         for person in tracked:
             person_id = person['id']
             bbox = person['bbox']  # (x, y, w, h)
             x, y, w, h = bbox
-            cropped = frame[y:y+h, x:x+w].copy()
+            cropped = frame[y:y+h, x:x+w]  # view; cvtColor below makes the only copy
             keypoints = self._estimate_pose_in_bbox(cropped, x, y)
             poses[person_id] = keypoints
         return poses
@@ -74,3 +98,62 @@ class PoseEstimator:
             for k, lm in keypoints_map.items():
                 keypoints[k] = (int(lm.x * w) + x_offset, int(lm.y * h) + y_offset)
         return keypoints
+
+    def estimate_batch(self, frame, boxes):
+        """
+        Batched pose for every (x, y, w, h) box in one model call.
+        Crops are views into the frame (no copy); the model letterboxes them into
+        a single batch tensor. Returns (N, 17, 3) keypoints (x, y, confidence) in
+        frame coordinates, zeros where no person was found in a crop.
+        """
+        keypoints = np.zeros((len(boxes), 17, 3), np.float32)
+        h, w = frame.shape[:2]
+        x0 = np.clip(boxes[:, 0], 0, w - 1)
+        y0 = np.clip(boxes[:, 1], 0, h - 1)
+        x1 = np.clip(boxes[:, 0] + boxes[:, 2], x0 + 1, w)
+        y1 = np.clip(boxes[:, 1] + boxes[:, 3], y0 + 1, h)
+        crops = [frame[t:b, l:r] for l, t, r, b in zip(x0.tolist(), y0.tolist(), x1.tolist(), y1.tolist())]
+        if not crops:
+            return keypoints
+
+        from inference_backend import result_arrays
+        results = self.batch_model(crops, imgsz=self.crop_size, verbose=False)
+        for i, result in enumerate(results):
+            _, scores, _, kpts = result_arrays(result)
+            if len(scores):
+                best = kpts[int(np.argmax(scores))]
+                visible = best[:, 2] >= 0.5
+                keypoints[i] = best
+                keypoints[i, visible, 0] += x0[i]
+                keypoints[i, visible, 1] += y0[i]
+                keypoints[i, ~visible, :2] = 0
+        return keypoints
+
+    @staticmethod
+    def from_detections(tracked_boxes, det_boxes, det_keypoints, min_iou=0.3):
+        """
+        Reuse keypoints the detector already produced (e.g. YOLOv8-pose in run_engine)
+        instead of running a second pose model.
+        tracked_boxes, det_boxes: (N, 4) / (M, 4) arrays of (x, y, w, h)
+        det_keypoints: (M, 17, 3) or (M, 17, 2)
+        Returns (N, 17, det_keypoints.shape[2]); zeros for tracks with no matching detection.
+        """
+        det_keypoints = np.asarray(det_keypoints)
+        out = np.zeros((len(tracked_boxes),) + det_keypoints.shape[1:], det_keypoints.dtype)
+        if len(tracked_boxes) == 0 or len(det_boxes) == 0:
+            return out
+        iou = iou_matrix(tracked_boxes, det_boxes)
+        best = iou.argmax(axis=1)
+        matched = iou[np.arange(len(best)), best] >= min_iou
+        out[matched] = det_keypoints[best[matched]]
+        return out
+
+    @staticmethod
+    def to_dicts(person_ids, keypoints):
+        """{person_id: {name: (x, y)}} for the visible keypoints, the format estimate() returns."""
+        poses = {}
+        for person_id, kpts in zip(person_ids, keypoints):
+            visible = (kpts[:, 2] >= 0.5) if kpts.shape[1] == 3 else (kpts[:, :2] != 0).any(axis=1)
+            poses[person_id] = {KEYPOINT_NAMES[k]: (int(kpts[k, 0]), int(kpts[k, 1]))
+                                for k in np.flatnonzero(visible)}
+        return poses
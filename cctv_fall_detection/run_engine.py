@@ -1,20 +1,32 @@
 # run_engine_safe.py
+import argparse
 import cv2
-from ultralytics import YOLO
 import math
-import logging
-import os
-from collections import defaultdict, deque
-from datetime import datetime
+import numpy as np
+import threading
+import time
+from collections import deque
+import tracing
 from deep_sort_realtime.deepsort_tracker import DeepSort
-from alert_client import post_frame_to_dashboard, post_alert_to_dashboard
+from alert_client import post_frame_to_dashboard, post_detection_alerts, viewer_settings, watch_camera
+from batch_scheduler import BatchScheduler
+from detections import NO_TRACK, Detections
+from draw import draw_detections
+from event_log import get_event_log
+from inference_backend import BACKENDS, load_model as load_backend_model
+from metrics import REGISTRY, start_http_server
+from pipeline import CameraPipeline
+from clip_buffer import ClipBuffer, ClipExporter
+from motion_gate import AdaptiveRate, MotionGate
+from tiled_inference import TiledDetector
+from track_slots import TrackSlots, grow_rows
+from track_store import TrackStateStore
+from tracker import Tracker
+from video_source import VideoSource
 import requests
 
 # ------------------- CONFIG -------------------
 VIDEO_SOURCE = 0  # 0 = webcam, replace with RTSP/HTTP stream
-LOG_FILE = "detections.log"
-SNAPSHOT_DIR = "fall_snapshots"
-os.makedirs(SNAPSHOT_DIR, exist_ok=True)
 
 ANGLE_THRESHOLD = 30          # degrees
 ASPECT_RATIO_THRESHOLD = 1.5  # width / height
@@ -22,12 +34,48 @@ DROP_THRESHOLD = 50           # sudden downward motion
 HISTORY_LEN = 5
 MIN_FRAMES_FOR_ALERT = 2
 
-# ------------------- LOGGING -------------------
-logging.basicConfig(
-    filename=LOG_FILE,
-    level=logging.INFO,
-    format="%(asctime)s - %(message)s",
-)
+BATCH_SIZE = 8              # max frames per batched YOLO call
+BATCH_MAX_LATENCY = 0.030   # seconds a frame may wait for its batch to fill
+STREAM_OPEN_TIMEOUT = 10.0  # seconds to wait for a file / first connection before giving up
+MAX_FRAME_AGE = 0.5         # seconds; older frames are dropped instead of processed
+TRACKER = "deepsort"        # "deepsort" (appearance embeddings) or "iou" (IoU + optimal assignment)
+TRACK_MAX_AGE = 30          # frames a track survives without a detection
+TRACK_MIN_HITS = 3          # frames before a track counts as confirmed
+TRACK_STATE_TTL = 10.0      # seconds fall state is kept after a track was last seen
+TRACK_STATE_MAX = 5000      # LRU cap on tracks with fall state per camera
+CLIP_SECONDS = 10.0         # in-memory footage kept per camera
+CLIP_MAX_BYTES = 32 * 1024 * 1024  # hard memory cap for that footage per camera
+CLIP_PRE_SECONDS = 4.0      # exported clip: seconds before the fall ...
+CLIP_POST_SECONDS = 4.0     # ... and after it
+FRAME_JPEG_QUALITY = 80      # local encodes without a viewer setting (benchmark)
+CLIP_WIDTH = 960            # clip buffer footage is scaled down to this width (0: full resolution) ...
+CLIP_JPEG_QUALITY = 70      # ... and kept unannotated, so it costs no rendering on unwatched cameras
+SNAPSHOT_JPEG_QUALITY = 90  # fall snapshots; encoded once here, stored only by the dashboard
+MOTION_GATE = True          # skip inference on static frames of idle cameras
+MOTION_MIN_CHANGED = 0.002  # fraction of changed pixels (160 px wide grey frame) that counts as motion
+IDLE_AFTER = 5.0            # seconds without people or motion before a camera counts as idle
+IDLE_MAX_INTERVAL = 1.0     # safety floor: idle cameras are still inferred at least this often
+INFERENCE_BACKEND = "ultralytics"  # "ultralytics" (PyTorch), "onnxruntime" or "openvino"
+INFERENCE_INT8 = False      # ONNX backends: use the INT8-quantized model
+POSE_WEIGHTS = "yolov8n-pose.pt"
+TILED = False               # overlapping-tile inference for high-resolution wide-angle feeds
+LOG_FRAMES = True           # per-frame records in the event log (fall events are always logged)
+METRICS_PORT = None         # serve Prometheus /metrics on this port (supervisor: first worker's port)
+
+# ------------------- METRICS -------------------
+STAGE_SECONDS = REGISTRY.histogram("engine_stage_seconds", "Time spent per frame in each pipeline stage",
+                                   ("camera", "stage"))
+FRAMES_TOTAL = REGISTRY.counter("engine_frames_total", "Frames through the inference stage",
+                                ("camera", "inference"))
+CAMERA_FPS = REGISTRY.gauge("engine_camera_fps", "Frames per second arriving from the camera", ("camera",))
+CAMERA_RECONNECTS = REGISTRY.gauge("engine_camera_reconnects_total", "Camera reconnect attempts",
+                                   ("camera",), kind="counter")
+CAMERA_FRAME_AGE = REGISTRY.gauge("engine_camera_last_frame_age_seconds", "Seconds since the last frame arrived",
+                                  ("camera",))
+FRAMES_RENDERED = REGISTRY.counter("engine_frames_rendered_total",
+                                   "Frames annotated for dashboard viewers or the local window", ("camera",))
+DROPPED_FRAMES = REGISTRY.gauge("engine_dropped_frames_total", "Frames dropped per pipeline stage",
+                                ("camera", "stage"), kind="counter")
 
 # ------------------- UTILS -------------------
 def get_angle(p1, p2):
@@ -38,25 +86,62 @@ def get_angle(p1, p2):
     return abs(math.degrees(math.atan2(dy, dx)))
 
 
-def safe_post_frame(frame):
+_clip_exporter = None
+_store_lock = threading.Lock()
+
+
+def get_clip_exporter():
+    global _clip_exporter
+    with _store_lock:
+        if _clip_exporter is None:
+            _clip_exporter = ClipExporter(pre_seconds=CLIP_PRE_SECONDS, post_seconds=CLIP_POST_SECONDS)
+        return _clip_exporter
+
+
+def safe_post_frame(frame, camera_id=None, variant=None):
     try:
-        post_frame_to_dashboard(frame)
+        post_frame_to_dashboard(frame, camera_id=camera_id, variant=variant)
     except requests.exceptions.RequestException:
         pass  # skip if server is down
 
 
-def safe_post_alert(person_id, bbox, note, snapshot_image):
+def safe_post_alerts(detections, note, snapshot_image, camera_id=None, captured_at=None):
     try:
-        post_alert_to_dashboard(person_id=person_id, bbox=bbox, note=note, snapshot_image=snapshot_image)
+        post_detection_alerts(detections, note=note, snapshot_image=snapshot_image, camera_id=camera_id,
+                              captured_at=captured_at)
     except requests.exceptions.RequestException:
         pass  # skip if server is down
 
 # ------------------- FALL DETECTOR -------------------
+class PersonState:
+    """Fall history of one tracked person."""
+    __slots__ = ("positions", "fall_flags", "alerted")
+
+    def __init__(self, history_len=HISTORY_LEN, min_frames=MIN_FRAMES_FOR_ALERT):
+        self.positions = deque(maxlen=history_len)
+        self.fall_flags = deque(maxlen=min_frames)
+        self.alerted = False
+
+
 class FallDetector:
-    def __init__(self):
-        self.prev_positions = defaultdict(lambda: deque(maxlen=HISTORY_LEN))
-        self.prev_fall_flags = defaultdict(lambda: deque(maxlen=MIN_FRAMES_FOR_ALERT))
-        self.alerted_persons = defaultdict(bool)
+    def __init__(self, max_tracks=TRACK_STATE_MAX, ttl=TRACK_STATE_TTL, angle_threshold=ANGLE_THRESHOLD,
+                 aspect_ratio_threshold=ASPECT_RATIO_THRESHOLD, drop_threshold=DROP_THRESHOLD,
+                 history_len=HISTORY_LEN, min_frames=MIN_FRAMES_FOR_ALERT):
+        """
+        Per-person reference implementation of the rules BatchFallDetector runs
+        (the engine and sweep.py use that one); it takes the same thresholds so
+        tests can check both give identical results under any setting.
+        """
+        # Per-person history, evicted once a track has been gone for `ttl` seconds
+        self.people = TrackStateStore(max_entries=max_tracks, ttl=ttl)
+        self.angle_threshold = angle_threshold
+        self.aspect_ratio_threshold = aspect_ratio_threshold
+        self.drop_threshold = drop_threshold
+        self.history_len = history_len
+        self.min_frames = min_frames
+
+    def _person(self):
+        return PersonState(self.history_len, self.min_frames)
 
     def check_fall(self, person_id, bbox, keypoints):
         x, y, w, h = bbox
@@ -76,148 +161,558 @@ class FallDetector:
                 (keypoints["left_hip"][1] + keypoints["right_hip"][1]) / 2
             )
             angle = get_angle(mid_shoulder, mid_hip)
-            if angle < ANGLE_THRESHOLD:
+            if angle < self.angle_threshold:
                 fall_pose = True
 
         # Aspect ratio
-        if aspect_ratio > ASPECT_RATIO_THRESHOLD:
+        if aspect_ratio > self.aspect_ratio_threshold:
             fall_aspect = True
 
+        person = self.people.setdefault(person_id, self._person)
+
         # Sudden downward motion
-        positions = self.prev_positions[person_id]
+        positions = person.positions
         if positions:
             prev_x, prev_y = positions[-1]
-            if y - prev_y > DROP_THRESHOLD:
+            if y - prev_y > self.drop_threshold:
                 fall_motion = True
         positions.append((x, y))
 
         # Combine conditions
         fall_flag = sum([fall_pose, fall_aspect, fall_motion]) >= 2
-        self.prev_fall_flags[person_id].append(fall_flag)
+        person.fall_flags.append(fall_flag)
 
-        if sum(self.prev_fall_flags[person_id]) >= MIN_FRAMES_FOR_ALERT:
-            if not self.alerted_persons[person_id]:
-                self.alerted_persons[person_id] = True
+        if sum(person.fall_flags) >= self.min_frames:
+            if not person.alerted:
+                person.alerted = True
                 return True
         else:
-            self.alerted_persons[person_id] = False
+            person.alerted = False
 
         return False
 
+class BatchFallDetector:
+    """
+    Same rules as FallDetector, evaluated for every person in a frame at once.
+    History lives in NumPy ring buffers indexed by track slot instead of
+    per-person deques; slots of tracks unseen for `ttl` seconds are recycled.
+    """
+    def __init__(self, capacity=256, max_tracks=TRACK_STATE_MAX, ttl=TRACK_STATE_TTL,
+                 angle_threshold=ANGLE_THRESHOLD, aspect_ratio_threshold=ASPECT_RATIO_THRESHOLD,
+                 drop_threshold=DROP_THRESHOLD, history_len=HISTORY_LEN, min_frames=MIN_FRAMES_FOR_ALERT):
+        self.angle_threshold = angle_threshold
+        self.aspect_ratio_threshold = aspect_ratio_threshold
+        self.drop_threshold = drop_threshold
+        self.history_len = history_len
+        self.min_frames = min_frames
+        self.slots = TrackSlots(capacity, max_tracks=max_tracks, ttl=ttl)
+        self.positions = np.zeros((capacity, history_len, 2), dtype=np.float64)
+        self.pos_head = np.zeros(capacity, dtype=np.intp)
+        self.pos_count = np.zeros(capacity, dtype=np.intp)
+        self.fall_flags = np.zeros((capacity, min_frames), dtype=bool)
+        self.flag_head = np.zeros(capacity, dtype=np.intp)
+        self.alerted = np.zeros(capacity, dtype=bool)
+
+    def _ensure_capacity(self):
+        capacity = self.slots.capacity
+        if len(self.alerted) < capacity:
+            for name in ("positions", "pos_head", "pos_count", "fall_flags", "flag_head", "alerted"):
+                setattr(self, name, grow_rows(getattr(self, name), capacity))
+
+    def _reset(self, slots):
+        self.pos_head[slots] = 0
+        self.pos_count[slots] = 0
+        self.fall_flags[slots] = False
+        self.flag_head[slots] = 0
+        self.alerted[slots] = False
+
+    def release(self, person_ids):
+        self._reset(self.slots.release(person_ids))
+
+    def check_falls(self, person_ids, bboxes, keypoints, return_alarm=False):
+        """
+        person_ids: N unique IDs
+        bboxes: (N, 4) array of (x, y, w, h)
+        keypoints: (N, 17, 2) COCO keypoints
+        Returns a boolean mask, True where a new fall alert fires; with return_alarm,
+        (new_alert, alarm) where alarm is True for everyone currently counted as fallen.
+        """
+        if len(person_ids) == 0:
+            empty = np.zeros(0, dtype=bool)
+            return (empty, empty) if return_alarm else empty
+
+        slots, is_new = self.slots.lookup(person_ids)
+        self._ensure_capacity()
+        self._reset(slots[is_new])
+
+        bboxes = np.asarray(bboxes, dtype=np.float64)
+        keypoints = np.asarray(keypoints, dtype=np.float64)
+        x, y, w, h = bboxes.T
+        aspect_ratio = w / (h + 1e-5)
+
+        # Pose orientation
+        mid_shoulder = (keypoints[:, 5] + keypoints[:, 6]) / 2
+        mid_hip = (keypoints[:, 11] + keypoints[:, 12]) / 2
+        dx = mid_hip[:, 0] - mid_shoulder[:, 0]
+        dy = mid_hip[:, 1] - mid_shoulder[:, 1]
+        with np.errstate(invalid="ignore"):
+            angle = np.where(dx == 0, 90.0, np.abs(np.degrees(np.arctan2(dy, dx))))
+        fall_pose = angle < self.angle_threshold
+
+        # Aspect ratio
+        fall_aspect = aspect_ratio > self.aspect_ratio_threshold
+
+        # Sudden downward motion
+        head = self.pos_head[slots]
+        prev_y = self.positions[slots, (head - 1) % self.history_len, 1]
+        fall_motion = (self.pos_count[slots] > 0) & (y - prev_y > self.drop_threshold)
+        self.positions[slots, head, 0] = x
+        self.positions[slots, head, 1] = y
+        self.pos_head[slots] = (head + 1) % self.history_len
+        self.pos_count[slots] = np.minimum(self.pos_count[slots] + 1, self.history_len)
+
+        # Combine conditions
+        fall_flag = (fall_pose.astype(np.int8) + fall_aspect + fall_motion) >= 2
+        flag_head = self.flag_head[slots]
+        self.fall_flags[slots, flag_head] = fall_flag
+        self.flag_head[slots] = (flag_head + 1) % self.min_frames
+
+        alarm = self.fall_flags[slots].sum(axis=1) >= self.min_frames
+        new_alert = alarm & ~self.alerted[slots]
+        self.alerted[slots] = alarm
+        return (new_alert, alarm) if return_alarm else new_alert
+
+    def check_detections(self, detections, return_alarm=False):
+        """check_falls on the tracked rows of a Detections; masks are over all rows."""
+        mask = np.zeros(len(detections), dtype=bool)
+        alarm = np.zeros(len(detections), dtype=bool)
+        rows = np.flatnonzero(detections.track_ids != NO_TRACK)
+        person_ids = [str(tid) for tid in detections.track_ids[rows].tolist()]
+        mask[rows], alarm[rows] = self.check_falls(person_ids, detections.boxes[rows],
+                                                   detections.keypoints[rows, :, :2], return_alarm=True)
+        return (mask, alarm) if return_alarm else mask
+
 # ------------------- MAIN -------------------
-def main():
-    print("[INFO] Loading YOLOv8-pose model...")
-    model = YOLO("yolov8n-pose.pt")
+def load_model(backend=INFERENCE_BACKEND, int8=INFERENCE_INT8):
+    return load_backend_model(POSE_WEIGHTS, backend, int8=int8)
+
+
+def torso_bboxes(keypoints, w, h):
+    """
+    Integer (x, y, w, h) boxes around the shoulders and hips, clamped to the frame.
+    Returns (bboxes, valid) where valid drops empty / inverted boxes.
+    """
+    torso = keypoints[:, [5, 6, 11, 12]]
+    x_min = np.trunc(torso[..., 0].min(axis=1)).astype(np.int64)
+    y_min = np.trunc(torso[..., 1].min(axis=1)).astype(np.int64)
+    x_max = np.trunc(torso[..., 0].max(axis=1)).astype(np.int64)
+    y_max = np.trunc(torso[..., 1].max(axis=1)).astype(np.int64)
+
+    # Clamp bbox inside frame
+    x_min = np.clip(x_min, 0, w - 1)
+    y_min = np.clip(y_min, 0, h - 1)
+    x_max = np.clip(x_max, 0, w - 1)
+    y_max = np.clip(y_max, 0, h - 1)
+
+    valid = (x_max > x_min) & (y_max > y_min)
+    bboxes = np.stack([x_min, y_min, x_max - x_min, y_max - y_min], axis=1)
+    return bboxes, valid
+
+
+class CameraState:
+    """Per-camera detection state: each stream needs its own fall history and tracks."""
+    def __init__(self, camera_id, tracker=TRACKER, motion_gate=MOTION_GATE):
+        self.camera_id = camera_id
+        self.motion_gate = MotionGate(min_changed=MOTION_MIN_CHANGED) if motion_gate else None
+        self.rate = AdaptiveRate(idle_interval=IDLE_MAX_INTERVAL, idle_after=IDLE_AFTER)
+        self.fall_detector = BatchFallDetector()
+        self.clip_buffer = ClipBuffer(seconds=CLIP_SECONDS, max_bytes=CLIP_MAX_BYTES)
+        # Last processed frame, for the event log: tracked people and who is currently fallen
+        self.detections = Detections.empty()
+        self.fallen = np.zeros(0, dtype=bool)
+        if tracker == "iou":
+            self.tracker = Tracker(assignment="optimal", max_missed=TRACK_MAX_AGE,
+                                   min_hits=TRACK_MIN_HITS)
+        elif tracker == "deepsort":
+            self.tracker = DeepSort(max_age=TRACK_MAX_AGE, n_init=TRACK_MIN_HITS)
+        else:
+            raise ValueError(f"Unknown tracker: {tracker}")
+
 
-    print("[INFO] Starting video stream...")
-    cap = cv2.VideoCapture(VIDEO_SOURCE)
-    if not cap.isOpened():
-        print("[ERROR] Cannot access camera/stream")
+def track_people(state, detections, frame):
+    """
+    Update the camera's tracker with this frame's (x, y, w, h) boxes and fill in
+    detections.track_ids (NO_TRACK while a track is unconfirmed).
+    """
+    if isinstance(state.tracker, Tracker):
+        state.tracker.update_detections(detections)
+        return
+
+    # DeepSORT: pass the row index along so each track can be mapped back to its detection
+    if not len(detections):
+        return
+    dets = [[[x, y, x + bw, y + bh], 1.0, None] for x, y, bw, bh in detections.boxes.tolist()]
+    for t in state.tracker.update_tracks(dets, frame=frame, others=list(range(len(dets)))):
+        if t.is_confirmed() and t.time_since_update == 0:
+            detections.track_ids[t.get_det_supplementary()] = int(t.track_id)
+
+
+def track_result(state, frame, result):
+    """
+    Torso-box Detections of one frame's pose result, with track IDs filled in.
+    Falls are checked on the torso box, not the full-body box.
+    """
+    h, w, _ = frame.shape
+    detections = Detections.from_result(result)
+    bboxes, valid = torso_bboxes(detections.keypoints[..., :2].astype(np.float64), w, h)
+    detections.boxes = bboxes
+    detections = detections[valid]
+
+    # Tracking (safe)
+    try:
+        track_people(state, detections, frame)
+    except Exception as e:
+        print(f"[ERROR] Tracker failed: {e}")
+        detections.track_ids[:] = NO_TRACK
+    return detections
+
+
+def check_result(state, frame, result, timings=None):
+    """
+    Run tracking and fall checks on one frame's YOLOv8-pose result.
+    Returns (detections, fall_mask) where fall_mask marks the people whose
+    fall alert just fired; alerting is left to the caller so it can happen
+    off the inference thread.
+    timings: optional dict that receives the seconds spent in "track" and "heuristic"
+    """
+    t0 = time.perf_counter()
+    detections = track_result(state, frame, result)
+
+    # Fall state is keyed on confirmed track IDs, so it follows the person
+    t1 = time.perf_counter()
+    tracing.record("track", t0, t1, camera=state.camera_id)
+    fall_mask, state.fallen = state.fall_detector.check_detections(detections, return_alarm=True)
+    state.detections = detections
+
+    t2 = time.perf_counter()
+    tracing.record("heuristic", t1, t2, camera=state.camera_id)
+    if timings is not None:
+        timings["track"] = t1 - t0
+        timings["heuristic"] = t2 - t1
+    return detections, fall_mask
+
+
+def render_result(result, detections, fall_mask):
+    """Pose overlay plus tracked torso boxes on a copy of the frame."""
+    annotated_frame = result.plot()
+    if fall_mask.any():
+        cv2.putText(annotated_frame, "FALL ALERT!", (20, 40),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 255), 3)
+    draw_detections(annotated_frame, detections, fall_mask)
+    return annotated_frame
+
+
+def process_result(state, frame, result, timings=None):
+    """
+    check_result followed by render_result, for callers that always want the overlay.
+    Returns (annotated_frame, falls) where falls is a Detections of the new falls.
+    timings: as in check_result, plus "annotate"
+    """
+    detections, fall_mask = check_result(state, frame, result, timings)
+    t0 = time.perf_counter()
+    annotated_frame = render_result(result, detections, fall_mask)
+    t1 = time.perf_counter()
+    tracing.record("annotate", t0, t1, camera=state.camera_id)
+    if timings is not None:
+        timings["annotate"] = t1 - t0
+    return annotated_frame, detections[fall_mask]
+
+
+def encode_jpeg(frame, width=0, quality=FRAME_JPEG_QUALITY):
+    """JPEG bytes of a frame scaled down to `width` pixels (0: as is; never scaled up), or None."""
+    h, w = frame.shape[:2]
+    if 0 < width < w:
+        frame = cv2.resize(frame, (width, max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+    ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    return jpeg.tobytes() if ok else None
+
+
+def wall_time(monotonic_ts):
+    """time.time() equivalent of a time.monotonic() timestamp."""
+    return time.time() - (time.monotonic() - monotonic_ts)
+
+
+def frame_record(state, frame_id, captured_at):
+    """Event log record of the last processed frame: tracked people and their fall state."""
+    dets = state.detections
+    return {
+        "type": "frame",
+        "ts": round(wall_time(captured_at), 3),
+        "camera_id": state.camera_id,
+        "frame": frame_id,
+        "falls": int(state.fallen.sum()),
+        "track_ids": dets.track_ids,
+        "boxes": dets.boxes.astype(np.int32),
+        "fall_flags": state.fallen.astype(np.int8),
+    }
+
+
+def raise_alerts(state, falls, frame, captured_at):
+    """
+    Snapshot, clip, event log record and dashboard alert for a Detections of new falls in one frame.
+    People falling in the same frame share one clip; its path goes in every alert's note.
+    """
+    camera_id = state.camera_id
+    ts = round(wall_time(captured_at), 3)
+    boxes = falls.boxes.astype(np.int32)
+    keypoints = np.round(falls.keypoints, 1)
+    clip = get_clip_exporter().export(state.clip_buffer, captured_at, f"fall_{camera_id}")
+    for i, person_id in enumerate(falls.track_ids.tolist()):
+        print(f"⚠️ Fall detected! Camera {camera_id} Person {person_id}")
+        get_event_log().log({"type": "fall", "ts": ts, "camera_id": camera_id, "track_id": person_id,
+                             "bbox": boxes[i], "keypoints": keypoints[i], "clip": clip})
+
+    # The dashboard's SnapshotStore keeps the one copy on disk (and owns its retention)
+    snapshot = encode_jpeg(frame, quality=SNAPSHOT_JPEG_QUALITY)
+    note = "Fall detected" if clip is None else f"Fall detected (clip {clip})"
+    safe_post_alerts(falls, note, snapshot, camera_id, captured_at)
+
+
+def run_camera(source=VIDEO_SOURCE, camera_id="0", display=True, model=None, scheduler=None,
+               tracker=TRACKER, motion_gate=MOTION_GATE, tiled=TILED,
+               backend=INFERENCE_BACKEND, int8=INFERENCE_INT8):
+    """
+    Run the full detection loop on one stream.
+    Each call keeps its own FallDetector / DeepSORT state, so the supervisor
+    can run one of these per camera in separate processes.
+    With a BatchScheduler, inference is shared with the other cameras that
+    use the same scheduler instead of calling the model directly.
+    With motion_gate, static frames of an idle camera skip inference and go
+    to the dashboard unannotated; people or motion bring it back to full rate.
+    Frames are only annotated and encoded while someone watches: once per
+    (width, quality) the dashboard's viewers asked for, plus the local window
+    with display. Detection and alerts run on every frame fresh enough to process;
+    the clip buffer gets every frame, including those dropped as stale.
+    With tiled, each frame is split into overlapping tiles inferred in one
+    batch, and tiles that have not changed reuse their cached detections.
+    Network streams and webcams reconnect on their own (video_source.VideoSource).
+    Returns False if a file could not be opened, True when the stream ends.
+    """
+    if model is None and scheduler is None:
+        print(f"[INFO] [{camera_id}] Loading YOLOv8-pose model...")
+        model = load_model(backend, int8)
+
+    print(f"[INFO] [{camera_id}] Starting video stream {source}...")
+    video = VideoSource(source, name=camera_id,
+                        on_decode=lambda seconds: STAGE_SECONDS.observe(seconds, camera_id, "read")).start()
+    if not video.wait_connected(timeout=STREAM_OPEN_TIMEOUT) and not video.reconnect:
+        print(f"[ERROR] [{camera_id}] Cannot access camera/stream")
+        video.stop()
+        return False
+
+    state = CameraState(camera_id, tracker=tracker, motion_gate=motion_gate)
+    timings = {}
+
+    def infer_batch(images):
+        if scheduler is not None:
+            futures = [scheduler.submit((camera_id, i), image) for i, image in enumerate(images)]
+            return [future.result() for future in futures]
+        return model(images, verbose=False)
+
+    tiler = TiledDetector(infer_batch) if tiled else None
+
+    def infer(packet):
+        started = time.perf_counter()
+        if state.motion_gate is not None:
+            moving = state.motion_gate.moving(packet.frame)
+            if not state.rate.should_infer(packet.captured_at, moving):
+                packet.falls = Detections.empty()
+                FRAMES_TOTAL.inc(camera_id, "skipped")
+                tracing.record("motion_gate", started, time.perf_counter(), camera=camera_id, frame=packet.frame_id)
+                return
+        t0 = time.perf_counter()
+        if tiler is not None:
+            packet.result = tiler(packet.frame, packet.captured_at)
+        elif scheduler is not None:
+            packet.result = scheduler.infer(camera_id, packet.frame)
+            if packet.result is None:
+                return False  # scheduler shut down or frame superseded
+        else:
+            packet.result = model(packet.frame, verbose=False)[0]
+        t1 = time.perf_counter()
+        STAGE_SECONDS.observe(t1 - t0, camera_id, "infer")
+        tracing.record("infer", t0, t1, camera=camera_id, frame=packet.frame_id)
+        packet.detections, packet.fall_mask = check_result(state, packet.frame, packet.result, timings)
+        packet.falls = packet.detections[packet.fall_mask]
+        state.rate.observe(packet.captured_at, len(packet.result))
+        FRAMES_TOTAL.inc(camera_id, "inferred")
+        for stage, seconds in timings.items():
+            STAGE_SECONDS.observe(seconds, camera_id, stage)
+        if LOG_FRAMES:
+            get_event_log().log(frame_record(state, packet.frame_id, packet.captured_at))
+        tracing.record("frame", started, time.perf_counter(), camera=camera_id, frame=packet.frame_id,
+                       people=len(packet.result), falls=len(packet.falls))
+
+    def keep(packet):
+        # Fall clips need the footage whether or not anyone is watching: small and unannotated
+        t0 = time.perf_counter()
+        clip_jpeg = encode_jpeg(packet.frame, CLIP_WIDTH, CLIP_JPEG_QUALITY)
+        if clip_jpeg is not None:
+            state.clip_buffer.add_jpeg(packet.captured_at, clip_jpeg)
+        t1 = time.perf_counter()
+        STAGE_SECONDS.observe(t1 - t0, camera_id, "clip")
+        tracing.record("clip", t0, t1, camera=camera_id, frame=packet.frame_id)
+
+    def output(packet):
+        t1 = time.perf_counter()
+        settings = viewer_settings(camera_id)
+        if not settings and not display:
+            return  # nobody is watching
+        if packet.result is None:
+            packet.annotated = packet.frame  # skipped by the motion gate, nothing to draw
+        else:
+            packet.annotated = render_result(packet.result, packet.detections, packet.fall_mask)
+        FRAMES_RENDERED.inc(camera_id)
+        t2 = time.perf_counter()
+        # One encode per requested setting, shared by every viewer watching at it
+        jpegs = [(variant, encode_jpeg(packet.annotated, *variant)) for variant in settings]
+        t3 = time.perf_counter()
+        for variant, jpeg in jpegs:
+            if jpeg is not None:
+                safe_post_frame(jpeg, camera_id, variant)
+        t4 = time.perf_counter()
+        STAGE_SECONDS.observe(t2 - t1, camera_id, "annotate")
+        tracing.record("annotate", t1, t2, camera=camera_id, frame=packet.frame_id)
+        if jpegs:
+            STAGE_SECONDS.observe(t3 - t2, camera_id, "encode")
+            STAGE_SECONDS.observe(t4 - t3, camera_id, "post")
+            tracing.record("encode", t2, t3, camera=camera_id, frame=packet.frame_id, settings=len(jpegs),
+                           bytes=sum(len(jpeg or b"") for _, jpeg in jpegs))
+            tracing.record("post", t3, t4, camera=camera_id, frame=packet.frame_id)
+
+    def alert(packet):
+        with tracing.span("alert", camera=camera_id, frame=packet.frame_id, falls=len(packet.falls)):
+            raise_alerts(state, packet.falls, packet.frame, packet.captured_at)
+
+    pipeline = CameraPipeline(camera_id, video.read, infer, output, alert,
+                              max_frame_age=MAX_FRAME_AGE, display=display, pull=True, keep=keep)
+    # Scrape-time reads of counters the source and pipeline keep anyway
+    CAMERA_FPS.set_function(lambda: video.fps, camera_id)
+    CAMERA_RECONNECTS.set_function(lambda: video.reconnects, camera_id)
+    CAMERA_FRAME_AGE.set_function(lambda: video.health()["last_frame_age"], camera_id)
+    for stage in pipeline.dropped_frames():
+        DROPPED_FRAMES.set_function(lambda stage=stage: pipeline.dropped_frames()[stage], camera_id, stage)
+    pipeline.start()
+    watch_camera(camera_id)
+
+    try:
+        if display:
+            # Show (cv2.imshow has to stay on the main thread)
+            while True:
+                packet = pipeline.display_queue.get()
+                if packet is None:
+                    break
+                cv2.imshow(f"CCTV Fall Detection [{camera_id}]",
+                           packet.frame if packet.annotated is None else packet.annotated)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+        else:
+            pipeline.join()
+    finally:
+        watch_camera(camera_id, -1)
+        pipeline.stop()
+        video.stop()
+        pipeline.join()
+
+    if display:
+        cv2.destroyAllWindows()
+    for gauge in (CAMERA_FPS, CAMERA_RECONNECTS, CAMERA_FRAME_AGE):
+        gauge.remove(camera_id)
+    for stage in pipeline.dropped_frames():
+        DROPPED_FRAMES.remove(camera_id, stage)
+    print(f"[INFO] [{camera_id}] CCTV engine stopped. Source: {video.health()}, "
+          f"dropped frames: {pipeline.dropped_frames()}, "
+          f"fall state: {len(state.fall_detector.slots)} tracks, {state.fall_detector.slots.evictions} evicted, "
+          f"inference skipped on {state.rate.skipped} idle frames")
+    return True
+
+
+def run_cameras_batched(cameras, max_batch_size=BATCH_SIZE, max_latency=BATCH_MAX_LATENCY,
+                        **engine_options):
+    """
+    Run several cameras in one process, one capture thread per camera,
+    sharing a single model through a BatchScheduler.
+    cameras: list of (camera_id, source) tuples
+    engine_options: extra run_camera keyword arguments
+    Returns True only if every stream opened.
+    """
+    print(f"[INFO] Loading YOLOv8-pose model for {len(cameras)} cameras...")
+    model = load_model(engine_options.get("backend", INFERENCE_BACKEND),
+                       engine_options.get("int8", INFERENCE_INT8))
+    scheduler = BatchScheduler(model, max_batch_size=max_batch_size, max_latency=max_latency)
+    scheduler.start()
+
+    outcomes = {}
+
+    def worker(camera_id, source):
+        outcomes[camera_id] = run_camera(source, camera_id=camera_id, display=False,
+                                         scheduler=scheduler, **engine_options)
+
+    threads = [threading.Thread(target=worker, args=cam, name=f"camera-{cam[0]}", daemon=True)
+               for cam in cameras]
+    for t in threads:
+        t.start()
+    try:
+        for t in threads:
+            t.join()
+    finally:
+        scheduler.stop()
+    return all(outcomes.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CCTV fall detection engine")
+    parser.add_argument("--source", default=str(VIDEO_SOURCE),
+                        help="webcam index, video file or RTSP/HTTP URL")
+    parser.add_argument("--camera-id", default="0")
+    parser.add_argument("--cameras", help="camera list file; runs the multi-camera supervisor")
+    parser.add_argument("--cameras-per-worker", type=int, default=1,
+                        help="supervisor only: cameras sharing one batched model per worker")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="max frames per batched model call")
+    parser.add_argument("--max-latency-ms", type=float, default=BATCH_MAX_LATENCY * 1000,
+                        help="max time a frame waits for its batch to fill")
+    parser.add_argument("--tracker", choices=["deepsort", "iou"], default=TRACKER,
+                        help="iou: embedding-free IoU tracker with optimal assignment")
+    parser.add_argument("--backend", choices=BACKENDS, default=INFERENCE_BACKEND,
+                        help="onnxruntime / openvino: exported ONNX model on CPU")
+    parser.add_argument("--int8", action="store_true", default=INFERENCE_INT8,
+                        help="ONNX backends: INT8 model from inference_backend.py quantize")
+    parser.add_argument("--tiled", action="store_true",
+                        help="infer overlapping tiles, for distant people on high-resolution cameras")
+    parser.add_argument("--no-motion-gate", action="store_true",
+                        help="run inference on every frame, even on idle cameras")
+    parser.add_argument("--no-display", action="store_true", help="disable the cv2.imshow window")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="serve Prometheus /metrics; with --cameras, worker i uses this port + i")
+    args = parser.parse_args()
+    engine_options = {"tracker": args.tracker, "motion_gate": not args.no_motion_gate,
+                      "tiled": args.tiled, "backend": args.backend, "int8": args.int8}
+
+    if args.cameras:
+        from supervisor import CameraSupervisor, load_camera_list
+        CameraSupervisor(load_camera_list(args.cameras),
+                         cameras_per_worker=args.cameras_per_worker,
+                         max_batch_size=args.batch_size,
+                         max_latency=args.max_latency_ms / 1000.0,
+                         engine_options=engine_options,
+                         metrics_port=args.metrics_port).run()
         return
 
-    fall_detector = FallDetector()
-    tracker = DeepSort(max_age=30)
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        results = model(frame, verbose=False)
-        annotated_frame = frame.copy()
-        dets = []
-
-        h, w, _ = frame.shape
-
-        for result in results:
-            if result.keypoints is None:
-                continue
-
-            for i, person in enumerate(result.keypoints.xy):
-                person_id = f"{i}"
-                try:
-                    left_shoulder = person[5].tolist()
-                    right_shoulder = person[6].tolist()
-                    left_hip = person[11].tolist()
-                    right_hip = person[12].tolist()
-
-                    # Build bbox
-                    x_min = int(min(left_shoulder[0], right_shoulder[0], left_hip[0], right_hip[0]))
-                    y_min = int(min(left_shoulder[1], right_shoulder[1], left_hip[1], right_hip[1]))
-                    x_max = int(max(left_shoulder[0], right_shoulder[0], left_hip[0], right_hip[0]))
-                    y_max = int(max(left_shoulder[1], right_shoulder[1], left_hip[1], right_hip[1]))
-
-                    # Clamp bbox inside frame
-                    x_min = max(0, min(x_min, w - 1))
-                    y_min = max(0, min(y_min, h - 1))
-                    x_max = max(0, min(x_max, w - 1))
-                    y_max = max(0, min(y_max, h - 1))
-
-                    if x_max <= x_min or y_max <= y_min:
-                        continue  # skip invalid box
-
-                    bbox = (x_min, y_min, x_max - x_min, y_max - y_min)
-
-                    # Valid detection for DeepSORT
-                    dets.append([[x_min, y_min, x_max, y_max], 1.0, None])
-
-                    keypoints_dict = {
-                        "left_shoulder": left_shoulder,
-                        "right_shoulder": right_shoulder,
-                        "left_hip": left_hip,
-                        "right_hip": right_hip,
-                    }
-
-                    if fall_detector.check_fall(person_id, bbox, keypoints_dict):
-                        print(f"⚠️ Fall detected! Person {person_id}")
-                        logging.warning(f"Fall detected: Person {person_id}")
-
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        snap_path = os.path.join(SNAPSHOT_DIR, f"fall_{person_id}_{timestamp}.jpg")
-                        cv2.imwrite(snap_path, frame)
-
-                        safe_post_alert(person_id, bbox, "Fall detected", frame)
-
-                        cv2.putText(annotated_frame, "FALL ALERT!", (20, 40),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 255), 3)
-
-                except Exception as e:
-                    print(f"[WARN] Error processing person {i}: {e}")
-                    continue
-
-        # Overlay keypoints/pose
-        if results:
-            annotated_frame = results[0].plot()
-
-        # DeepSORT tracking (safe)
-        tracks = []
-        if dets:
-            try:
-                tracks = tracker.update_tracks(dets, frame=frame)
-            except Exception as e:
-                print(f"[ERROR] DeepSORT failed: {e}")
-                tracks = []
-
-        for t in tracks:
-            if t.is_confirmed():
-                tid = t.track_id
-                l, t_, r, b = t.to_ltrb()
-                cv2.rectangle(annotated_frame, (int(l), int(t_)), (int(r), int(b)), (0, 255, 0), 2)
-                cv2.putText(annotated_frame, f"ID: {tid}", (int(l), int(t_)-10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-
-        # Dashboard + snapshot
-        safe_post_frame(annotated_frame)
-        cv2.imwrite(os.path.join(SNAPSHOT_DIR, "latest.jpg"), annotated_frame)
-
-        # Show
-        cv2.imshow("CCTV Fall Detection", annotated_frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-
-    cap.release()
-    cv2.destroyAllWindows()
-    print("[INFO] CCTV engine stopped.")
+    tracing.install_signal_handler()
+    if args.metrics_port:
+        start_http_server(args.metrics_port, routes=tracing.HTTP_ROUTES)
+    run_camera(args.source, camera_id=args.camera_id, display=not args.no_display, **engine_options)
 
 
 if __name__ == "__main__":
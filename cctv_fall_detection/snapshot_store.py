@@ -0,0 +1,175 @@
+# snapshot_store.py
+import hashlib
+import os
+import re
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+THUMB_DIR = "thumbs"
+MAX_PENDING = 256                   # snapshots waiting for the writer thread
+MAX_BYTES = 20 * 1024 ** 3          # disk budget for full-size snapshots + thumbnails
+MAX_AGE = 50 * 24 * 3600            # seconds; covers a 45-day event with margin
+CLEANUP_INTERVAL = 60               # seconds between retention passes
+STORE_NAME = re.compile(r"^[0-9a-f]{24}\.jpg$")  # content_name() output; only these are ever deleted
+
+
+def content_name(jpeg_bytes):
+    """File name derived from the image bytes, so identical snapshots share one file."""
+    return hashlib.sha1(jpeg_bytes).hexdigest()[:24] + ".jpg"
+
+
+class SnapshotStore:
+    def __init__(self, root, thumb_width=240, thumbnails=True, max_bytes=MAX_BYTES, max_age=MAX_AGE,
+                 jpeg_quality=90):
+        """
+        Fall snapshots written by a background thread.
+        - files are named by content hash, so the same image is stored once
+        - small thumbnails go to <root>/thumbs/ for the alert list
+        - retention deletes files older than max_age, then the oldest files
+          until the directory fits in max_bytes; every pass re-reads the directory,
+          so files written by anything else count against the budget too (but
+          only snapshots named by the store are deleted, never e.g. hand-placed samples)
+        Callers never wait on disk; if the writer falls behind, new snapshots
+        are dropped with a warning instead of blocking.
+        """
+        self.root = root
+        self.thumb_root = os.path.join(root, THUMB_DIR)
+        self.thumb_width = thumb_width
+        self.thumbnails = thumbnails
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.jpeg_quality = jpeg_quality
+        os.makedirs(self.thumb_root, exist_ok=True)
+
+        self.files = {}  # path -> (size, mtime) as of the last scan, only touched by the writer thread
+        self.total_bytes = 0
+        self.dropped = 0
+        self.deleted = 0
+        self._queue = queue.Queue(maxsize=MAX_PENDING)
+        self._thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+        self._thread.start()
+
+    def save_frame(self, frame):
+        """Queues a BGR frame; it is JPEG-encoded on the writer thread. False if it was dropped."""
+        return self._enqueue(("frame", frame))
+
+    def save_jpeg(self, jpeg_bytes):
+        """Queues already-encoded JPEG bytes and returns the file name they will have, or None if dropped."""
+        name = content_name(jpeg_bytes)
+        if not self._enqueue(("jpeg", (name, jpeg_bytes))):
+            return None
+        return name
+
+    def thumbnail_path(self, name):
+        return os.path.join(self.thumb_root, name)
+
+    @property
+    def pending(self):
+        """Snapshots waiting for the writer thread."""
+        return self._queue.qsize()
+
+    def flush(self, timeout=None):
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def _enqueue(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+            print("[WARN] Snapshot writer is behind, dropping snapshot")
+            return False
+        return True
+
+    def _run(self):
+        self._enforce_retention()
+        next_cleanup = time.monotonic() + CLEANUP_INTERVAL
+        while True:
+            try:
+                kind, payload = self._queue.get(timeout=max(0.0, next_cleanup - time.monotonic()))
+            except queue.Empty:
+                kind = None
+            try:
+                if kind == "frame":
+                    ok, jpeg = cv2.imencode(".jpg", payload, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                    if ok:
+                        jpeg = jpeg.tobytes()
+                        self._store(content_name(jpeg), jpeg)
+                elif kind == "jpeg":
+                    self._store(*payload)
+                elif kind == "flush":
+                    payload.set()
+            except Exception as e:
+                print(f"[ERROR] Failed to store snapshot: {e}")
+
+            if time.monotonic() >= next_cleanup:
+                self._enforce_retention()
+                next_cleanup = time.monotonic() + CLEANUP_INTERVAL
+
+    def _store(self, name, jpeg_bytes):
+        path = os.path.join(self.root, name)
+        if os.path.exists(path):
+            # Same image again: keep the existing file, just refresh its age
+            os.utime(path)
+            self.files[path] = (os.path.getsize(path), time.time())
+            return
+
+        self._write(path, jpeg_bytes)
+        if self.thumbnails:
+            # Reduced decode is much cheaper than decoding the full frame
+            img = cv2.imdecode(np.frombuffer(jpeg_bytes, np.uint8), cv2.IMREAD_REDUCED_COLOR_2)
+            if img is not None and img.shape[1] > self.thumb_width:
+                h = int(img.shape[0] * self.thumb_width / img.shape[1])
+                img = cv2.resize(img, (self.thumb_width, h), interpolation=cv2.INTER_AREA)
+            if img is not None:
+                ok, thumb = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 75])
+                if ok:
+                    self._write(self.thumbnail_path(name), thumb.tobytes())
+
+    def _write(self, path, data):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self._forget(path)
+        self.files[path] = (len(data), time.time())
+        self.total_bytes += len(data)
+
+    def _forget(self, path):
+        entry = self.files.pop(path, None)
+        if entry is not None:
+            self.total_bytes -= entry[0]
+
+    def _scan(self):
+        """Index what is on disk, including files from before a restart or from other processes."""
+        self.files = {}
+        self.total_bytes = 0
+        for directory in (self.root, self.thumb_root):
+            for entry in os.scandir(directory):
+                if entry.is_file() and entry.name.lower().endswith(".jpg"):
+                    stat = entry.stat()
+                    self.files[entry.path] = (stat.st_size, stat.st_mtime)
+                    self.total_bytes += stat.st_size
+
+    def _enforce_retention(self):
+        self._scan()
+        cutoff = time.time() - self.max_age
+        by_age = sorted((item for item in self.files.items() if STORE_NAME.match(os.path.basename(item[0]))),
+                        key=lambda item: item[1][1])
+        for path, (_, mtime) in by_age:
+            if mtime >= cutoff and self.total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"[WARN] Could not delete old snapshot {path}: {e}")
+                continue
+            self._forget(path)
+            self.deleted += 1
@@ -0,0 +1,182 @@
+# supervisor.py
+import multiprocessing as mp
+import os
+import sys
+import time
+
+from video_source import is_live_source
+
+# ------------------- CONFIG -------------------
+RESTART_BACKOFF = 2.0      # seconds before the first restart of a dead worker
+MAX_RESTART_BACKOFF = 60.0  # cap for the exponential restart backoff
+POLL_INTERVAL = 1.0        # how often the supervisor checks its workers
+# One core per worker: keep OpenMP / MKL / OpenBLAS (numpy, torch, OpenCV) from spawning
+# a thread per core in every process, otherwise the workers fight each other.
+# They read these when first loaded, so the worker has to inherit them at start.
+WORKER_ENV = {"OMP_NUM_THREADS": "1", "MKL_NUM_THREADS": "1", "OPENBLAS_NUM_THREADS": "1"}
+
+
+def load_camera_list(path):
+    """
+    Read a camera list file.
+    One camera per line, either `source` or `camera_id,source`.
+    Blank lines and lines starting with '#' are ignored.
+    Returns a list of (camera_id, source) tuples.
+    """
+    cameras = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if "," in line:
+                camera_id, source = (part.strip() for part in line.split(",", 1))
+            else:
+                camera_id, source = str(len(cameras)), line
+            cameras.append((camera_id, source))
+    return cameras
+
+
+def _worker_main(cameras, cpu, max_batch_size, max_latency, engine_options, metrics_port=None):
+    """Entry point of one worker process; cameras is a list of (camera_id, source)."""
+    if cpu is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {cpu})
+
+    # Libraries with a thread setting of their own; the rest read WORKER_ENV when loaded
+    import cv2
+    cv2.setNumThreads(1)
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+
+    import tracing
+    tracing.install_signal_handler()
+    if metrics_port:
+        from metrics import start_http_server
+        start_http_server(metrics_port, routes=tracing.HTTP_ROUTES)
+
+    from run_engine import run_camera, run_cameras_batched
+    if len(cameras) == 1:
+        camera_id, source = cameras[0]
+        ok = run_camera(source, camera_id=camera_id, display=False, **engine_options)
+    else:
+        ok = run_cameras_batched(cameras, max_batch_size=max_batch_size, max_latency=max_latency,
+                                 **engine_options)
+    sys.exit(0 if ok else 1)
+
+
+class CameraSupervisor:
+    def __init__(self, cameras, cpus=None, cameras_per_worker=1, max_batch_size=8, max_latency=0.030,
+                 engine_options=None, metrics_port=None):
+        """
+        cameras: list of (camera_id, source) tuples
+        cpus: cores to pin workers to (default: all cores this process may use)
+        cameras_per_worker: cameras sharing one process and one batched model call
+        max_batch_size / max_latency: BatchScheduler settings for multi-camera workers
+        engine_options: extra run_camera keyword arguments (e.g. tracker)
+        metrics_port: worker i serves Prometheus /metrics on metrics_port + i (None = off)
+        """
+        self.groups = [cameras[i:i + cameras_per_worker]
+                       for i in range(0, len(cameras), cameras_per_worker)]
+        if cpus is None:
+            if hasattr(os, "sched_getaffinity"):
+                cpus = sorted(os.sched_getaffinity(0))
+            else:
+                cpus = [None]
+        self.cpus = cpus
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.engine_options = engine_options or {}
+        self.metrics_port = metrics_port
+        self.ctx = mp.get_context("spawn")
+        self.workers = {}        # worker index -> Process
+        self.restarts = {}       # worker index -> restart count
+        self.next_start = {}     # worker index -> earliest restart time
+        self.started_at = {}     # worker index -> last start time
+
+    def _cpu_for(self, index):
+        return self.cpus[index % len(self.cpus)]
+
+    def _metrics_port_for(self, index):
+        return None if self.metrics_port is None else self.metrics_port + index
+
+    def _label(self, index):
+        return ",".join(camera_id for camera_id, _ in self.groups[index])
+
+    def _start_worker(self, index):
+        proc = self.ctx.Process(
+            target=_worker_main,
+            args=(self.groups[index], self._cpu_for(index), self.max_batch_size, self.max_latency,
+                  self.engine_options, self._metrics_port_for(index)),
+            name=f"camera-{self._label(index)}",
+            daemon=True,
+        )
+        # Set in this process only around start(): a spawned child copies the environment
+        # then, before unpickling _worker_main imports numpy and cv2
+        saved = {var: os.environ.get(var) for var in WORKER_ENV}
+        os.environ.update(WORKER_ENV)
+        try:
+            proc.start()
+        finally:
+            for var, value in saved.items():
+                if value is None:
+                    os.environ.pop(var, None)
+                else:
+                    os.environ[var] = value
+        self.workers[index] = proc
+        self.started_at[index] = time.monotonic()
+        print(f"[INFO] Started worker for camera {self._label(index)} "
+              f"(pid {proc.pid}, cpu {self._cpu_for(index)})")
+
+    def start(self):
+        for index in range(len(self.groups)):
+            self._start_worker(index)
+
+    def poll(self):
+        """Restart dead workers with exponential backoff."""
+        now = time.monotonic()
+        for index, group in enumerate(self.groups):
+            proc = self.workers.get(index)
+            if proc is None or proc.is_alive():
+                continue
+
+            if proc.exitcode == 0 and not any(is_live_source(source) for _, source in group):
+                print(f"[INFO] Camera {self._label(index)} finished")
+                self.workers.pop(index)
+                continue
+
+            if index not in self.next_start:
+                # A worker that ran for a while before dying starts over at the short backoff
+                if now - self.started_at[index] > MAX_RESTART_BACKOFF:
+                    self.restarts[index] = 0
+                count = self.restarts.get(index, 0)
+                delay = min(RESTART_BACKOFF * (2 ** count), MAX_RESTART_BACKOFF)
+                self.next_start[index] = now + delay
+                print(f"[WARN] Worker for camera {self._label(index)} died (exit {proc.exitcode}), "
+                      f"restarting in {delay:.0f}s")
+            elif now >= self.next_start[index]:
+                del self.next_start[index]
+                self.restarts[index] = self.restarts.get(index, 0) + 1
+                self._start_worker(index)
+
+    def stop(self):
+        for proc in self.workers.values():
+            if proc.is_alive():
+                proc.terminate()
+        for proc in self.workers.values():
+            proc.join(timeout=5)
+        self.workers.clear()
+
+    def run(self):
+        self.start()
+        try:
+            while self.workers:
+                time.sleep(POLL_INTERVAL)
+                self.poll()
+        except KeyboardInterrupt:
+            print("[INFO] Stopping camera workers...")
+        finally:
+            self.stop()
+
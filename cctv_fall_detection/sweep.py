@@ -0,0 +1,175 @@
+# sweep.py
+import argparse
+import csv
+import glob
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from calculate_accuracy import DEFAULT_CAMERA, TOLERANCE, Evaluation, load_table
+from detections import NO_TRACK
+from fall_heuristic import BatchFallHeuristic
+from keypoint_cache import CACHE_DIR, KeypointCache
+
+# ------------------- CONFIG -------------------
+GT_FILE = "ground_truth.csv"
+OUTPUT = "sweep_results.csv"
+# Default grids; --grid name=v1,v2,... replaces one axis
+DETECTOR_GRID = {   # run_engine.BatchFallDetector, the rules the engine alerts on
+    "angle_threshold": [20, 30, 40, 50],
+    "aspect_ratio_threshold": [1.0, 1.25, 1.5, 2.0],
+    "drop_threshold": [30, 50, 80],
+    "min_frames": [1, 2, 3, 5],
+}
+HEURISTIC_GRID = {  # fall_heuristic.BatchFallHeuristic
+    "angle_threshold": [30, 40, 50],
+    "aspect_ratio_threshold": [1.25, 1.5, 2.0],
+    "drop_ratio": [0.3, 0.5, 0.8],
+    "min_frames_for_fall": [2, 3],
+}
+SORT_KEYS = ("fall_f1", "f1", "event_recall", "false_alarms_per_camera_hour")
+
+
+def parse_grid(rule, overrides):
+    grid = dict(DETECTOR_GRID if rule == "detector" else HEURISTIC_GRID)
+    for item in overrides:
+        name, _, values = item.partition("=")
+        grid[name] = [float(v) if "." in v else int(v) for v in values.split(",")]
+    names = list(grid)
+    return [dict(zip(names, combo)) for combo in itertools.product(*(grid[n] for n in names))]
+
+
+def replay(cache, rule, params):
+    """Per-frame number of people in fall state under one threshold setting."""
+    if rule == "detector":
+        from run_engine import BatchFallDetector
+        detector = BatchFallDetector(**params)
+        check = lambda ids, boxes, kpts: detector.check_falls(ids, boxes, kpts, return_alarm=True)[1]
+    else:
+        heuristic = BatchFallHeuristic(**params)
+        check = heuristic.is_fall_batch
+
+    fallen = np.zeros(len(cache), np.int64)
+    for i in range(len(cache)):
+        track_ids, boxes, keypoints = cache.frame(i)
+        tracked = track_ids != NO_TRACK
+        if not tracked.any():
+            continue
+        ids = track_ids[tracked].tolist()
+        fallen[i] = check(ids, boxes[tracked], keypoints[tracked][:, :, :2]).sum()
+    return fallen
+
+
+def align(cache, gt, tolerance=TOLERANCE):
+    """
+    Ground-truth rows of the cache's camera, each with the index of the nearest cached
+    frame within `tolerance` seconds; done once, so scoring a setting is just indexing.
+    Ground truth without a camera_id column applies to every cache.
+    """
+    cameras = set(gt["camera_id"].unique())
+    rows = gt if cameras == {DEFAULT_CAMERA} else gt[gt["camera_id"] == cache.camera_id]
+    local_tz = datetime.now().astimezone().tzinfo
+    frames = pd.DataFrame({
+        "timestamp": pd.to_datetime(np.asarray(cache.ts), unit="s", utc=True)
+                       .tz_convert(local_tz).tz_localize(None).astype("datetime64[ns]"),
+        "frame": np.arange(len(cache)),
+    })
+    merged = pd.merge_asof(rows.drop(columns="camera_id"), frames, on="timestamp", direction="nearest",
+                           tolerance=pd.Timedelta(seconds=tolerance))
+    merged = merged.dropna(subset=["frame"])
+    return merged.assign(camera_id=cache.camera_id, frame=merged["frame"].astype(np.int64))
+
+
+# Worker state, loaded once per process by _init_worker
+_caches = []
+_alignments = []
+
+
+def _init_worker(cache_paths, alignments):
+    global _caches, _alignments
+    _caches = [KeypointCache(path) for path in cache_paths]
+    _alignments = alignments
+
+
+def score(rule, params, tolerance=TOLERANCE):
+    """Replays every cache under one setting and scores it like calculate_accuracy does."""
+    evaluation = Evaluation()
+    for cache, aligned in zip(_caches, _alignments):
+        fallen = replay(cache, rule, params)
+        merged = aligned[["camera_id", "timestamp", "ground_truth"]].assign(prediction=fallen[aligned["frame"]])
+        evaluation.add_chunk(merged)
+    summary = evaluation.finish(tolerance).summary()
+    frame, event = summary["frame"], summary["event"]
+    p, r = frame["fall_precision"], frame["fall_recall"]
+    return dict(params,
+                fall_f1=round(2 * p * r / (p + r), 4) if p + r else 0.0,
+                fall_precision=round(p, 4), fall_recall=round(r, 4), f1=round(frame["f1"], 4),
+                event_recall=round(event["event_recall"], 4), false_alarms=event["false_alarms"],
+                false_alarms_per_camera_hour=round(event["false_alarms_per_camera_hour"], 4),
+                mean_delay_s=event["mean_delay_s"])
+
+
+def sweep(cache_paths, gt_path, rule="detector", settings=None, tolerance=TOLERANCE, workers=None):
+    """Scores every setting (list of parameter dicts) over the caches, one process per setting at a time."""
+    gt = load_table(gt_path, "ground_truth")
+    alignments = [align(KeypointCache(path), gt, tolerance) for path in cache_paths]
+    matched = sum(len(a) for a in alignments)
+    print(f"[INFO] {matched} of {len(gt)} ground-truth rows fall inside the cached footage")
+    if not matched:
+        return []
+    settings = settings or parse_grid(rule, [])
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(cache_paths, alignments)) as pool:
+        futures = [pool.submit(score, rule, params, tolerance) for params in settings]
+        results = []
+        for i, future in enumerate(futures, 1):
+            results.append(future.result())
+            if i % 50 == 0 or i == len(futures):
+                print(f"[INFO] {i}/{len(futures)} settings scored")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep fall thresholds over cached keypoints (keypoint_cache.py)")
+    parser.add_argument("caches", nargs="*", help=f"cache directories (default: every cache in {CACHE_DIR}/)")
+    parser.add_argument("--gt", default=GT_FILE, help="ground-truth CSV (timestamp, ground_truth[, camera_id])")
+    parser.add_argument("--rule", choices=["detector", "heuristic"], default="detector",
+                        help="detector: run_engine.BatchFallDetector, heuristic: fall_heuristic.BatchFallHeuristic")
+    parser.add_argument("--grid", action="append", default=[], metavar="NAME=V1,V2,...",
+                        help="replace one axis of the default grid, e.g. --grid min_frames=2,3")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="seconds")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: one per core)")
+    parser.add_argument("--sort", choices=SORT_KEYS, default="fall_f1")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--output", default=OUTPUT)
+    args = parser.parse_args()
+
+    caches = args.caches or sorted(os.path.dirname(p) for p in glob.glob(os.path.join(CACHE_DIR, "*", "meta.json")))
+    if not caches:
+        print("[ERROR] No keypoint caches; build them with keypoint_cache.py first")
+        return 2
+    settings = parse_grid(args.rule, args.grid)
+    print(f"[INFO] {len(settings)} settings x {len(caches)} caches")
+    results = sweep(caches, args.gt, args.rule, settings, args.tolerance, args.workers)
+    if not results:
+        print("[ERROR] Ground truth and cached footage do not overlap in time")
+        return 1
+
+    results.sort(key=lambda r: r[args.sort], reverse=args.sort != "false_alarms_per_camera_hour")
+    with open(args.output, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0]))
+        writer.writeheader()
+        writer.writerows(results)
+    print(f"[INFO] Results written to {args.output}; best {args.top} by {args.sort}:")
+    for r in results[:args.top]:
+        print("  " + ", ".join(f"{k}={v}" for k, v in r.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calculate_accuracy import aligned_chunks, evaluate  # noqa: E402
+from event_log import EventLog  # noqa: E402
+
+START = pd.Timestamp("2025-09-09 22:00:00")
+
+
+def table(value_col, seconds, cameras, values):
+    df = pd.DataFrame({"camera_id": cameras, "timestamp": START + pd.to_timedelta(seconds, unit="s"),
+                       value_col: values})
+    return df.sort_values("timestamp", kind="stable").reset_index(drop=True)
+
+
+def chunks(df, size):
+    return [df.iloc[i:i + size] for i in range(0, len(df), size)]
+
+
+def test_aligned_chunks_matches_a_full_merge_with_sparse_ground_truth():
+    rng = np.random.default_rng(0)
+    pred = table("prediction", np.sort(rng.uniform(0, 3600, 20000)), rng.choice(["a", "b"], 20000),
+                 rng.integers(0, 2, 20000))
+    gt = table("ground_truth", np.sort(rng.uniform(0, 3600, 40)), rng.choice(["a", "b"], 40), rng.integers(0, 2, 40))
+    expected = pd.merge_asof(gt, pred, on="timestamp", by="camera_id", direction="nearest",
+                             tolerance=pd.Timedelta(seconds=1.0))
+    for gt_size, pred_size in ((7, 500), (40, 20000), (1, 333)):
+        merged = pd.concat(list(aligned_chunks(chunks(gt, gt_size), chunks(pred, pred_size), 1.0)))
+        pd.testing.assert_frame_equal(merged.reset_index(drop=True), expected)
+
+
+def test_event_log_directory_is_evaluated_per_camera(tmp_path):
+    log = EventLog(str(tmp_path / "logs"), compress=False)
+    rows = []
+    for i in range(600):
+        camera_id = f"cam{i % 3}"
+        fallen = int(200 <= i < 260)
+        ts = START.timestamp() + i * 0.1
+        log.log({"type": "frame", "ts": ts, "camera_id": camera_id, "falls": fallen})
+        rows.append((datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S.%f"), fallen, camera_id))
+    log.close()
+    gt_path = str(tmp_path / "gt.csv")
+    pd.DataFrame(rows, columns=["timestamp", "ground_truth", "camera_id"]).to_csv(gt_path, index=False)
+
+    serial = evaluate([(gt_path, str(tmp_path / "logs"))], tolerance=0.01, chunksize=50, workers=1)
+    parallel = evaluate([(gt_path, str(tmp_path / "logs"))], tolerance=0.01, chunksize=50, workers=2)
+    assert sorted(serial.cameras) == ["cam0", "cam1", "cam2"]
+    assert serial.summary() == parallel.summary()
+    summary = serial.summary()
+    assert summary["files"] == 1
+    assert summary["frame"]["accuracy"] == 1.0 and summary["frame"]["unmatched"] == 0
+    assert summary["event"]["fall_events"] == 3 and summary["event"]["detected"] == 3
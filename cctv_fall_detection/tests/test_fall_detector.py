@@ -0,0 +1,56 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("deep_sort_realtime")  # imported by run_engine
+
+from run_engine import BatchFallDetector, FallDetector  # noqa: E402
+
+RUNS = 200
+FRAMES = 60
+
+
+def random_frame(rng, ids):
+    """Boxes, torso keypoints and a per-person dict for FallDetector; some torsos exactly vertical (dx == 0)."""
+    n = len(ids)
+    boxes = np.column_stack([rng.integers(0, 600, n), rng.integers(0, 400, n),
+                             rng.integers(20, 200, n), rng.integers(20, 200, n)]).astype(np.float64)
+    keypoints = np.zeros((n, 17, 2))
+    shoulders = rng.integers(0, 500, (n, 2))
+    hips = shoulders + rng.integers(-60, 61, (n, 2))
+    vertical = rng.random(n) < 0.3
+    hips[vertical, 0] = shoulders[vertical, 0]
+    keypoints[:, [5, 6]] = shoulders[:, None]
+    keypoints[:, [11, 12]] = hips[:, None]
+    named = [{"left_shoulder": kp[5], "right_shoulder": kp[6], "left_hip": kp[11], "right_hip": kp[12]}
+             for kp in keypoints]
+    return boxes, keypoints, named
+
+
+def test_batch_detector_matches_scalar_reference():
+    alerts = 0
+    for run in range(RUNS):
+        rng = np.random.default_rng(run)
+        params = {"min_frames": int(rng.integers(1, 4)), "drop_threshold": int(rng.integers(10, 80))}
+        scalar = FallDetector(**params)
+        batch = BatchFallDetector(capacity=2, **params)  # small, so slots have to grow mid-run
+        next_id = 0
+        pool = []
+        for frame in range(FRAMES):
+            # New people keep arriving; the rest come and go between frames
+            for _ in range(int(rng.integers(0, 3))):
+                pool.append(str(next_id))
+                next_id += 1
+            ids = [pid for pid in pool if rng.random() < 0.7]
+            if not ids:
+                continue
+            boxes, keypoints, named = random_frame(rng, ids)
+            got = batch.check_falls(ids, boxes, keypoints)
+            expected = [scalar.check_fall(pid, tuple(box), kp) for pid, box, kp in zip(ids, boxes, named)]
+            assert got.tolist() == expected, f"run {run} frame {frame}"
+            alerts += sum(expected)
+    assert alerts > 0
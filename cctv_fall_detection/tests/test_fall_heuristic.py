@@ -0,0 +1,55 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detections import Detections  # noqa: E402
+from fall_heuristic import BatchFallHeuristic, FallHeuristic  # noqa: E402
+from keypoint_cache import KeypointCache, KeypointCacheWriter  # noqa: E402
+from sweep import parse_grid, replay  # noqa: E402
+
+LYING = range(10, 12)  # two consecutive frames that meet the fall conditions
+
+
+def person(lying):
+    """(box, keypoints): standing upright, or lying flat in a wide box (pose + aspect = 2 conditions)."""
+    keypoints = np.zeros((17, 3), np.float32)
+    if lying:
+        keypoints[[5, 6], :2] = [100, 300]
+        keypoints[[11, 12], :2] = [200, 302]
+        return [100, 280, 150, 60], keypoints
+    keypoints[[5, 6], :2] = [100, 100]
+    keypoints[[11, 12], :2] = [100, 200]
+    return [80, 80, 50, 150], keypoints
+
+
+def write_cache(path, frames=20):
+    writer = KeypointCacheWriter(path, "cam1")
+    for i in range(frames):
+        box, keypoints = person(i in LYING)
+        writer.add(1.7e9 + i * 0.1, Detections(np.array([box], np.float32), keypoints=keypoints[None],
+                                               track_ids=np.array([7])))
+    writer.close()
+    return KeypointCache(path)
+
+
+def test_min_frames_for_fall_changes_sweep_detections(tmp_path):
+    cache = write_cache(str(tmp_path / "cam1"))
+    settings = parse_grid("heuristic", ["angle_threshold=40", "aspect_ratio_threshold=1.5", "drop_ratio=0.5",
+                                        "min_frames_for_fall=1,2,3"])
+    fallen = {params["min_frames_for_fall"]: int(replay(cache, "heuristic", params).sum()) for params in settings}
+    assert fallen == {1: 2, 2: 1, 3: 0}
+
+
+def test_single_and_batch_heuristics_agree_on_min_frames():
+    for min_frames in (1, 2, 3):
+        single = FallHeuristic(min_frames_for_fall=min_frames)
+        batch = BatchFallHeuristic(min_frames_for_fall=min_frames)
+        for i in range(20):
+            box, keypoints = person(i in LYING)
+            named = {"left_shoulder": keypoints[5], "right_shoulder": keypoints[6],
+                     "left_hip": keypoints[11], "right_hip": keypoints[12]}
+            expected = single.is_fall(7, box, named)
+            assert batch.is_fall_batch([7], np.array([box]), keypoints[None, :, :2])[0] == expected
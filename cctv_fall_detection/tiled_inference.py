@@ -0,0 +1,226 @@
+# tiled_inference.py
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from inference_backend import BACKENDS, PoseResult, load_model, result_arrays
+
+# ------------------- CONFIG -------------------
+TILE_SIZE = 960          # pixels; the model still resizes each tile to its own input size
+TILE_OVERLAP = 0.2       # fraction of a tile shared with its neighbour
+THUMB_SIZE = 32          # per-tile grey thumbnail used for change detection
+PIXEL_THRESHOLD = 12     # grey-level difference that counts as a changed thumbnail pixel
+SEAM_MARGIN = 4          # pixels; boxes this close to an inner tile edge are probably cut off
+
+
+def tile_grid(h, w, tile_size=TILE_SIZE, overlap=TILE_OVERLAP):
+    """(x0, y0, x1, y1) tiles covering an h x w frame; the last row/column is aligned to the edge."""
+    step = max(1, int(tile_size * (1 - overlap)))
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        return list(range(0, length - tile_size, step)) + [length - tile_size]
+
+    return [(x, y, min(x + tile_size, w), min(y + tile_size, h)) for y in starts(h) for x in starts(w)]
+
+
+def merge_detections(boxes, scores, rank, match_threshold=0.6):
+    """
+    Greedy NMS across tiles. Overlap is intersection over the *smaller* box,
+    so a person cut in half by a seam is matched to the whole-body box from
+    the neighbouring tile. Returns the indices to keep.
+    """
+    areas = np.maximum(boxes[:, 2] - boxes[:, 0], 0) * np.maximum(boxes[:, 3] - boxes[:, 1], 0)
+    suppressed = np.zeros(len(boxes), dtype=bool)
+    keep = []
+    for i in np.argsort(-rank, kind="stable"):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        iw = np.minimum(boxes[i, 2], boxes[:, 2]) - np.maximum(boxes[i, 0], boxes[:, 0])
+        ih = np.minimum(boxes[i, 3], boxes[:, 3]) - np.maximum(boxes[i, 1], boxes[:, 1])
+        inter = np.maximum(iw, 0) * np.maximum(ih, 0)
+        suppressed |= inter / np.maximum(np.minimum(areas[i], areas), 1e-6) > match_threshold
+    return np.asarray(keep, dtype=np.int64)
+
+
+class TiledDetector:
+    def __init__(self, infer_batch, tile_size=TILE_SIZE, overlap=TILE_OVERLAP, full_frame=True,
+                 change_threshold=0.01, max_cache_age=1.0, match_threshold=0.6):
+        """
+        Pose inference on overlapping tiles of a high-resolution frame.
+        infer_batch: callable taking a list of images and returning one result per image;
+                     every stale tile of a frame goes into a single call
+        full_frame: also infer the whole frame, for people larger than a tile
+        change_threshold: fraction of changed thumbnail pixels that makes a tile stale
+        max_cache_age: seconds a tile's cached detections may be reused (0 = never reuse)
+        """
+        self.infer_batch = infer_batch
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.full_frame = full_frame
+        self.change_threshold = change_threshold
+        self.max_cache_age = max_cache_age
+        self.match_threshold = match_threshold
+
+        self.shape = None
+        self.regions = []
+        self.cache = {}  # region -> (thumb, inferred_at, boxes, scores, keypoints, rank)
+
+        # Stats
+        self.inferred_tiles = 0
+        self.reused_tiles = 0
+
+    def __call__(self, frame, now=None):
+        now = time.monotonic() if now is None else now
+        h, w = frame.shape[:2]
+        if frame.shape != self.shape:
+            self.shape = frame.shape
+            self.regions = tile_grid(h, w, self.tile_size, self.overlap)
+            if self.full_frame and len(self.regions) > 1:
+                self.regions.append((0, 0, w, h))
+            self.cache.clear()
+
+        stale, thumbs = [], {}
+        for region in self.regions:
+            x0, y0, x1, y1 = region
+            thumb = self._thumb(frame[y0:y1, x0:x1])
+            entry = self.cache.get(region)
+            if (entry is None or now - entry[1] >= self.max_cache_age
+                    or self._changed(entry[0], thumb)):
+                stale.append(region)
+                thumbs[region] = thumb
+
+        # The whole-frame pass sees every tile, so it is stale whenever any of them is
+        whole = (0, 0, w, h)
+        if stale and whole in self.cache and whole not in thumbs:
+            stale.append(whole)
+            thumbs[whole] = self._thumb(frame)
+
+        if stale:
+            results = self.infer_batch([frame[y0:y1, x0:x1] for x0, y0, x1, y1 in stale])
+            for region, result in zip(stale, results):
+                self.cache[region] = (thumbs[region], now) + self._to_frame(region, w, h, result)
+        self.inferred_tiles += len(stale)
+        self.reused_tiles += len(self.regions) - len(stale)
+        return self._merge(frame)
+
+    def _thumb(self, tile):
+        small = cv2.resize(tile, (THUMB_SIZE, THUMB_SIZE), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def _changed(self, old, new):
+        # Compared with the thumbnail at the tile's last inference, so slow drift adds up
+        changed = np.count_nonzero(cv2.absdiff(old, new) > PIXEL_THRESHOLD)
+        return changed > self.change_threshold * new.size
+
+    def _to_frame(self, region, w, h, result):
+        """Shift one tile's detections into frame coordinates and rank seam-cut boxes lower."""
+        x0, y0, x1, y1 = region
+        boxes, scores, _, keypoints = result_arrays(result)
+        boxes, keypoints = boxes.copy(), keypoints.copy()
+        boxes[:, [0, 2]] += x0
+        boxes[:, [1, 3]] += y0
+        visible = (keypoints[..., :2] != 0).any(axis=-1)  # missing keypoints stay at (0, 0)
+        keypoints[..., 0] += np.where(visible, x0, 0)
+        keypoints[..., 1] += np.where(visible, y0, 0)
+
+        cut = np.zeros(len(boxes), dtype=bool)
+        if x0 > 0:
+            cut |= boxes[:, 0] <= x0 + SEAM_MARGIN
+        if y0 > 0:
+            cut |= boxes[:, 1] <= y0 + SEAM_MARGIN
+        if x1 < w:
+            cut |= boxes[:, 2] >= x1 - SEAM_MARGIN
+        if y1 < h:
+            cut |= boxes[:, 3] >= y1 - SEAM_MARGIN
+        return boxes, scores, keypoints, np.where(cut, scores * 0.5, scores)
+
+    def _merge(self, frame):
+        entries = [self.cache[region] for region in self.regions]
+        boxes = np.concatenate([e[2] for e in entries])
+        scores = np.concatenate([e[3] for e in entries])
+        keypoints = np.concatenate([e[4] for e in entries])
+        keep = merge_detections(boxes, scores, np.concatenate([e[5] for e in entries]),
+                                self.match_threshold)
+        return PoseResult(frame, boxes[keep], scores[keep], keypoints[keep])
+
+
+# ------------------- BENCHMARK -------------------
+def benchmark_frames(source, count, width, height):
+    """Frames from a video file, or synthetic frames (static scene, a few moving blobs) if source is None."""
+    if source is not None:
+        cap = cv2.VideoCapture(source)
+        frames = []
+        while len(frames) < count:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            frames.append(frame)
+        cap.release()
+        return frames
+
+    rng = np.random.default_rng(0)
+    background = cv2.GaussianBlur(rng.integers(0, 255, (height, width, 3), dtype=np.uint8), (15, 15), 0)
+    frames = []
+    for i in range(count):
+        frame = background.copy()
+        for k in range(3):
+            x = (200 + k * 900 + i * 8) % (width - 60)
+            cv2.rectangle(frame, (x, 400 + k * 500), (x + 60, 560 + k * 500), (40, 40, 200), -1)
+        frames.append(frame)
+    return frames
+
+
+def benchmark(frames, name, infer):
+    latencies, detections = [], 0
+    started = time.perf_counter()
+    for frame in frames:
+        t0 = time.perf_counter()
+        detections += len(infer(frame))
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    lat = np.array(latencies) * 1000
+    print(f"{name:<18} {len(frames) / elapsed:7.2f} fps   latency p50 {np.percentile(lat, 50):7.1f} ms"
+          f"   p95 {np.percentile(lat, 95):7.1f} ms   detections/frame {detections / len(frames):5.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Whole-frame vs tiled pose inference benchmark")
+    parser.add_argument("--source", help="video file (default: synthetic 4K frames)")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--width", type=int, default=3840)
+    parser.add_argument("--height", type=int, default=2160)
+    parser.add_argument("--model", default="yolov8n-pose.pt")
+    parser.add_argument("--backend", choices=BACKENDS, default="ultralytics")
+    parser.add_argument("--tile-size", type=int, default=TILE_SIZE)
+    parser.add_argument("--overlap", type=float, default=TILE_OVERLAP)
+    args = parser.parse_args()
+
+    model = load_model(args.model, args.backend)
+    frames = benchmark_frames(args.source, args.frames, args.width, args.height)
+    if not frames:
+        print("[ERROR] No frames to benchmark")
+        return
+    h, w = frames[0].shape[:2]
+    print(f"[INFO] {len(frames)} frames of {w}x{h}, "
+          f"{len(tile_grid(h, w, args.tile_size, args.overlap))} tiles of {args.tile_size} px")
+
+    def infer_batch(images):
+        return model(images, verbose=False)
+
+    model(frames[0], verbose=False)  # warm-up
+    benchmark(frames, "whole frame", lambda f: model(f, verbose=False)[0])
+    tiled = TiledDetector(infer_batch, args.tile_size, args.overlap, max_cache_age=0)
+    benchmark(frames, "tiled", tiled)
+    cached = TiledDetector(infer_batch, args.tile_size, args.overlap)
+    benchmark(frames, "tiled + tile cache", cached)
+    total = cached.inferred_tiles + cached.reused_tiles
+    print(f"[INFO] tile cache reused {cached.reused_tiles}/{total} tiles")
+
+
+if __name__ == "__main__":
+    main()
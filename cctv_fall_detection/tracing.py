@@ -0,0 +1,174 @@
+# tracing.py
+import json
+import os
+import signal
+import threading
+import time
+from collections import deque
+
+# ------------------- CONFIG -------------------
+TRACE_DIR = "traces"
+MAX_EVENTS_PER_THREAD = 200_000  # oldest spans are overwritten past this, so a forgotten trace can't eat memory
+TOGGLE_SIGNAL = getattr(signal, "SIGUSR1", None)  # not available on Windows: use the HTTP endpoint there
+
+_enabled = False
+_local = threading.local()
+_buffers = []  # (thread ident, thread name, deque of (name, start_ns, end_ns, args))
+_buffers_lock = threading.Lock()  # only taken when a thread records its first span, and by dump()
+_started_at = None
+
+
+class _NullSpan:
+    """What span() returns while tracing is off: entering and leaving it does nothing."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        _buffer().append((self.name, self.start, time.perf_counter_ns(), self.args))
+        return False
+
+
+def _buffer():
+    """This thread's event buffer; threads only ever append to their own, so recording takes no lock."""
+    buf = getattr(_local, "events", None)
+    if buf is None:
+        buf = _local.events = deque(maxlen=MAX_EVENTS_PER_THREAD)
+        thread = threading.current_thread()
+        with _buffers_lock:
+            _buffers.append((thread.ident, thread.name, buf))
+    return buf
+
+
+def enabled():
+    return _enabled
+
+
+def span(name, **args):
+    """
+    Context manager timing a block as one trace event, e.g.
+        with tracing.span("infer", camera=camera_id, frame=frame_id): ...
+    Costs one call and a global check while tracing is off.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+def record(name, start, end, **args):
+    """Adds an already-timed block; start / end are time.perf_counter() seconds."""
+    if _enabled:
+        _buffer().append((name, int(start * 1e9), int(end * 1e9), args))
+
+
+def start():
+    global _enabled, _started_at
+    if not _enabled:
+        _started_at = time.strftime("%Y%m%d_%H%M%S")
+        _enabled = True
+        print(f"[INFO] Tracing started (pid {os.getpid()})")
+
+
+def stop(path=None, write=True):
+    """
+    Stops tracing and writes what was recorded; returns the file path (None if it was off).
+    write=False leaves the spans for chrome_trace() instead.
+    """
+    global _enabled
+    if not _enabled:
+        return None
+    _enabled = False
+    print(f"[INFO] Tracing stopped (pid {os.getpid()})")
+    return dump(path) if write else None
+
+
+def toggle(path=None):
+    if _enabled:
+        return stop(path)
+    start()
+    return None
+
+
+def chrome_trace():
+    """Recorded spans as a Chrome / Perfetto trace dict; the buffers are emptied."""
+    pid = os.getpid()
+    events = []
+    with _buffers_lock:
+        buffers = list(_buffers)
+        # Drop buffers of threads that have exited once their events are collected
+        alive = {t.ident for t in threading.enumerate()}
+        _buffers[:] = [b for b in _buffers if b[0] in alive]
+    for tid, thread_name, buf in buffers:
+        events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_name}})
+        while buf:
+            name, start_ns, end_ns, args = buf.popleft()
+            events.append({"name": name, "ph": "X", "pid": pid, "tid": tid,
+                           "ts": start_ns / 1000.0, "dur": (end_ns - start_ns) / 1000.0, "args": args})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def dump(path=None):
+    """Writes a trace JSON that chrome://tracing and ui.perfetto.dev open directly."""
+    if path is None:
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        path = os.path.join(TRACE_DIR, f"trace_{_started_at or time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.json")
+    trace = chrome_trace()
+    with open(path, "w") as f:
+        json.dump(trace, f, default=str)
+    print(f"[INFO] Wrote {len(trace['traceEvents'])} trace events to {path}")
+    return path
+
+
+def install_signal_handler(sig=TOGGLE_SIGNAL):
+    """
+    `kill -USR1 <pid>` starts tracing, a second one stops it and writes the file.
+    Must be called from the main thread; does nothing where the signal doesn't exist.
+    """
+    if sig is None:
+        return False
+    # Writing the file off the signal handler keeps the interrupted frame short
+    signal.signal(sig, lambda signum, frame: threading.Thread(target=toggle, name="trace-toggle").start())
+    return True
+
+
+def _http_start():
+    start()
+    return 200, "application/json", json.dumps({"tracing": True}).encode()
+
+
+def _http_stop():
+    path = stop()
+    return 200, "application/json", json.dumps({"tracing": False, "file": path}).encode()
+
+
+def _http_dump():
+    """Stops tracing and returns the trace itself instead of writing a file."""
+    stop(write=False)
+    return 200, "application/json", json.dumps(chrome_trace(), default=str).encode()
+
+
+# Served (POST only) next to /metrics by metrics.start_http_server on the engine workers
+HTTP_ROUTES = {
+    "/trace/start": _http_start,
+    "/trace/stop": _http_stop,
+    "/trace": _http_dump,
+}
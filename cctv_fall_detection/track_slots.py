@@ -0,0 +1,79 @@
+# track_slots.py
+import numpy as np
+from track_store import TrackStateStore
+
+
+class TrackSlots:
+    def __init__(self, capacity=256, max_tracks=None, ttl=None):
+        """
+        Maps track / person IDs to row indices ("slots") in preallocated
+        NumPy state arrays. Capacity doubles when it runs out; owners check
+        `capacity` and grow their arrays to match.
+        max_tracks / ttl bound the IDs held (LRU and time-to-live eviction),
+        which in turn bounds capacity.
+        """
+        self.capacity = capacity
+        self.store = TrackStateStore(max_entries=max_tracks, ttl=ttl, on_evict=self._on_evict)
+        self.free = list(range(capacity - 1, -1, -1))
+
+    def __len__(self):
+        return len(self.store)
+
+    def __contains__(self, track_id):
+        return track_id in self.store
+
+    @property
+    def evictions(self):
+        return self.store.evictions
+
+    def lookup(self, track_ids):
+        """
+        Returns (slots, is_new): slot index per ID, allocating slots for unseen IDs.
+        IDs must be unique within one call.
+        """
+        slots = np.empty(len(track_ids), dtype=np.intp)
+        is_new = np.zeros(len(track_ids), dtype=bool)
+
+        # Refresh the IDs seen this frame first, so eviction only hits the others
+        for i, track_id in enumerate(track_ids):
+            slot = self.store.get(track_id)
+            if slot is None:
+                is_new[i] = True
+            else:
+                slots[i] = slot
+        self.store.prune(reserve=int(is_new.sum()), keep=set(track_ids))
+
+        for i in np.flatnonzero(is_new):
+            if not self.free:
+                self._grow()
+            slot = self.free.pop()
+            self.store.put(track_ids[i], slot)
+            slots[i] = slot
+        return slots, is_new
+
+    def release(self, track_ids):
+        """Frees the slots of IDs that are gone; returns the freed slot indices."""
+        freed = []
+        for track_id in track_ids:
+            slot = self.store.pop(track_id)
+            if slot is not None:
+                self.free.append(slot)
+                freed.append(slot)
+        return freed
+
+    def _on_evict(self, track_id, slot):
+        self.free.append(slot)
+
+    def _grow(self):
+        old = self.capacity
+        self.capacity *= 2
+        self.free.extend(range(self.capacity - 1, old - 1, -1))
+
+
+def grow_rows(array, capacity):
+    """Returns `array` padded with zero rows up to `capacity` rows."""
+    if len(array) >= capacity:
+        return array
+    grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
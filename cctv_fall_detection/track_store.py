@@ -0,0 +1,85 @@
+# track_store.py
+import time
+from collections import OrderedDict
+
+
+class TrackStateStore:
+    def __init__(self, max_entries=10000, ttl=None, on_evict=None, clock=time.monotonic):
+        """
+        Bounded per-track state, kept in least-recently-used order.
+        max_entries: LRU cap on the number of tracks held (None = unbounded)
+        ttl: seconds since a track was last touched before it is evicted (None = never)
+        on_evict: callback(track_id, value) for every evicted entry
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.clock = clock
+        self.entries = OrderedDict()  # track_id -> (value, last_seen)
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, track_id):
+        return track_id in self.entries
+
+    def get(self, track_id, default=None):
+        """Returns the track's state and marks it as recently used."""
+        entry = self.entries.get(track_id)
+        if entry is None:
+            return default
+        self.entries[track_id] = (entry[0], self.clock())
+        self.entries.move_to_end(track_id)
+        return entry[0]
+
+    def put(self, track_id, value):
+        self.entries[track_id] = (value, self.clock())
+        self.entries.move_to_end(track_id)
+
+    def setdefault(self, track_id, factory):
+        """Returns the track's state, creating it with factory() if missing."""
+        value = self.get(track_id, self)
+        if value is self:
+            self.prune(reserve=1)
+            value = factory()
+            self.put(track_id, value)
+        return value
+
+    def pop(self, track_id, default=None):
+        entry = self.entries.pop(track_id, None)
+        return default if entry is None else entry[0]
+
+    def prune(self, reserve=0, keep=()):
+        """
+        Evict expired tracks, then least-recently-used ones until `reserve`
+        new tracks fit under max_entries. Tracks in `keep` are never evicted.
+        Returns the number of evicted tracks.
+        """
+        evicted = 0
+        if self.ttl is not None:
+            cutoff = self.clock() - self.ttl
+            while self.entries:
+                track_id, (_, last_seen) = next(iter(self.entries.items()))
+                if last_seen > cutoff or track_id in keep:
+                    break
+                self._evict(track_id)
+                evicted += 1
+
+        if self.max_entries is not None:
+            while self.entries and len(self.entries) + reserve > self.max_entries:
+                track_id = next(iter(self.entries))
+                if track_id in keep:
+                    break
+                self._evict(track_id)
+                evicted += 1
+        return evicted
+
+    def stats(self):
+        return {"size": len(self.entries), "evictions": self.evictions}
+
+    def _evict(self, track_id):
+        value, _ = self.entries.pop(track_id)
+        self.evictions += 1
+        if self.on_evict is not None:
+            self.on_evict(track_id, value)
@@ -1,6 +1,17 @@
 # app/tracker.py
 import numpy as np
 
+from detections import NO_TRACK
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+# Above this many detection/track pairs the optimal matcher only scores pairs
+# that share a spatial grid cell instead of building the full IoU matrix.
+GRID_MIN_PAIRS = 250000
+
 def iou(boxA, boxB):
     """Compute Intersection over Union between two boxes."""
     xA = max(boxA[0], boxB[0])
@@ -17,11 +28,153 @@ def iou(boxA, boxB):
 
     return interArea / float(boxAArea + boxBArea - interArea + 1e-5)
 
+def iou_matrix(boxes_a, boxes_b):
+    """
+    Vectorized IoU between every pair of (x, y, w, h) boxes.
+    boxes_a: (N, 4), boxes_b: (M, 4) -> (N, M) matrix
+    """
+    a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)
+
+    xA = np.maximum(a[:, None, 0], b[None, :, 0])
+    yA = np.maximum(a[:, None, 1], b[None, :, 1])
+    xB = np.minimum((a[:, 0] + a[:, 2])[:, None], (b[:, 0] + b[:, 2])[None, :])
+    yB = np.minimum((a[:, 1] + a[:, 3])[:, None], (b[:, 1] + b[:, 3])[None, :])
+
+    interArea = np.maximum(0, xB - xA) * np.maximum(0, yB - yA)
+    boxAArea = (a[:, 2] * a[:, 3])[:, None]
+    boxBArea = (b[:, 2] * b[:, 3])[None, :]
+
+    return interArea / (boxAArea + boxBArea - interArea + 1e-5)
+
+
+def _hungarian(cost):
+    """Minimum-cost assignment for a cost matrix with rows <= cols (shortest augmenting path)."""
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.intp)    # p[j]: row (1-based) assigned to column j
+    way = np.zeros(m + 1, dtype=np.intp)
+
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used[1:]
+            cur = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (cur < minv[1:])
+            minv[1:][better] = cur[better]
+            way[1:][better] = j0
+
+            candidates = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[1:][free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    cols = np.flatnonzero(p[1:])
+    rows = p[1:][cols] - 1
+    order = np.argsort(rows)
+    return rows[order], cols[order]
+
+
+def linear_assignment(cost):
+    """
+    Globally optimal assignment for a (N, M) cost matrix.
+    Uses scipy when it is installed, otherwise a NumPy Hungarian solver.
+    Returns (rows, cols) index arrays.
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    if cost.size == 0:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    if linear_sum_assignment is not None:
+        return linear_sum_assignment(cost)
+    if cost.shape[0] <= cost.shape[1]:
+        return _hungarian(cost)
+    cols, rows = _hungarian(cost.T)
+    order = np.argsort(rows)
+    return rows[order], cols[order]
+
+
+def candidate_pairs(boxes_a, boxes_b, cell_size):
+    """
+    Spatial grid: (i, j) pairs of boxes that share a grid cell and so might overlap.
+    With cell_size >= the largest box side every box touches at most 2x2 cells.
+    """
+    def cells(box):
+        x, y, w, h = box
+        for cx in range(int(x // cell_size), int((x + w) // cell_size) + 1):
+            for cy in range(int(y // cell_size), int((y + h) // cell_size) + 1):
+                yield cx, cy
+
+    grid = {}
+    for j, box in enumerate(np.asarray(boxes_b, dtype=np.float64).tolist()):
+        for cell in cells(box):
+            grid.setdefault(cell, []).append(j)
+
+    rows, cols = [], []
+    for i, box in enumerate(np.asarray(boxes_a, dtype=np.float64).tolist()):
+        seen = set()
+        for cell in cells(box):
+            seen.update(grid.get(cell, ()))
+        rows.extend([i] * len(seen))
+        cols.extend(seen)
+    return np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)
+
+
+def _components(rows, cols):
+    """Connected components of the bipartite graph given by (row, col) edges."""
+    parent = {}
+
+    def find(node):
+        while parent.setdefault(node, node) != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for r, c in zip(rows.tolist(), cols.tolist()):
+        parent[find(("r", r))] = find(("c", c))
+
+    groups = {}
+    for r, c in zip(rows.tolist(), cols.tolist()):
+        group_rows, group_cols = groups.setdefault(find(("r", r)), ([], []))
+        group_rows.append(r)
+        group_cols.append(c)
+    return groups.values()
+
+
 class Tracker:
-    def __init__(self, iou_threshold=0.3):
+    def __init__(self, iou_threshold=0.3, assignment="greedy", max_missed=0, min_hits=1):
+        """
+        iou_threshold: minimum IoU to continue a track
+        assignment: "greedy" (first come, first served) or "optimal" (global
+                    assignment over the vectorized IoU matrix)
+        max_missed: frames a track survives without a matching detection
+        min_hits: matched frames before a track is reported as confirmed
+        """
+        if assignment not in ("greedy", "optimal"):
+            raise ValueError(f"Unknown assignment: {assignment}")
         self.next_id = 1
         self.objects = {}  # id -> bbox
+        self.missed = {}   # id -> frames since last match
+        self.hits = {}     # id -> matched frames
         self.iou_threshold = iou_threshold
+        self.assignment = assignment
+        self.max_missed = max_missed
+        self.min_hits = min_hits
 
     def update(self, detections):
         """
@@ -29,6 +182,13 @@ class Tracker:
         detections: [{'id': None, 'bbox': (x,y,w,h)}, ...]
         Returns tracked objects with IDs assigned
         """
+        if self.assignment == "optimal":
+            ids = self.update_boxes([det['bbox'] for det in detections])
+            for det, track_id in zip(detections, ids.tolist()):
+                det['id'] = track_id
+                det['confirmed'] = self.hits[track_id] >= self.min_hits
+            return detections
+
         updated = []
 
         assigned_ids = set()
@@ -46,20 +206,106 @@ class Tracker:
 
             if best_iou > self.iou_threshold:
                 det['id'] = best_id
-                self.objects[best_id] = bbox
-                assigned_ids.add(best_id)
             else:
-                det['id'] = self.next_id
-                self.objects[self.next_id] = bbox
-                assigned_ids.add(self.next_id)
-                self.next_id += 1
+                det['id'] = self._new_track()
+            self.objects[det['id']] = bbox
+            self.missed[det['id']] = 0
+            self.hits[det['id']] += 1
+            det['confirmed'] = self.hits[det['id']] >= self.min_hits
+            assigned_ids.add(det['id'])
 
             updated.append(det)
 
-        # Remove lost objects
-        current_ids = [d['id'] for d in updated]
-        lost_ids = set(self.objects.keys()) - set(current_ids)
-        for lid in lost_ids:
-            del self.objects[lid]
-
+        self._age_tracks(assigned_ids)
         return updated
+
+    def update_boxes(self, boxes):
+        """
+        Optimal-assignment update on an (N, 4) array of (x, y, w, h) boxes.
+        Returns an (N,) array of track IDs.
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        track_ids = list(self.objects.keys())
+        track_boxes = np.array([self.objects[t] for t in track_ids], dtype=np.float64).reshape(-1, 4)
+
+        rows, cols = self._match(boxes, track_boxes)
+        ids = np.zeros(len(boxes), dtype=np.int64)
+        matched = np.zeros(len(boxes), dtype=bool)
+        for r, c in zip(rows.tolist(), cols.tolist()):
+            ids[r] = track_ids[c]
+            matched[r] = True
+        for r in np.flatnonzero(~matched):
+            ids[r] = self._new_track()
+
+        for track_id, bbox in zip(ids.tolist(), boxes.tolist()):
+            self.objects[track_id] = tuple(bbox)
+            self.missed[track_id] = 0
+            self.hits[track_id] += 1
+
+        self._age_tracks(set(ids.tolist()))
+        return ids
+
+    def update_detections(self, detections):
+        """
+        Optimal-assignment update on a Detections; fills in its track_ids
+        (NO_TRACK while a track is not confirmed yet) and returns it.
+        """
+        ids = self.update_boxes(detections.boxes)
+        hits = np.fromiter((self.hits[t] for t in ids.tolist()), dtype=np.int64, count=len(ids))
+        detections.track_ids = np.where(hits >= self.min_hits, ids, NO_TRACK)
+        return detections
+
+    def confirmed(self, track_id):
+        return self.hits.get(track_id, 0) >= self.min_hits
+
+    def _match(self, boxes, track_boxes):
+        """Returns (detection, track) index pairs whose IoU beats the threshold."""
+        if len(boxes) == 0 or len(track_boxes) == 0:
+            empty = np.zeros(0, dtype=np.intp)
+            return empty, empty
+
+        if len(boxes) * len(track_boxes) < GRID_MIN_PAIRS:
+            scores = iou_matrix(boxes, track_boxes)
+            rows, cols = linear_assignment(1.0 - scores)
+            keep = scores[rows, cols] > self.iou_threshold
+            return rows[keep], cols[keep]
+
+        # Large crowds: only score pairs that can overlap, then solve each
+        # connected cluster of overlapping boxes on its own
+        cell_size = max(boxes[:, 2:].max(), track_boxes[:, 2:].max(), 1.0)
+        pr, pc = candidate_pairs(boxes, track_boxes, cell_size)
+        a, b = boxes[pr], track_boxes[pc]
+        inter_w = np.maximum(0, np.minimum(a[:, 0] + a[:, 2], b[:, 0] + b[:, 2]) - np.maximum(a[:, 0], b[:, 0]))
+        inter_h = np.maximum(0, np.minimum(a[:, 1] + a[:, 3], b[:, 1] + b[:, 3]) - np.maximum(a[:, 1], b[:, 1]))
+        inter = inter_w * inter_h
+        scores = inter / (a[:, 2] * a[:, 3] + b[:, 2] * b[:, 3] - inter + 1e-5)
+        keep = scores > self.iou_threshold
+        pr, pc, scores = pr[keep], pc[keep], scores[keep]
+
+        rows, cols = [], []
+        for comp_rows, comp_cols in _components(pr, pc):
+            r_idx = np.unique(comp_rows)
+            c_idx = np.unique(comp_cols)
+            sub = iou_matrix(boxes[r_idx], track_boxes[c_idx])
+            r, c = linear_assignment(1.0 - sub)
+            ok = sub[r, c] > self.iou_threshold
+            rows.extend(r_idx[r[ok]].tolist())
+            cols.extend(c_idx[c[ok]].tolist())
+        return np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)
+
+    def _new_track(self):
+        track_id = self.next_id
+        self.next_id += 1
+        self.hits[track_id] = 0
+        return track_id
+
+    def _age_tracks(self, seen_ids):
+        """Remove tracks that have gone unmatched for more than max_missed frames."""
+        for track_id in list(self.objects.keys()):
+            if track_id in seen_ids:
+                continue
+            self.missed[track_id] += 1
+            if self.missed[track_id] > self.max_missed:
+                del self.objects[track_id]
+                del self.missed[track_id]
+                del self.hits[track_id]
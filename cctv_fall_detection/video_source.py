@@ -0,0 +1,190 @@
+# video_source.py
+import threading
+import time
+
+import cv2
+
+import tracing
+
+# ------------------- CONFIG -------------------
+RECONNECT_BACKOFF = 1.0     # seconds, doubled after every failed (re)connect
+MAX_RECONNECT_BACKOFF = 30.0
+STREAM_TIMEOUT_MS = 5000    # FFmpeg open / read timeout, so a dead stream can't hang grab()
+FPS_SMOOTHING = 0.1         # weight of the newest frame interval in the fps estimate
+
+
+def is_live_source(source):
+    """Webcams and network streams are restarted even after a clean exit."""
+    return str(source).isdigit() or "://" in str(source)
+
+
+def open_capture(source):
+    """cv2.VideoCapture with FFmpeg timeouts for network streams; webcam indices may be strings."""
+    if isinstance(source, str) and source.isdigit():
+        return cv2.VideoCapture(int(source))
+    if "://" in str(source) and hasattr(cv2, "CAP_PROP_OPEN_TIMEOUT_MSEC"):
+        return cv2.VideoCapture(source, cv2.CAP_FFMPEG,
+                                [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, STREAM_TIMEOUT_MS,
+                                 cv2.CAP_PROP_READ_TIMEOUT_MSEC, STREAM_TIMEOUT_MS])
+    return cv2.VideoCapture(source)
+
+
+class VideoSource:
+    def __init__(self, source, name=None, reconnect=None, max_fps=None, opener=open_capture, on_decode=None):
+        """
+        One camera / file read by a dedicated thread.
+        - every frame of a live stream is grab()bed so it never backs up, but only
+          frames a caller is waiting for in read() are retrieve()d (decoded)
+        - files are read at the caller's pace instead, so no frame is skipped
+        - a failed open or read reconnects with exponential backoff
+        reconnect: defaults to True for webcams and network streams, False for files
+        max_fps: decode at most this many frames per second (None = as requested)
+        on_decode: optional callable(seconds) given the retrieve() time of every decoded frame
+        """
+        self.source = source
+        self.name = name or str(source)
+        self.reconnect = is_live_source(source) if reconnect is None else reconnect
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.opener = opener
+        self.on_decode = on_decode
+
+        self.cap = None
+        self.frame = None
+        self.seq = 0            # decoded frames handed out so far
+        self.waiting = 0        # callers blocked in read() and not served yet
+        self.running = False
+        self.finished = False   # file ended or source given up on
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Health
+        self.connected = False
+        self.reconnects = 0
+        self.grabbed = 0
+        self.decoded = 0
+        self.fps = 0.0
+        self.last_frame_at = None
+        self._last_decode = 0.0
+
+    def start(self):
+        self.running = True
+        self._thread = threading.Thread(target=self._run, name=f"reader-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=STREAM_TIMEOUT_MS / 1000.0 + 1.0)
+
+    def wait_connected(self, timeout=None):
+        """True once the source has opened, False if it failed for good or timed out."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.connected or self.finished, timeout) and self.connected
+
+    def read(self, timeout=None):
+        """
+        (ok, frame) like cv2.VideoCapture.read, with the next frame decoded after this call.
+        Blocks through reconnects; ok is False once stopped, finished or timed out.
+        """
+        with self._cond:
+            seq = self.seq
+            self.waiting += 1
+            self._cond.notify_all()
+            self._cond.wait_for(lambda: self.seq > seq or self.finished or not self.running, timeout)
+            if self.seq == seq:
+                self.waiting -= 1  # not served: stopped, finished or timed out
+                return False, None
+            return True, self.frame
+
+    def health(self):
+        now = time.monotonic()
+        return {
+            "source": self.name,
+            "connected": self.connected,
+            "fps": round(self.fps, 2),
+            "grabbed": self.grabbed,
+            "decoded": self.decoded,
+            "reconnects": self.reconnects,
+            "last_frame_age": None if self.last_frame_at is None else round(now - self.last_frame_at, 3),
+        }
+
+    def _run(self):
+        backoff = RECONNECT_BACKOFF
+        while self.running:
+            if self.cap is None:
+                cap = self.opener(self.source)
+                if not cap.isOpened():
+                    cap.release()
+                    if not self._retry(f"Cannot open {self.name}", backoff):
+                        break
+                    backoff = min(backoff * 2, MAX_RECONNECT_BACKOFF)
+                    continue
+                self.cap = cap
+                with self._cond:
+                    self.connected = True
+                    self._cond.notify_all()
+
+            if not self.reconnect:
+                # Files have no live edge to keep up with: read them at the caller's pace
+                with self._cond:
+                    self._cond.wait_for(lambda: self.waiting or not self.running)
+                if not self.running:
+                    break
+
+            if not self.cap.grab():
+                self._disconnect()
+                if not self._retry(f"Lost {self.name}", backoff):
+                    break
+                backoff = min(backoff * 2, MAX_RECONNECT_BACKOFF)
+                continue
+            backoff = RECONNECT_BACKOFF
+
+            now = time.monotonic()
+            if self.last_frame_at is not None:
+                interval = now - self.last_frame_at
+                if interval > 0:
+                    self.fps += FPS_SMOOTHING * (1.0 / interval - self.fps)
+            self.last_frame_at = now
+            self.grabbed += 1
+
+            # Decode only when someone will use the frame
+            if not self.waiting or now - self._last_decode < self.min_interval:
+                continue
+            with tracing.span("decode", source=self.name):
+                ok, frame = self.cap.retrieve()
+            if not ok:
+                continue
+            if self.on_decode is not None:
+                self.on_decode(time.monotonic() - now)
+            self._last_decode = now
+            self.decoded += 1
+            with self._cond:
+                self.frame = frame
+                self.seq += 1
+                self.waiting = 0  # every waiting caller gets this frame
+                self._cond.notify_all()
+
+        self._disconnect()
+        with self._cond:
+            self.finished = True
+            self._cond.notify_all()
+
+    def _retry(self, message, backoff):
+        """Waits out the backoff before the next attempt; False if we should give up instead."""
+        if not self.reconnect or not self.running:
+            return False
+        print(f"[WARN] {message}, reconnecting in {backoff:.1f}s")
+        self.reconnects += 1
+        return not self._stop.wait(backoff)
+
+    def _disconnect(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+        with self._cond:
+            self.connected = False